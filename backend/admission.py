@@ -0,0 +1,287 @@
+"""
+Admission control: per route class concurrency limits with bounded queues.
+Expensive routes (bcrypt, uploads, full-table lists, streamed downloads and
+exports) each get their own class, so a login or upload storm queues behind its own limit instead of
+taking every threadpool thread from cheap reads. Each limit adapts AIMD-style
+to latency: it grows by about one per round trip while the class is busy and
+latency stays near the fastest recently seen, and shrinks by a factor when
+latency climbs past ADMISSION_LATENCY_TOLERANCE times that baseline.
+
+A request that can't start within its class deadline is refused with 503 and
+Retry-After; a client holding more than its share of a saturated class gets 429.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import re
+import time
+from collections import deque
+
+import config
+
+# (method, path template, class); unlisted routes fall into "default"
+ROUTE_CLASSES = [
+    ("POST", "/auth/login", "auth"),
+    ("POST", "/auth/register", "auth"),
+    ("POST", "/papers", "files"),
+    ("POST", "/users/import", "files"),
+    ("GET", "/papers", "bulk"),
+    ("GET", "/papers/search", "bulk"),
+    ("GET", "/reviews", "bulk"),
+    ("GET", "/assignments", "bulk"),
+    ("POST", "/assignments/bulk", "bulk"),
+    ("GET", "/matching/suggest", "bulk"),
+    ("GET", "/audit/logs", "bulk"),
+    ("GET", "/papers/{paper_id}/download", "streams"),
+    ("GET", "/export/{resource}", "streams"),
+]
+
+# Long-lived streams hold a connection, not a worker; limiting them would only starve viewers
+UNLIMITED_PATHS = {"/events", "/leaderboard/stream"}
+
+# Starting limit, bounds, queue length and how long a request may wait to start (seconds).
+# The heavy classes' maximums stay well under the 40 threadpool threads so cheap reads always get some.
+CLASS_SETTINGS = {
+    "auth": {"limit": 4, "min_limit": 1, "max_limit": 8, "queue_size": 64, "deadline": 10.0},
+    "files": {"limit": 4, "min_limit": 1, "max_limit": 8, "queue_size": 32, "deadline": 15.0},
+    "bulk": {"limit": 4, "min_limit": 1, "max_limit": 8, "queue_size": 32, "deadline": 5.0},
+    # Downloads and exports hold their slot until the last byte is sent, mostly waiting on the
+    # client, so they get more slots than "files" without competing with its uploads
+    "streams": {"limit": 8, "min_limit": 2, "max_limit": 16, "queue_size": 32, "deadline": 15.0},
+    "default": {"limit": 16, "min_limit": 4, "max_limit": 32, "queue_size": 128, "deadline": 2.0},
+}
+
+DECREASE_FACTOR = 0.9
+# The baseline creeps toward recent latency so it recovers after the workload changes
+BASELINE_DRIFT = 0.01
+
+
+def _compile(template):
+    pattern = re.sub(r"\{(\w+)\}", r"[^/]+", template)
+    return re.compile(f"^{pattern}$")
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, detail: str, retry_after: int):
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """Concurrency limit and FIFO queue for one route class (event loop only, no locking)"""
+
+    def __init__(self, name: str, limit: int, min_limit: int, max_limit: int, queue_size: int, deadline: float,
+                 tolerance: float, client_share: float):
+        self.name = name
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.tolerance = tolerance
+        self.client_share = client_share
+        self.in_flight = 0
+        self._waiters = deque()
+        self._clients = {}
+        self._baseline = None
+        self._latency = None
+        self._last_decrease = 0.0
+        self.admitted = 0
+        self.queued_total = 0
+        self.shed = 0
+        self.throttled = 0
+        self.timed_out = 0
+
+    def _retry_after(self) -> int:
+        latency = self._latency or 1.0
+        return max(1, math.ceil(latency * (len(self._waiters) + 1) / self.limit))
+
+    def _expected_wait(self) -> float:
+        return (self._latency or 0.0) * (len(self._waiters) + 1) / self.limit
+
+    async def acquire(self, client: str):
+        """Wait for a slot; raises Rejected when the class is saturated"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self._take(client)
+            return
+        if self._clients.get(client, 0) >= max(1, int(self.limit * self.client_share)):
+            self.throttled += 1
+            raise Rejected(429, f"Too many concurrent {self.name} requests from this client", self._retry_after())
+        if len(self._waiters) >= self.queue_size or self._expected_wait() > self.deadline:
+            self.shed += 1
+            raise Rejected(503, f"Server is busy ({self.name})", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, client)
+        self._waiters.append(entry)
+        self._clients[client] = self._clients.get(client, 0) + 1
+        self.queued_total += 1
+        try:
+            await asyncio.wait({waiter}, timeout=self.deadline)
+        except BaseException:
+            # The client went away while waiting
+            if waiter.done():
+                self.release(client)
+            else:
+                self._abandon(entry)
+            raise
+        if not waiter.done():
+            self._abandon(entry)
+            self.timed_out += 1
+            raise Rejected(503, f"Server is busy ({self.name})", self._retry_after())
+        # The releasing request already counted us in flight and kept our client count
+
+    def _abandon(self, entry):
+        waiter, client = entry
+        waiter.cancel()
+        self._waiters.remove(entry)
+        self._leave(client)
+
+    def _take(self, client: str):
+        self.in_flight += 1
+        self.admitted += 1
+        self._clients[client] = self._clients.get(client, 0) + 1
+
+    def _leave(self, client: str):
+        count = self._clients.get(client, 0) - 1
+        if count > 0:
+            self._clients[client] = count
+        else:
+            self._clients.pop(client, None)
+
+    def release(self, client: str, latency: float = None):
+        """Free a slot, feed the request's latency (None if it failed early) to the limit, wake waiters"""
+        saturated = self.in_flight >= int(self.limit) or bool(self._waiters)
+        self.in_flight -= 1
+        self._leave(client)
+        if latency is not None:
+            self._observe(latency, saturated)
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter, _ = self._waiters.popleft()
+            self.in_flight += 1
+            self.admitted += 1
+            waiter.set_result(True)
+
+    def _observe(self, latency: float, saturated: bool):
+        if self._baseline is None:
+            self._baseline = self._latency = latency
+            return
+        self._latency += (latency - self._latency) * 0.2
+        self._baseline = min(latency, self._baseline + (latency - self._baseline) * BASELINE_DRIFT)
+
+        now = time.monotonic()
+        if latency > self._baseline * self.tolerance:
+            # Back off at most once per round trip, or one slow burst would drive the limit to the floor
+            if now - self._last_decrease >= latency:
+                self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+                self._last_decrease = now
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "timed_out": self.timed_out,
+            "latency_ms": round(self._latency * 1000, 1) if self._latency is not None else None,
+            "baseline_ms": round(self._baseline * 1000, 1) if self._baseline is not None else None,
+        }
+
+
+class AdmissionController:
+    def __init__(self, enabled: bool, tolerance: float, client_share: float):
+        self.enabled = enabled
+        self._routes = [(method, _compile(template), name) for method, template, name in ROUTE_CLASSES]
+        self.limiters = {
+            name: AdaptiveLimiter(name, tolerance=tolerance, client_share=client_share, **settings)
+            for name, settings in CLASS_SETTINGS.items()
+        }
+
+    def classify(self, method: str, path: str):
+        """The limiter for a request, or None if it isn't limited"""
+        if path in UNLIMITED_PATHS or method == "OPTIONS":
+            return None
+        for route_method, pattern, name in self._routes:
+            if route_method == method and pattern.match(path):
+                return self.limiters[name]
+        return self.limiters["default"]
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "classes": {name: limiter.stats() for name, limiter in self.limiters.items()}}
+
+
+def _client_key(scope) -> str:
+    """Callers are told apart by credentials when they send them, otherwise by address"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            return hashlib.sha256(value).hexdigest()[:16]
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+class AdmissionMiddleware:
+    """Hold each request at its route class's limiter until it may run"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled:
+            await self.app(scope, receive, send)
+            return
+        limiter = self.controller.classify(scope["method"], scope["path"])
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = _client_key(scope)
+        try:
+            await limiter.acquire(client)
+        except Rejected as e:
+            await self._send_rejection(send, e)
+            return
+
+        started = time.monotonic()
+        latency = None
+
+        async def timed_send(message):
+            nonlocal latency
+            # Time to the response head: a slow download shouldn't read as server load
+            if message["type"] == "http.response.start" and latency is None:
+                latency = time.monotonic() - started
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            limiter.release(client, latency)
+
+    async def _send_rejection(self, send, rejection: Rejected):
+        body = json.dumps({"detail": rejection.detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": rejection.status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(rejection.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+admission = AdmissionController(
+    enabled=config.ADMISSION_ENABLED,
+    tolerance=config.ADMISSION_LATENCY_TOLERANCE,
+    client_share=config.ADMISSION_CLIENT_SHARE,
+)
@@ -0,0 +1,97 @@
+from typing import List, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+
+# Cost of leaving one reviewer slot unfilled; far above any score so coverage always wins first
+UNFILLED_COST = 100.0
+# Extra cost of each further paper given to the same reviewer: the k-th paper costs (k - 1) * LOAD_COST.
+# Small next to score differences that matter, but enough to spread ties and near-ties evenly
+LOAD_COST = 0.05
+
+
+def solve_assignment(
+    need: np.ndarray,
+    capacity: np.ndarray,
+    candidate_rows: np.ndarray,
+    candidate_scores: np.ndarray,
+) -> List[Tuple[int, int, float]]:
+    """Load-balanced reviewer assignment as a min-cost flow.
+
+    ``need[p]`` is how many more reviewers paper p requires, ``capacity[r]`` how
+    many more papers reviewer row r can take, and ``candidate_rows[p]`` /
+    ``candidate_scores[p]`` the allowed reviewer rows for p (-1 for none) with
+    their similarity. Each paper-reviewer edge carries at most one unit of flow.
+
+    Each reviewer's capacity is split into unit arcs to the sink whose cost
+    rises by LOAD_COST per paper already taken. The workload cost is therefore
+    convex, and among assignments of similar quality the solver prefers the
+    one that spreads papers evenly.
+
+    The flow network is solved as its linear program with HiGHS. Transportation
+    constraint matrices are totally unimodular, so the optimal vertex is
+    integral. Returns (paper index, reviewer row, score) triples.
+    """
+    n_papers = len(need)
+    paper_idx, slot = np.nonzero(candidate_rows >= 0)
+    reviewer_idx = candidate_rows[paper_idx, slot]
+    scores = candidate_scores[paper_idx, slot].astype(np.float64)
+    n_edges = len(paper_idx)
+    if n_edges == 0:
+        return []
+
+    # Unit workload arcs per reviewer: no more than their capacity or their candidate edges
+    used_reviewers, reviewer_pos = np.unique(reviewer_idx, return_inverse=True)
+    n_reviewers = len(used_reviewers)
+    arc_counts = np.minimum(np.maximum(capacity[used_reviewers], 0), np.bincount(reviewer_pos, minlength=n_reviewers))
+    arc_owner = np.repeat(np.arange(n_reviewers), arc_counts)
+    arc_rank = np.arange(len(arc_owner)) - np.repeat(np.cumsum(arc_counts) - arc_counts, arc_counts)
+    n_arcs = len(arc_owner)
+
+    # Variables: candidate edges, then one "unfilled" slack per paper, then the workload arcs
+    cost = np.concatenate([-scores, np.full(n_papers, UNFILLED_COST), LOAD_COST * arc_rank])
+    edge_ids = np.arange(n_edges)
+    slack_ids = n_edges + np.arange(n_papers)
+    arc_ids = n_edges + n_papers + np.arange(n_arcs)
+
+    # Each paper receives exactly its need, counting unfilled slots; each reviewer
+    # passes on through its workload arcs exactly the papers it receives
+    a_eq = sparse.csr_matrix(
+        (
+            np.concatenate([np.ones(n_edges + n_papers), np.ones(n_edges), -np.ones(n_arcs)]),
+            (
+                np.concatenate([paper_idx, np.arange(n_papers), n_papers + reviewer_pos, n_papers + arc_owner]),
+                np.concatenate([edge_ids, slack_ids, edge_ids, arc_ids]),
+            ),
+        ),
+        shape=(n_papers + n_reviewers, n_edges + n_papers + n_arcs),
+    )
+
+    bounds = np.column_stack([
+        np.zeros(n_edges + n_papers + n_arcs),
+        np.concatenate([np.ones(n_edges), need.astype(np.float64), np.ones(n_arcs)]),
+    ])
+    result = linprog(
+        cost,
+        A_eq=a_eq,
+        b_eq=np.concatenate([need.astype(np.float64), np.zeros(n_reviewers)]),
+        bounds=bounds,
+        method="highs-ds",
+    )
+    if not result.success:
+        raise RuntimeError(f"Assignment solver failed: {result.message}")
+
+    chosen = np.flatnonzero(result.x[:n_edges] > 0.5)
+
+    # Guard against any fractional vertex by re-checking limits greedily, best scores first
+    remaining_need = need.copy()
+    remaining_capacity = capacity.copy()
+    assignments = []
+    for edge in chosen[np.argsort(-scores[chosen], kind="stable")]:
+        p, r = paper_idx[edge], reviewer_idx[edge]
+        if remaining_need[p] > 0 and remaining_capacity[r] > 0:
+            remaining_need[p] -= 1
+            remaining_capacity[r] -= 1
+            assignments.append((int(p), int(r), float(scores[edge])))
+    return assignments
@@ -0,0 +1,404 @@
+"""Monthly partitioning of the audit log into compressed, read-only SQLite archives.
+
+Recent rows live in the hot ``audit_logs`` table. ``rollover`` moves every whole
+month older than ``config.AUDIT_HOT_MONTHS`` into its own SQLite file, gzips it
+and records it in ``audit_partitions``. Queries read the hot table plus only the
+partitions whose time span overlaps the requested range, using the same
+composite indexes in both places. The audit_rollover job runs it hourly; it
+only has work to do once a month leaves the hot window.
+
+Usage: python audit_archive.py rollover
+"""
+import base64
+import gzip
+import heapq
+import json
+import os
+import shutil
+import sqlite3
+import stat
+import sys
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select, text, func, tuple_
+from sqlalchemy.orm import Session
+
+import config
+from database import SessionLocal, AuditLog, AuditPartition
+from scheduler import job
+
+COLUMNS = ["id", "user_id", "action", "resource_type", "resource_id", "details", "timestamp"]
+
+PARTITION_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS audit_logs (
+        id INTEGER NOT NULL,
+        user_id INTEGER,
+        action TEXT NOT NULL,
+        resource_type TEXT,
+        resource_id INTEGER,
+        details TEXT,
+        timestamp TEXT
+    )""",
+    # SQLite may reuse ids once archived rows leave the hot table, so (timestamp, id) is the row key
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_audit_logs_timestamp_id ON audit_logs (timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_logs_user_timestamp ON audit_logs (user_id, timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_logs_action_timestamp ON audit_logs (action, timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_logs_resource_timestamp ON audit_logs (resource_type, resource_id, timestamp, id)",
+]
+
+COPY_BATCH_SIZE = 5000
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+def add_months(dt: datetime, months: int) -> datetime:
+    index = dt.year * 12 + (dt.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def hot_cutoff(now: datetime = None) -> datetime:
+    """Rows older than this belong in archived partitions"""
+    return add_months(month_start(now or datetime.utcnow()), -config.AUDIT_HOT_MONTHS)
+
+
+def _cache_dir() -> str:
+    return os.path.join(config.AUDIT_ARCHIVE_DIR, "cache")
+
+
+def _archive_path(month: str) -> str:
+    return os.path.join(config.AUDIT_ARCHIVE_DIR, f"audit_logs_{month}.db.gz")
+
+
+def _format_ts(value: datetime):
+    return value.strftime(TIMESTAMP_FORMAT) if value else None
+
+
+def _parse_ts(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+# ==================== Rollover ====================
+
+def _temp_path(dest: str) -> str:
+    # Unique per call: several workers may extract the same partition into the cache at once
+    return os.path.join(os.path.dirname(dest), f".tmp-{uuid.uuid4().hex}-{os.path.basename(dest)}")
+
+
+def _decompress(src: str, dest: str):
+    tmp = _temp_path(dest)
+    try:
+        with gzip.open(src, "rb") as f_in, open(tmp, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _compress(src: str, dest: str):
+    tmp = _temp_path(dest)
+    with open(src, "rb") as f_in, gzip.open(tmp, "wb", compresslevel=9) as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+    if os.path.exists(dest):
+        os.chmod(dest, stat.S_IRUSR | stat.S_IWUSR)
+    os.replace(tmp, dest)
+    os.chmod(dest, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+
+def _archive_month(db: Session, month_begin: datetime, month_end: datetime) -> dict:
+    """Copy one month of hot rows into its archive file and return partition metadata"""
+    month = month_begin.strftime("%Y-%m")
+    archive = _archive_path(month)
+    work = os.path.join(config.AUDIT_ARCHIVE_DIR, f".audit_logs_{month}.db")
+    if os.path.exists(work):
+        os.remove(work)
+    # Late rows for an already archived month are merged into the existing file
+    if os.path.exists(archive):
+        _decompress(archive, work)
+
+    conn = sqlite3.connect(work)
+    try:
+        for ddl in PARTITION_SCHEMA:
+            conn.execute(ddl)
+
+        rows = db.execute(
+            select(*[AuditLog.__table__.c[name] for name in COLUMNS])
+            .where(AuditLog.timestamp >= month_begin, AuditLog.timestamp < month_end)
+            .order_by(AuditLog.id)
+            .execution_options(yield_per=COPY_BATCH_SIZE)
+        )
+        batch = []
+        for row in rows:
+            batch.append(tuple(row[:-1]) + (_format_ts(row[-1]),))
+            if len(batch) >= COPY_BATCH_SIZE:
+                conn.executemany(f"INSERT OR IGNORE INTO audit_logs VALUES ({', '.join('?' * len(COLUMNS))})", batch)
+                batch = []
+        if batch:
+            conn.executemany(f"INSERT OR IGNORE INTO audit_logs VALUES ({', '.join('?' * len(COLUMNS))})", batch)
+        conn.commit()
+
+        row_count, min_ts, max_ts = conn.execute(
+            "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM audit_logs"
+        ).fetchone()
+        action_counts = dict(conn.execute("SELECT action, COUNT(*) FROM audit_logs GROUP BY action"))
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    _compress(work, archive)
+    os.remove(work)
+    # Any extracted copy of a previous version of this partition is now stale
+    cached = os.path.join(_cache_dir(), os.path.basename(archive)[:-3])
+    if os.path.exists(cached):
+        os.remove(cached)
+
+    return {
+        "month": month,
+        "path": archive,
+        "row_count": row_count,
+        "min_timestamp": _parse_ts(min_ts),
+        "max_timestamp": _parse_ts(max_ts),
+        "action_counts": json.dumps(action_counts, sort_keys=True),
+    }
+
+
+def rollover(db: Session, now: datetime = None) -> list:
+    """Archive every whole month older than the hot window and delete it from the hot table"""
+    os.makedirs(config.AUDIT_ARCHIVE_DIR, exist_ok=True)
+    cutoff = hot_cutoff(now)
+    oldest = db.query(AuditLog.timestamp).filter(AuditLog.timestamp < cutoff).order_by(AuditLog.timestamp).first()
+    if not oldest:
+        return []
+
+    archived = []
+    month_begin = month_start(oldest[0])
+    while month_begin < cutoff:
+        month_end = add_months(month_begin, 1)
+        has_rows = db.query(AuditLog.id).filter(
+            AuditLog.timestamp >= month_begin, AuditLog.timestamp < month_end
+        ).first()
+        if has_rows:
+            metadata = _archive_month(db, month_begin, month_end)
+            partition = db.query(AuditPartition).filter(AuditPartition.month == metadata["month"]).first()
+            if not partition:
+                partition = AuditPartition(month=metadata["month"])
+                db.add(partition)
+            for key, value in metadata.items():
+                setattr(partition, key, value)
+            partition.archived_at = datetime.utcnow()
+
+            # Registry update and hot-table delete commit together once the archive is on disk
+            db.query(AuditLog).filter(
+                AuditLog.timestamp >= month_begin, AuditLog.timestamp < month_end
+            ).delete(synchronize_session=False)
+            db.commit()
+            archived.append({"month": metadata["month"], "row_count": metadata["row_count"]})
+        month_begin = month_end
+
+    return archived
+
+
+@job("audit_rollover", 3600)
+def rollover_job(db: Session, state: dict, now: datetime) -> dict:
+    archived = rollover(db, now)
+    return {"archived": archived}
+
+
+# ==================== Queries ====================
+
+def open_partition(partition: AuditPartition) -> sqlite3.Connection:
+    """Open an archived partition read-only, extracting it into the local cache on first use"""
+    os.makedirs(_cache_dir(), exist_ok=True)
+    cached = os.path.join(_cache_dir(), os.path.basename(partition.path)[:-3])
+    if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(partition.path):
+        _decompress(partition.path, cached)
+    uri = "file:" + os.path.abspath(cached).replace("\\", "/") + "?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True)
+
+
+def overlapping_partitions(db: Session, start: datetime = None, end: datetime = None, before=None) -> list:
+    """Partitions whose time span overlaps [start, end) and precedes the cursor, newest first"""
+    query = db.query(AuditPartition)
+    if start:
+        query = query.filter(AuditPartition.max_timestamp >= start)
+    if end:
+        query = query.filter(AuditPartition.min_timestamp < end)
+    if before:
+        query = query.filter(AuditPartition.min_timestamp <= before[0])
+    return query.order_by(AuditPartition.month.desc()).all()
+
+
+def encode_cursor(record: dict) -> str:
+    raw = f"{_format_ts(record['timestamp'])}|{record['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Return the (timestamp, id) keyset position encoded in a cursor"""
+    timestamp, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return _parse_ts(timestamp), int(record_id)
+
+
+def _row_to_dict(row) -> dict:
+    record = dict(zip(COLUMNS, row))
+    if isinstance(record["timestamp"], str):
+        record["timestamp"] = _parse_ts(record["timestamp"])
+    return record
+
+
+def _query_hot(db: Session, limit: int, start=None, end=None, before=None, **filters) -> list:
+    query = db.query(*[AuditLog.__table__.c[name] for name in COLUMNS])
+    for name, value in filters.items():
+        if value is not None:
+            query = query.filter(AuditLog.__table__.c[name] == value)
+    if start:
+        query = query.filter(AuditLog.timestamp >= start)
+    if end:
+        query = query.filter(AuditLog.timestamp < end)
+    if before:
+        query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) < before)
+    rows = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit).all()
+    return [_row_to_dict(row) for row in rows]
+
+
+def _partition_where(start=None, end=None, before=None, **filters):
+    clauses, params = [], []
+    for name, value in filters.items():
+        if value is not None:
+            clauses.append(f"{name} = ?")
+            params.append(value)
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(_format_ts(start))
+    if end:
+        clauses.append("timestamp < ?")
+        params.append(_format_ts(end))
+    if before:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend([_format_ts(before[0]), before[1]])
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+def _query_partition(partition: AuditPartition, limit: int, **criteria) -> list:
+    where, params = _partition_where(**criteria)
+    conn = open_partition(partition)
+    try:
+        rows = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM audit_logs {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+    finally:
+        conn.close()
+    return [_row_to_dict(row) for row in rows]
+
+
+def _sort_key(record: dict):
+    return (record["timestamp"] or datetime.min, record["id"])
+
+
+def query_logs(
+    db: Session,
+    limit: int = 100,
+    start: datetime = None,
+    end: datetime = None,
+    before=None,
+    user_id: int = None,
+    action: str = None,
+    resource_type: str = None,
+    resource_id: int = None,
+) -> list:
+    """Newest-first audit log rows matching the filters, reading only overlapping partitions.
+
+    ``before`` is a (timestamp, id) keyset position from ``decode_cursor``; only
+    rows strictly older than it are returned.
+    """
+    criteria = dict(
+        start=start, end=end, before=before,
+        user_id=user_id, action=action, resource_type=resource_type, resource_id=resource_id,
+    )
+    results = _query_hot(db, limit, **criteria)
+    for partition in overlapping_partitions(db, start, end, before):
+        # Partitions are visited newest first, so stop once none can beat what we already have
+        if len(results) >= limit and partition.max_timestamp < _sort_key(results[-1])[0]:
+            break
+        rows = _query_partition(partition, limit, **criteria)
+        results = heapq.nlargest(limit, results + rows, key=_sort_key)
+    return results[:limit]
+
+
+# Loose index scan: walks the distinct actions of ix_audit_logs_action_timestamp one seek at a time
+DISTINCT_ACTIONS_SQL = """
+    WITH RECURSIVE actions(action) AS (
+        SELECT MIN(action) FROM audit_logs
+        UNION ALL
+        SELECT (SELECT MIN(action) FROM audit_logs WHERE action > actions.action)
+        FROM actions WHERE actions.action IS NOT NULL
+    )
+    SELECT action FROM actions WHERE action IS NOT NULL
+"""
+
+
+def _count_hot_actions(db: Session, start=None, end=None) -> dict:
+    counts = {}
+    for (action,) in db.execute(text(DISTINCT_ACTIONS_SQL)):
+        query = db.query(func.count(AuditLog.id)).filter(AuditLog.action == action)
+        if start:
+            query = query.filter(AuditLog.timestamp >= start)
+        if end:
+            query = query.filter(AuditLog.timestamp < end)
+        count = query.scalar()
+        if count:
+            counts[action] = count
+    return counts
+
+
+def count_actions(db: Session, start: datetime = None, end: datetime = None) -> dict:
+    """Per-action row counts in [start, end) across the hot table and archived partitions"""
+    counts = Counter(_count_hot_actions(db, start, end))
+    for partition in overlapping_partitions(db, start, end):
+        month_begin = datetime.strptime(partition.month, "%Y-%m")
+        fully_covered = (start is None or start <= month_begin) and (end is None or add_months(month_begin, 1) <= end)
+        if fully_covered and partition.action_counts:
+            # Whole months are answered from the counts recorded at rollover
+            counts.update(json.loads(partition.action_counts))
+            continue
+        where, params = _partition_where(start=start, end=end)
+        conn = open_partition(partition)
+        try:
+            counts.update(dict(conn.execute(f"SELECT action, COUNT(*) FROM audit_logs {where} GROUP BY action", params)))
+        finally:
+            conn.close()
+    return dict(counts.most_common())
+
+
+def iter_archived_rows():
+    """Yield every archived row as (columns, row), oldest partition first"""
+    db = SessionLocal()
+    try:
+        partitions = db.query(AuditPartition).order_by(AuditPartition.month).all()
+    finally:
+        db.close()
+    for partition in partitions:
+        conn = open_partition(partition)
+        try:
+            for row in conn.execute(f"SELECT {', '.join(COLUMNS)} FROM audit_logs ORDER BY timestamp, id"):
+                yield COLUMNS, row[:-1] + (_parse_ts(row[-1]),)
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] != "rollover":
+        print(__doc__)
+        sys.exit(1)
+    db = SessionLocal()
+    try:
+        for partition in rollover(db):
+            print(f"Archived {partition['row_count']} rows for {partition['month']}")
+    finally:
+        db.close()
@@ -1,16 +1,19 @@
+import hashlib
+import secrets
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 import config
-from database import get_db, User
+from database import get_db, SessionLocal, StreamTicket, User
 from schemas import TokenData
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -28,12 +31,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def user_from_token(token: Optional[str], db: Session) -> User:
+    credentials_exception = _credentials_exception()
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
         email: str = payload.get("sub")
@@ -48,5 +56,61 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise credentials_exception
     return user
 
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return user_from_token(token, db)
+
+def _ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+def create_stream_ticket(user: User, db: Session) -> str:
+    """A random ticket that opens one event stream as user within STREAM_TICKET_SECONDS"""
+    now = datetime.utcnow()
+    ticket = secrets.token_urlsafe(32)
+    # Unused tickets are cleared as new ones are issued
+    db.query(StreamTicket).filter(StreamTicket.expires_at < now).delete(synchronize_session=False)
+    db.add(StreamTicket(
+        ticket_hash=_ticket_hash(ticket),
+        user_id=user.id,
+        expires_at=now + timedelta(seconds=config.STREAM_TICKET_SECONDS),
+    ))
+    db.commit()
+    return ticket
+
+def redeem_stream_ticket(ticket: Optional[str], db: Session) -> User:
+    """The user a ticket was issued to; the ticket is spent even if it has expired"""
+    if not ticket:
+        raise _credentials_exception()
+    row = db.query(StreamTicket).filter(StreamTicket.ticket_hash == _ticket_hash(ticket)).first()
+    if row is None:
+        raise _credentials_exception()
+    user_id, expires_at = row.user_id, row.expires_at
+    # Only the request whose delete removes the row gets in, whichever worker it reaches
+    deleted = db.query(StreamTicket).filter(StreamTicket.id == row.id).delete(synchronize_session=False)
+    db.commit()
+    if deleted != 1 or expires_at < datetime.utcnow():
+        raise _credentials_exception()
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+def get_stream_user(
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+    ticket: Optional[str] = Query(None, description="Single-use ticket from POST /auth/stream-ticket, for EventSource clients that can't send headers")
+):
+    """Authenticate a long-lived stream by bearer token or stream ticket.
+
+    Access tokens are never accepted in the query string, where access logs
+    and proxies would record them. Uses its own short-lived session so an open
+    stream never holds a pooled connection; the returned user is detached.
+    """
+    db = SessionLocal()
+    try:
+        if header_token:
+            return user_from_token(header_token, db)
+        return redeem_stream_ticket(ticket, db)
+    finally:
+        db.close()
+
 def get_current_active_user(current_user: User = Depends(get_current_user)):
     return current_user
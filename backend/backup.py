@@ -0,0 +1,407 @@
+"""
+Online backup and restore of the database and stored files.
+A backup repository (BACKUP_DIR) holds content-addressed blobs and one
+directory per snapshot:
+
+    blobs/ab/abcdef...            every distinct file, stored once under its SHA-256
+    snapshots/<id>/database.*     SQLite copy (gzip) or pg_dump archive
+    snapshots/<id>/manifest.json  database checksum and the path -> blob list
+    index.json                    (size, mtime) -> hash of files already backed up
+
+The database is copied first, with the SQLite online backup API or pg_dump,
+which reads from an MVCC snapshot. The SQLite copy is a single step: the
+database runs in WAL mode, so the copy reads one snapshot while writers carry
+on. A copy made in steps would start over every time another connection wrote
+between them, and might never finish on a busy server. Files are written to disk before the rows that
+reference them are committed, so every file the snapshot knows about is then
+on disk to be copied. Unchanged files are recognised from the index and never
+re-read; new content is hashed while it is copied, on a thread pool.
+
+Restore (with the server stopped) verifies every blob against its hash while
+copying it into place, in parallel, and skips files that are already correct.
+
+    python backup.py create
+    python backup.py list
+    python backup.py verify <snapshot>
+    python backup.py restore <snapshot> [--workers N]
+    python backup.py prune --keep N
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.engine import make_url
+
+import config
+from integrity import copy_and_hash, hash_file
+
+# Directories backed up alongside the database: name -> (path, subdirectories to skip)
+ROOTS = {
+    "uploads": (config.UPLOAD_DIR, set()),
+    "audit_archive": (config.AUDIT_ARCHIVE_DIR, {"cache"}),  # cache holds decompressed copies
+}
+
+COPY_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+def _database_kind(url: str) -> str:
+    backend = make_url(url).get_backend_name()
+    if backend not in ("sqlite", "postgresql"):
+        raise BackupError(f"Unsupported database: {backend}")
+    return backend
+
+
+def _libpq_url(url: str) -> str:
+    """The SQLAlchemy URL without its driver suffix, as pg_dump expects"""
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def _sqlite_path(url: str) -> str:
+    return make_url(url).database
+
+
+def _write_json(path: str, data):
+    """Write atomically, so a crash never leaves a half-written manifest or index"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_json(path: str, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+class Repository:
+    def __init__(self, root: str):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.snapshot_dir = os.path.join(root, "snapshots")
+        self.index_path = os.path.join(root, "index.json")
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256)
+
+    def snapshot_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.snapshot_dir, snapshot_id)
+
+    def manifest(self, snapshot_id: str) -> dict:
+        manifest = _read_json(os.path.join(self.snapshot_path(snapshot_id), "manifest.json"))
+        if manifest is None:
+            raise BackupError(f"No complete snapshot named {snapshot_id}")
+        return manifest
+
+    def snapshots(self) -> List[str]:
+        """Complete snapshots, oldest first (a snapshot is complete once its manifest exists)"""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.snapshot_dir)
+            if os.path.exists(os.path.join(self.snapshot_dir, name, "manifest.json"))
+        )
+
+    def lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, ".lock")
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise BackupError(f"Another backup command is running (remove {path} if it isn't)")
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return path
+
+
+def _dump_sqlite(url: str, dest_dir: str) -> dict:
+    source = sqlite3.connect(_sqlite_path(url))
+    raw = os.path.join(dest_dir, "database.sqlite")
+    target = sqlite3.connect(raw)
+    try:
+        # One step over one read snapshot, so concurrent writes can't restart it
+        source.backup(target, pages=-1)
+    finally:
+        target.close()
+        source.close()
+    sha256, size = hash_file(raw)
+    with open(raw, "rb") as src, gzip.open(raw + ".gz", "wb", compresslevel=1) as dst:
+        shutil.copyfileobj(src, dst, COPY_SIZE)
+    os.remove(raw)
+    return {"kind": "sqlite", "file": "database.sqlite.gz", "sha256": sha256, "size": size}
+
+
+def _dump_postgres(url: str, dest_dir: str) -> dict:
+    path = os.path.join(dest_dir, "database.dump")
+    subprocess.run(["pg_dump", "--format=custom", "--no-owner", f"--file={path}", _libpq_url(url)], check=True)
+    sha256, size = hash_file(path)
+    return {"kind": "postgresql", "file": "database.dump", "sha256": sha256, "size": size}
+
+
+def _restore_sqlite(url: str, snapshot_dir: str, info: dict):
+    target = _sqlite_path(url)
+    work = f"{target}.restore"
+    with gzip.open(os.path.join(snapshot_dir, info["file"]), "rb") as src, open(work, "wb") as dst:
+        sha256, size = copy_and_hash(src, dst)
+    if sha256 != info["sha256"]:
+        os.remove(work)
+        raise BackupError("Database copy does not match its recorded hash")
+    check = sqlite3.connect(work)
+    try:
+        result = check.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        check.close()
+    if result != "ok":
+        os.remove(work)
+        raise BackupError(f"Restored database failed integrity_check: {result}")
+    for suffix in ("-wal", "-shm", "-journal"):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    os.replace(work, target)
+
+
+def _restore_postgres(url: str, snapshot_dir: str, info: dict, workers: int):
+    path = os.path.join(snapshot_dir, info["file"])
+    if hash_file(path)[0] != info["sha256"]:
+        raise BackupError("Database dump does not match its recorded hash")
+    subprocess.run([
+        "pg_restore", "--clean", "--if-exists", "--no-owner", f"--jobs={workers}", f"--dbname={_libpq_url(url)}", path
+    ], check=True)
+
+
+def _walk(root_name: str) -> List[tuple]:
+    """(root name, relative path, absolute path, stat) of every file under a root"""
+    path, skipped = ROOTS[root_name]
+    found = []
+    if not os.path.isdir(path):
+        return found
+    for directory, subdirs, files in os.walk(path):
+        if directory == path:
+            subdirs[:] = [d for d in subdirs if d not in skipped]
+        subdirs[:] = [d for d in subdirs if not d.startswith(".")]
+        for name in files:
+            if name.startswith("."):
+                continue  # work files still being written
+            full = os.path.join(directory, name)
+            found.append((root_name, os.path.relpath(full, path), full, os.stat(full)))
+    return found
+
+
+def _store_blob(repo: Repository, path: str, known: Optional[str]) -> tuple:
+    """Make sure the repository has the file's content; returns (sha256, size, bytes written)"""
+    if known and os.path.exists(repo.blob_path(known)):
+        return known, None, 0
+    os.makedirs(repo.blob_dir, exist_ok=True)
+    tmp = os.path.join(repo.blob_dir, f".tmp-{uuid.uuid4().hex}")
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        sha256, size = copy_and_hash(src, dst)
+    final = repo.blob_path(sha256)
+    if os.path.exists(final):
+        os.remove(tmp)
+        return sha256, size, 0
+    os.makedirs(os.path.dirname(final), exist_ok=True)
+    os.replace(tmp, final)
+    return sha256, size, size
+
+
+def create(repo: Repository, workers: int) -> dict:
+    """Take a snapshot; returns its manifest"""
+    lock = repo.lock()
+    try:
+        started = time.monotonic()
+        snapshot_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        snapshot_dir = repo.snapshot_path(snapshot_id)
+        os.makedirs(snapshot_dir)
+
+        # Database first: files referenced by the copy were on disk before their rows were committed
+        try:
+            if _database_kind(config.DATABASE_URL) == "sqlite":
+                database = _dump_sqlite(config.DATABASE_URL, snapshot_dir)
+            else:
+                database = _dump_postgres(config.DATABASE_URL, snapshot_dir)
+        except BaseException:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            raise
+
+        index = _read_json(repo.index_path, {})
+        entries = [entry for name in ROOTS for entry in _walk(name)]
+
+        def backup_one(entry):
+            root_name, relative, full, stat = entry
+            key = f"{root_name}/{relative}"
+            cached = index.get(key)
+            known = cached["sha256"] if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns else None
+            sha256, _, written = _store_blob(repo, full, known)
+            return key, root_name, relative, stat, sha256, written
+
+        files = []
+        new_index = {}
+        bytes_written = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for key, root_name, relative, stat, sha256, written in executor.map(backup_one, entries):
+                files.append({"root": root_name, "path": relative, "sha256": sha256, "size": stat.st_size})
+                new_index[key] = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                bytes_written += written
+
+        manifest = {
+            "id": snapshot_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "database": database,
+            "files": files,
+            "file_count": len(files),
+            "file_bytes": sum(f["size"] for f in files),
+            "new_blob_bytes": bytes_written,
+            "seconds": round(time.monotonic() - started, 3),
+        }
+        _write_json(repo.index_path, new_index)
+        _write_json(os.path.join(snapshot_dir, "manifest.json"), manifest)
+        return manifest
+    finally:
+        os.remove(lock)
+
+
+def verify(repo: Repository, snapshot_id: str, workers: int) -> List[str]:
+    """Re-hash the snapshot's database copy and blobs; returns a list of problems"""
+    manifest = repo.manifest(snapshot_id)
+    problems = []
+    database = manifest["database"]
+    path = os.path.join(repo.snapshot_path(snapshot_id), database["file"])
+    if not os.path.exists(path):
+        problems.append(f"database: missing {database['file']}")
+    elif database["kind"] == "sqlite":
+        with gzip.open(path, "rb") as src, open(os.devnull, "wb") as sink:
+            digest, _ = copy_and_hash(src, sink)
+        if digest != database["sha256"]:
+            problems.append("database: hash mismatch")
+    elif hash_file(path)[0] != database["sha256"]:
+        problems.append("database: hash mismatch")
+
+    def check(sha256):
+        blob = repo.blob_path(sha256)
+        if not os.path.exists(blob):
+            return f"blob {sha256}: missing"
+        if hash_file(blob)[0] != sha256:
+            return f"blob {sha256}: hash mismatch"
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        problems.extend(p for p in executor.map(check, sorted({f["sha256"] for f in manifest["files"]})) if p)
+    return problems
+
+
+def restore(repo: Repository, snapshot_id: str, workers: int) -> dict:
+    """Restore the database and files of a snapshot; run with the server stopped"""
+    manifest = repo.manifest(snapshot_id)
+    started = time.monotonic()
+    missing = [f["sha256"] for f in manifest["files"] if not os.path.exists(repo.blob_path(f["sha256"]))]
+    if missing:
+        raise BackupError(f"{len(missing)} blobs are missing from the repository; nothing was restored")
+
+    database = manifest["database"]
+    if database["kind"] != _database_kind(config.DATABASE_URL):
+        raise BackupError(f"Snapshot holds a {database['kind']} database but DATABASE_URL is not {database['kind']}")
+    if database["kind"] == "sqlite":
+        _restore_sqlite(config.DATABASE_URL, repo.snapshot_path(snapshot_id), database)
+    else:
+        _restore_postgres(config.DATABASE_URL, repo.snapshot_path(snapshot_id), database, workers)
+
+    def restore_one(entry) -> str:
+        target = os.path.join(ROOTS[entry["root"]][0], entry["path"])
+        if os.path.exists(target) and os.path.getsize(target) == entry["size"] and hash_file(target)[0] == entry["sha256"]:
+            return "unchanged"
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        work = os.path.join(os.path.dirname(target) or ".", f".restore-{uuid.uuid4().hex}")
+        with open(repo.blob_path(entry["sha256"]), "rb") as src, open(work, "wb") as dst:
+            sha256, _ = copy_and_hash(src, dst)
+        if sha256 != entry["sha256"]:
+            os.remove(work)
+            raise BackupError(f"Blob for {entry['root']}/{entry['path']} is corrupt")
+        os.replace(work, target)
+        return "restored"
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(restore_one, manifest["files"]))
+    return {
+        "snapshot": snapshot_id,
+        "restored": outcomes.count("restored"),
+        "unchanged": outcomes.count("unchanged"),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def prune(repo: Repository, keep: int) -> dict:
+    """Delete all but the newest `keep` snapshots, then every blob no remaining snapshot uses"""
+    lock = repo.lock()
+    try:
+        snapshots = repo.snapshots()
+        removed = snapshots[:-keep] if keep > 0 else snapshots
+        for snapshot_id in removed:
+            shutil.rmtree(repo.snapshot_path(snapshot_id))
+        live = {f["sha256"] for snapshot_id in repo.snapshots() for f in repo.manifest(snapshot_id)["files"]}
+        deleted_blobs = 0
+        if os.path.isdir(repo.blob_dir):
+            for directory, _, names in os.walk(repo.blob_dir):
+                for name in names:
+                    if name not in live:
+                        os.remove(os.path.join(directory, name))
+                        deleted_blobs += 1
+        return {"snapshots_removed": len(removed), "blobs_removed": deleted_blobs}
+    finally:
+        os.remove(lock)
+
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--repository", default=config.BACKUP_DIR)
+    common.add_argument("--workers", type=int, default=config.BACKUP_WORKERS)
+    parser = argparse.ArgumentParser(description="Back up or restore the database and stored files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", parents=[common])
+    commands.add_parser("list", parents=[common])
+    commands.add_parser("verify", parents=[common]).add_argument("snapshot")
+    commands.add_parser("restore", parents=[common]).add_argument("snapshot")
+    commands.add_parser("prune", parents=[common]).add_argument("--keep", type=int, required=True)
+    args = parser.parse_args()
+    repo = Repository(args.repository)
+
+    try:
+        if args.command == "create":
+            manifest = create(repo, args.workers)
+            print(f"{manifest['id']}: {manifest['file_count']} files, {manifest['file_bytes']} bytes, "
+                  f"{manifest['new_blob_bytes']} new, {manifest['seconds']}s")
+        elif args.command == "list":
+            for snapshot_id in repo.snapshots():
+                manifest = repo.manifest(snapshot_id)
+                print(f"{snapshot_id}  {manifest['database']['kind']}  {manifest['file_count']} files  "
+                      f"{manifest['file_bytes']} bytes")
+        elif args.command == "verify":
+            problems = verify(repo, args.snapshot, args.workers)
+            for problem in problems:
+                print(problem)
+            print("ok" if not problems else f"{len(problems)} problems")
+            if problems:
+                raise SystemExit(1)
+        elif args.command == "restore":
+            result = restore(repo, args.snapshot, args.workers)
+            print(f"restored {result['restored']} files ({result['unchanged']} already current) in {result['seconds']}s")
+        elif args.command == "prune":
+            result = prune(repo, args.keep)
+            print(f"removed {result['snapshots_removed']} snapshots and {result['blobs_removed']} blobs")
+    except (BackupError, subprocess.CalledProcessError) as e:
+        parser.exit(1, f"error: {e}\n")
@@ -0,0 +1,118 @@
+"""
+Microbenchmark for list response serialization.
+Fills a throwaway SQLite database with reviews and audit log rows, then times
+building the /reviews and /audit/logs response bodies the old way (ORM objects
+validated through the response_model, or jsonable_encoder, then the stdlib
+encoder) against the Core row fast path.
+
+    python bench_serialization.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def best_of(repeat: int, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list response serialization paths")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # config reads DATABASE_URL at import, so point it at a scratch database first
+    workdir = tempfile.mkdtemp(prefix="bench_serialization_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from sqlalchemy import insert
+    from sqlalchemy.orm import undefer_group
+
+    import audit_archive
+    import projections
+    import serialization
+    from database import SessionLocal, init_db, User, Paper, Review, AuditLog
+    from schemas import ReviewResponse
+
+    init_db()
+    db = SessionLocal()
+    now = datetime.utcnow()
+    db.execute(insert(User), [{"id": 1, "name": "Bench", "email": "bench@example.com", "role": "reviewer",
+                               "hashed_password": "x"}])
+    db.execute(insert(Paper), [{"id": 1, "author_id": 1, "title": "Bench", "file_path": "bench.pdf"}])
+    db.execute(insert(Review), [
+        {
+            "paper_id": 1,
+            "reviewer_id": 1,
+            "review_text": f"Review {i}: " + "The method is sound and the evaluation is thorough. " * 10,
+            "rating": 1 + i % 5,
+            "timestamp": now - timedelta(seconds=i),
+            "author_feedback_rating": (i % 5) or None,
+            "author_feedback_text": "Helpful" if i % 3 == 0 else None
+        }
+        for i in range(args.rows)
+    ])
+    db.execute(insert(AuditLog), [
+        {
+            "user_id": 1,
+            "action": "submit_review",
+            "resource_type": "review",
+            "resource_id": i,
+            "details": json.dumps({"paper_id": 1}),
+            "timestamp": now - timedelta(seconds=i)
+        }
+        for i in range(args.rows)
+    ])
+    db.commit()
+
+    adapter = TypeAdapter(List[ReviewResponse])
+
+    def reviews_orm():
+        # What FastAPI does for response_model=List[ReviewResponse] with ORM objects
+        reviews = db.query(Review).options(undefer_group("text")).all()
+        content = adapter.dump_python(adapter.validate_python(reviews, from_attributes=True), mode="json")
+        db.expunge_all()
+        return JSONResponse(content).body
+
+    def reviews_fast():
+        return projections.project(db.query(Review), Review, projections.requested_fields("reviews")).body
+
+    logs = audit_archive.query_logs(db, limit=args.rows)
+
+    def audit_encoder():
+        return JSONResponse(jsonable_encoder(logs)).body
+
+    def audit_fast():
+        return serialization.FastJSONResponse(logs).body
+
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"{args.rows} rows, best of {args.repeat}, fast path encoder: {encoder}")
+    print(f"{'payload':<14}{'path':<28}{'seconds':>9}{'rows/s':>12}{'MB':>8}")
+    for name, slow_path, fast_path, slow_label in [
+        ("/reviews", reviews_orm, reviews_fast, "ORM + response_model"),
+        ("/audit/logs", audit_encoder, audit_fast, "jsonable_encoder + json"),
+    ]:
+        slow_seconds, slow_body = best_of(args.repeat, slow_path)
+        fast_seconds, fast_body = best_of(args.repeat, fast_path)
+        assert json.loads(slow_body) == json.loads(fast_body), f"{name}: payloads differ"
+        for label, seconds, body in [(slow_label, slow_seconds, slow_body), ("Core rows + fast encoder", fast_seconds, fast_body)]:
+            print(f"{name:<14}{label:<28}{seconds:>9.3f}{args.rows / seconds:>12.0f}{len(body) / 1e6:>8.2f}")
+        print(f"{name:<14}{'speedup':<28}{slow_seconds / fast_seconds:>8.1f}x")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
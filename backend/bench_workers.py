@@ -0,0 +1,100 @@
+"""
+Throughput benchmark for serve.py with increasing worker counts.
+Starts the launcher against a throwaway SQLite database for each worker count,
+waits for /ready, then drives one endpoint from several keep-alive client
+processes for a fixed time and reports requests per second and scaling
+efficiency against one worker.
+
+    python bench_workers.py [--workers 1,2,4] [--clients 16] [--seconds 10] [--path /leaderboard]
+
+The clients run on the same machine and take CPU from the workers, so scaling
+is only meaningful with spare cores (or with a client count well below them).
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def wait_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/ready", trust_env=False).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def client(url: str, seconds: float, counts):
+    done = errors = 0
+    with httpx.Client(trust_env=False) as http:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                if http.get(url).status_code == 200:
+                    done += 1
+                else:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+    counts.put((done, errors))
+
+
+def measure(workers: int, args) -> float:
+    workdir = tempfile.mkdtemp(prefix="bench_workers_")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{workdir}/bench.db", SCHEDULER_ENABLED="false")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py"),
+         "--workers", str(workers), "--host", "127.0.0.1", "--port", str(args.port), "--no-access-log"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_ready(base)
+        counts = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=client, args=(base + args.path, args.seconds, counts))
+            for _ in range(args.clients)
+        ]
+        for process in clients:
+            process.start()
+        results = [counts.get() for _ in clients]
+        for process in clients:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+    errors = sum(e for _, e in results)
+    if errors:
+        print(f"  {workers} workers: {errors} failed requests", file=sys.stderr)
+    return sum(d for d, _ in results) / args.seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure request throughput against serve.py worker count")
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4) if n <= (os.cpu_count() or 1)) or "1")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--path", default="/leaderboard")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"GET {args.path}, {args.clients} clients, {args.seconds:g}s each, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'req/s':>10}{'speedup':>9}{'efficiency':>12}")
+    baseline = None
+    for workers in [int(n) for n in args.workers.split(",")]:
+        rate = measure(workers, args)
+        baseline = baseline or rate / workers
+        print(f"{workers:>8}{rate:>10.0f}{rate / baseline:>8.2f}x{rate / baseline / workers:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
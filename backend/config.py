@@ -6,5 +6,53 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "43200"))
+STREAM_TICKET_SECONDS = int(os.getenv("STREAM_TICKET_SECONDS", "30"))
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./research_tokenizer.db")
 UPLOAD_DIR = "uploads/papers"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "archive/audit_logs")
+AUDIT_HOT_MONTHS = int(os.getenv("AUDIT_HOT_MONTHS", "3"))
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_TIMEOUT_SECONDS = int(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "60"))
+EXTRACTION_MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_MEMORY_LIMIT_MB", "1024"))
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "100"))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT_SECONDS = int(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+EVENT_POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", "0.5"))
+EVENT_RETENTION_SECONDS = int(os.getenv("EVENT_RETENTION_SECONDS", "3600"))
+LEADERBOARD_FEED_SIZE = int(os.getenv("LEADERBOARD_FEED_SIZE", "100"))
+LEADERBOARD_COALESCE_SECONDS = float(os.getenv("LEADERBOARD_COALESCE_SECONDS", "1.0"))
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "600"))
+DEADLINE_SWEEP_SECONDS = int(os.getenv("DEADLINE_SWEEP_SECONDS", "300"))
+REMINDER_HOURS = int(os.getenv("REMINDER_HOURS", "48"))
+SPEED_REVIEW_HOURS = int(os.getenv("SPEED_REVIEW_HOURS", "24"))
+INTEGRITY_SCRUB_SECONDS = int(os.getenv("INTEGRITY_SCRUB_SECONDS", "3600"))
+INTEGRITY_SCRUB_BATCH = int(os.getenv("INTEGRITY_SCRUB_BATCH", "500"))
+INTEGRITY_SCRUB_THREADS = int(os.getenv("INTEGRITY_SCRUB_THREADS", "4"))
+INTEGRITY_SCRUB_MB_PER_SECOND = float(os.getenv("INTEGRITY_SCRUB_MB_PER_SECOND", "50"))
+INTEGRITY_SCRUB_BUDGET_SECONDS = int(os.getenv("INTEGRITY_SCRUB_BUDGET_SECONDS", "300"))  # per run; keep under SCHEDULER_LEASE_SECONDS
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_LATENCY_TOLERANCE = float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "2.0"))
+ADMISSION_CLIENT_SHARE = float(os.getenv("ADMISSION_CLIENT_SHARE", "0.5"))
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
+IDEMPOTENCY_WAIT_SECONDS = int(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_WORKERS = int(os.getenv("BACKUP_WORKERS", "4"))
+STARTUP_BUDGET_MS = int(os.getenv("STARTUP_BUDGET_MS", "500"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "0"))  # 0: one per CPU
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+INVALIDATION_POLL_SECONDS = float(os.getenv("INVALIDATION_POLL_SECONDS", "1.0"))
+INVALIDATION_MAX_STALENESS_SECONDS = float(os.getenv("INVALIDATION_MAX_STALENESS_SECONDS", "10"))
+INVALIDATION_RETENTION_SECONDS = int(os.getenv("INVALIDATION_RETENTION_SECONDS", "3600"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests profiled at random
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_COUNT = int(os.getenv("PROFILE_MAX_COUNT", "200"))
+PROFILE_RETENTION_HOURS = float(os.getenv("PROFILE_RETENTION_HOURS", "24"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+SLOW_QUERY_MAX_FINGERPRINTS = int(os.getenv("SLOW_QUERY_MAX_FINGERPRINTS", "500"))
@@ -1,12 +1,18 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index, LargeBinary, BigInteger
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, deferred
 from datetime import datetime
 import config
 
 # Create engine
 engine = create_engine(config.DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+    @event.listens_for(engine, "connect")
+    def _sqlite_wal(dbapi_connection, connection_record):
+        # Readers (including backup.py's copy) see a snapshot and never block writers, or the reverse
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
 Base = declarative_base()
 
 # Database dependency
@@ -29,8 +35,8 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    # Profile fields
-    bio = Column(Text)
+    # Profile fields (large text is deferred: list queries undefer the "text" group when they need it)
+    bio = deferred(Column(Text), group="text")
     expertise = Column(String)  # comma-separated
     interests = Column(String)  # comma-separated
     
@@ -48,7 +54,7 @@ class Paper(Base):
     id = Column(Integer, primary_key=True, index=True)
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String, nullable=False)
-    abstract = Column(Text)
+    abstract = deferred(Column(Text), group="text")
     file_path = Column(String, nullable=False)
     status = Column(String, default="pending")  # pending/under_review/reviewed/completed
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -65,6 +71,36 @@ class Paper(Base):
     reviews = relationship("Review", back_populates="paper")
 
 
+class PaperText(Base):
+    __tablename__ = "paper_texts"
+    
+    paper_id = Column(Integer, ForeignKey("papers.id"), primary_key=True)
+    status = Column(String, nullable=False)  # ok/failed/timeout/memory_limit
+    text = Column(Text)
+    page_count = Column(Integer)
+    char_count = Column(Integer, default=0)
+    error = Column(String)
+    extracted_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PaperIntegrity(Base):
+    __tablename__ = "paper_integrity"
+    
+    paper_id = Column(Integer, ForeignKey("papers.id"), primary_key=True)
+    sha256 = Column(String)  # hash recorded at upload, or on the first scrub that finds the file
+    size = Column(BigInteger)
+    status = Column(String, nullable=False, default="ok")  # ok/missing/mismatch/error
+    observed_sha256 = Column(String)  # set when the file no longer matches
+    observed_size = Column(BigInteger)
+    error = Column(String)
+    recorded_at = Column(DateTime, default=datetime.utcnow)
+    last_checked_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_paper_integrity_status", "status"),
+    )
+
+
 class ReviewAssignment(Base):
     __tablename__ = "review_assignments"
     
@@ -74,10 +110,19 @@ class ReviewAssignment(Base):
     status = Column(String, default="assigned")  # assigned/in_progress/completed
     deadline = Column(DateTime)
     assigned_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    reminder_sent_at = Column(DateTime)
+    overdue_at = Column(DateTime)
     
     # Relationships
     paper = relationship("Paper", back_populates="review_assignments")
     reviewer = relationship("User", back_populates="review_assignments")
+    
+    # The deadline sweeper scans deadline windows and rows changed since its watermark
+    __table_args__ = (
+        Index("ix_review_assignments_deadline", "deadline"),
+        Index("ix_review_assignments_updated_at", "updated_at"),
+    )
 
 
 class Review(Base):
@@ -88,13 +133,13 @@ class Review(Base):
     reviewer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     assignment_id = Column(Integer, ForeignKey("review_assignments.id"))
     
-    review_text = Column(Text, nullable=False)
+    review_text = deferred(Column(Text, nullable=False), group="text")
     rating = Column(Float)  # optional 1-5 rating
     timestamp = Column(DateTime, default=datetime.utcnow)
     
     # Author feedback
     author_feedback_rating = Column(Float)  # how useful was this review
-    author_feedback_text = Column(Text)
+    author_feedback_text = deferred(Column(Text), group="text")
     
     # Relationships
     paper = relationship("Paper", back_populates="reviews")
@@ -140,6 +185,58 @@ class LeaderboardStats(Base):
     user = relationship("User", back_populates="leaderboard_stats")
 
 
+class Tag(Base):
+    __tablename__ = "tags"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True, index=True)  # normalized: lowercase, single spaces
+
+
+class UserExpertise(Base):
+    __tablename__ = "user_expertise"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_user_expertise_tag_user", "tag_id", "user_id"),
+    )
+
+
+class PaperKeyword(Base):
+    __tablename__ = "paper_keywords"
+    
+    paper_id = Column(Integer, ForeignKey("papers.id"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_paper_keywords_tag_paper", "tag_id", "paper_id"),
+    )
+
+
+class MinHashSignature(Base):
+    __tablename__ = "minhash_signatures"
+    
+    kind = Column(String, primary_key=True)  # paper/review
+    item_id = Column(Integer, primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # 128 little-endian uint32 values
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LshBucket(Base):
+    __tablename__ = "lsh_buckets"
+    
+    # The primary key doubles as the band lookup index: (kind, band, bucket) -> item_id
+    kind = Column(String, primary_key=True)
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    item_id = Column(Integer, primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_lsh_buckets_kind_item", "kind", "item_id"),
+    )
+
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     
@@ -150,6 +247,109 @@ class AuditLog(Base):
     resource_id = Column(Integer)
     details = Column(Text)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    
+    # Every search filter is paired with (timestamp, id) so keyset pages are index range scans
+    __table_args__ = (
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_logs_user_timestamp", "user_id", "timestamp", "id"),
+        Index("ix_audit_logs_action_timestamp", "action", "timestamp", "id"),
+        Index("ix_audit_logs_resource_timestamp", "resource_type", "resource_id", "timestamp", "id"),
+    )
+
+
+class AuditPartition(Base):
+    __tablename__ = "audit_partitions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(String, nullable=False, unique=True)  # YYYY-MM
+    path = Column(String, nullable=False)  # gzip-compressed SQLite archive
+    row_count = Column(Integer, default=0)
+    min_timestamp = Column(DateTime)
+    max_timestamp = Column(DateTime)
+    action_counts = Column(Text)  # JSON {action: count}
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+    
+    name = Column(String, primary_key=True)
+    interval_seconds = Column(Integer, nullable=False)
+    next_run_at = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime)  # lease held by the process running the job
+    locked_by = Column(String)
+    state = Column(Text)  # JSON kept between runs, e.g. watermarks
+    last_started_at = Column(DateTime)
+    last_finished_at = Column(DateTime)
+    last_status = Column(String)  # ok/failed
+    last_result = Column(Text)  # JSON summary of the last successful run
+    last_error = Column(Text)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, nullable=False)  # hash of the caller's credentials
+    key = Column(String, nullable=False)
+    endpoint = Column(String, nullable=False)  # e.g. "POST /papers"
+    request_fingerprint = Column(String)  # idempotency.Fingerprint of the first request, set with its response
+    locked_until = Column(DateTime)  # set while the first request is running
+    response_status = Column(Integer)  # null until the first request finishes
+    response_content_type = Column(String)
+    response_body = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ux_idempotency_keys_scope_key", "scope", "key", unique=True),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+
+class StreamTicket(Base):
+    __tablename__ = "stream_tickets"
+
+    id = Column(Integer, primary_key=True)
+    ticket_hash = Column(String, nullable=False, unique=True)  # sha256 of the ticket; the ticket itself isn't stored
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_stream_tickets_expires_at", "expires_at"),
+    )
+
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True)  # change sequence; AUTOINCREMENT so ids are never reused
+    entity = Column(String, nullable=False)  # user/user_token/leaderboard_stats/token
+    entity_key = Column(Integer)  # null when a bulk statement may have changed any row
+    origin = Column(String, nullable=False)  # host:pid of the writing process
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_change_log_created_at", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class EventLog(Base):
+    __tablename__ = "event_log"
+
+    id = Column(Integer, primary_key=True)  # event sequence shared by all workers; the SSE event id
+    user_id = Column(Integer, nullable=False)
+    event_type = Column(String, nullable=False)
+    data = Column(Text, nullable=False)  # JSON payload
+    origin = Column(String, nullable=False)  # host:pid of the publishing process
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_event_log_user_id", "user_id", "id"),
+        Index("ix_event_log_created_at", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
 
 
 class ReviewProof(Base):
@@ -0,0 +1,223 @@
+"""
+Near-duplicate detection for papers and reviews with MinHash + LSH.
+Each item gets a 128-value MinHash signature of its word 3-gram shingles, and
+the signature is split into 32 bands of 4 rows whose hashes are stored in
+lsh_buckets. Items sharing any band bucket are candidates; their estimated
+Jaccard similarity is then read straight off the signatures. Items with fewer
+than SHINGLE_SIZE words have no shingles; they get an empty signature and no
+buckets, so they match nothing (rather than every other empty item at 1.0).
+
+Scan the full corpus for duplicate pairs with:
+    python dedup.py scan {papers,reviews} [--threshold 0.8]
+"""
+import argparse
+import hashlib
+import re
+import zlib
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, undefer_group
+
+from database import SessionLocal, Paper, PaperText, Review, MinHashSignature, LshBucket
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+HASH_CHUNK = 4096
+
+# Fixed seed so signatures stay comparable across processes and restarts
+_rng = np.random.default_rng(20240613)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str) -> np.ndarray:
+    """Hashes of the text's word shingles; empty for texts too short to form one"""
+    words = WORD_PATTERN.findall((text or "").lower())
+    grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return np.unique(np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams)))
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature using multiply-shift hashing (uint64 arithmetic wraps by design); None without shingles"""
+    values = shingles(text)
+    if not len(values):
+        return None
+    result = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, len(values), HASH_CHUNK):
+        chunk = values[start:start + HASH_CHUNK]
+        hashed = (np.outer(chunk, _A) + _B) >> np.uint64(32)
+        np.minimum(result, hashed.min(axis=0), out=result)
+    return result.astype(np.uint32)
+
+
+def band_buckets(sig: np.ndarray) -> list:
+    """One signed 64-bit bucket key per band"""
+    buckets = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+def _to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def _from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4")
+
+
+def paper_text(paper: Paper, extracted: str = None) -> str:
+    return " ".join(part for part in (paper.title, paper.abstract, paper.keywords, extracted) if part)
+
+
+def index_item(db: Session, kind: str, item_id: int, text: str):
+    """Store the item's signature and replace its LSH buckets (caller commits)"""
+    sig = signature(text)
+    record = db.query(MinHashSignature).filter(
+        MinHashSignature.kind == kind, MinHashSignature.item_id == item_id
+    ).first()
+    if not record:
+        record = MinHashSignature(kind=kind, item_id=item_id)
+        db.add(record)
+    # An empty signature marks the item as indexed without making it a candidate for anything
+    record.signature = _to_bytes(sig) if sig is not None else b""
+    record.updated_at = datetime.utcnow()
+
+    db.query(LshBucket).filter(LshBucket.kind == kind, LshBucket.item_id == item_id).delete(synchronize_session=False)
+    if sig is None:
+        return
+    db.bulk_insert_mappings(LshBucket, [
+        {"kind": kind, "band": band, "bucket": bucket, "item_id": item_id}
+        for band, bucket in enumerate(band_buckets(sig))
+    ])
+
+
+def index_paper(db: Session, paper: Paper):
+    extracted = db.query(PaperText.text).filter(PaperText.paper_id == paper.id, PaperText.status == "ok").scalar()
+    index_item(db, "paper", paper.id, paper_text(paper, extracted))
+
+
+def index_review(db: Session, review: Review):
+    index_item(db, "review", review.id, review.review_text)
+
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def find_similar(db: Session, kind: str, item_id: int, threshold: float = 0.5, limit: int = 20):
+    """Items whose estimated Jaccard similarity to item_id is at least threshold, or None if unindexed"""
+    record = db.query(MinHashSignature).filter(
+        MinHashSignature.kind == kind, MinHashSignature.item_id == item_id
+    ).first()
+    if not record:
+        return None
+    if not record.signature:
+        return []
+    sig = _from_bytes(record.signature)
+
+    keys = list(enumerate(band_buckets(sig)))
+    candidate_ids = [
+        row[0] for row in db.query(LshBucket.item_id).filter(
+            LshBucket.kind == kind,
+            tuple_(LshBucket.band, LshBucket.bucket).in_(keys),
+            LshBucket.item_id != item_id
+        ).distinct()
+    ]
+    if not candidate_ids:
+        return []
+
+    results = []
+    for other_id, data in db.query(MinHashSignature.item_id, MinHashSignature.signature).filter(
+        MinHashSignature.kind == kind, MinHashSignature.item_id.in_(candidate_ids)
+    ):
+        similarity = estimated_similarity(sig, _from_bytes(data))
+        if similarity >= threshold:
+            results.append({"id": other_id, "similarity": similarity})
+    results.sort(key=lambda r: (-r["similarity"], r["id"]))
+    return results[:limit]
+
+
+# ==================== Batch scan ====================
+
+def _index_missing(db: Session, kind: str, batch_size: int = 500) -> int:
+    model = Paper if kind == "paper" else Review
+    indexed = 0
+    while True:
+        items = (
+            db.query(model)
+            .options(undefer_group("text"))
+            .outerjoin(MinHashSignature, (MinHashSignature.kind == kind) & (MinHashSignature.item_id == model.id))
+            .filter(MinHashSignature.item_id.is_(None))
+            .order_by(model.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not items:
+            return indexed
+        if kind == "paper":
+            # One query for the batch's extracted texts rather than one per paper
+            texts = dict(db.query(PaperText.paper_id, PaperText.text).filter(
+                PaperText.paper_id.in_([item.id for item in items]), PaperText.status == "ok"
+            ))
+            for item in items:
+                index_item(db, "paper", item.id, paper_text(item, texts.get(item.id)))
+        else:
+            for item in items:
+                index_review(db, item)
+        db.commit()
+        indexed += len(items)
+
+
+def scan(db: Session, kind: str, threshold: float = 0.8) -> list:
+    """Index anything unsigned, then report every candidate pair above threshold"""
+    _index_missing(db, kind)
+
+    left, right = LshBucket.__table__.alias("a"), LshBucket.__table__.alias("b")
+    pairs = (
+        db.query(left.c.item_id, right.c.item_id)
+        .join(right, (left.c.kind == right.c.kind) & (left.c.band == right.c.band)
+              & (left.c.bucket == right.c.bucket) & (left.c.item_id < right.c.item_id))
+        .filter(left.c.kind == kind)
+        .distinct()
+        .all()
+    )
+    if not pairs:
+        return []
+
+    ids = {item_id for pair in pairs for item_id in pair}
+    signatures = {
+        item_id: _from_bytes(data)
+        for item_id, data in db.query(MinHashSignature.item_id, MinHashSignature.signature).filter(
+            MinHashSignature.kind == kind, MinHashSignature.item_id.in_(ids)
+        )
+    }
+    duplicates = []
+    for a, b in pairs:
+        similarity = estimated_similarity(signatures[a], signatures[b])
+        if similarity >= threshold:
+            duplicates.append((a, b, similarity))
+    duplicates.sort(key=lambda d: -d[2])
+    return duplicates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate papers or reviews")
+    parser.add_argument("command", choices=["scan"])
+    parser.add_argument("kind", choices=["papers", "reviews"])
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        for a, b, similarity in scan(db, args.kind[:-1], args.threshold):
+            print(f"{args.kind[:-1]} {a} ~ {b}: {similarity:.2f}")
+    finally:
+        db.close()
@@ -0,0 +1,343 @@
+"""
+Pub/sub hub behind the /events server-sent events stream.
+Request handlers and jobs publish per-user notifications after they commit.
+Every event is written to the event_log table, and its row id is the SSE event
+id, so ids are global across all workers and survive restarts. The publishing
+worker delivers the event to its own open streams right away. A thread in each
+worker tails the table and delivers the events published by other workers and
+by the standalone scheduler within EVENT_POLL_SECONDS. Like change_log
+(invalidation.py), ids skipped by a still-open transaction are re-checked
+until they appear or MAX_GAP_WAIT_SECONDS pass.
+
+A reconnecting client sends its Last-Event-ID and gets the events it missed
+from the table. It gets a "resync" event instead if more than
+EVENT_HISTORY_SIZE are missing or they may already have been pruned (after
+EVENT_RETENTION_SECONDS, by the event_log_prune job).
+"""
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import config
+from database import SessionLocal, EventLog, engine
+from scheduler import job
+
+# Sent in place of the missed events when a client can't be caught up from the log
+RESYNC = "resync"
+BATCH_SIZE = 1000
+# More missing ids than this in one step aren't waited for
+MAX_GAPS = 1000
+MAX_GAP_WAIT_SECONDS = 30
+
+
+def _origin() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Event:
+    __slots__ = ("id", "type", "data")
+
+    def __init__(self, event_id: int, event_type: str, data: str):
+        self.id = event_id
+        self.type = event_type
+        self.data = data  # JSON, encoded once when published
+
+    def encode(self, with_id: bool = True) -> str:
+        # An event without an id line leaves the client's Last-Event-ID where it was
+        head = f"id: {self.id}\n" if with_id else ""
+        return f"{head}event: {self.type}\ndata: {self.data}\n\n"
+
+
+def _resync(event_id: int, reason: str) -> Event:
+    return Event(event_id, RESYNC, json.dumps({"reason": reason}))
+
+
+class Subscriber:
+    """One open stream: a bounded queue owned by the event loop serving it"""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.lagging = False
+        self.dropped = 0
+
+    def push(self, event: Event):
+        # Handlers run in the threadpool, so hand the event over to the stream's own loop
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, event)
+        except RuntimeError:  # loop already closed
+            pass
+
+    def _deliver(self, event: Event):
+        if self.lagging:
+            self.dropped += 1
+            return
+        if self.queue.full():
+            # A slow client never makes the server buffer without bound: drop its backlog
+            # and tell it to refetch instead
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.lagging = True
+            self.queue.put_nowait(_resync(event.id, "backlog"))
+            return
+        self.queue.put_nowait(event)
+
+    async def next_event(self, timeout: float) -> Optional[Event]:
+        """The next event, or None if nothing arrived within timeout"""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event.type == RESYNC:
+            self.lagging = False
+        return event
+
+
+class EventHub:
+    def __init__(self, history_size: int, queue_size: int, poll_seconds: float):
+        self.history_size = history_size
+        self.queue_size = queue_size
+        self.poll_seconds = poll_seconds
+        self.origin = _origin()
+        self.cursor = None
+        self._gaps: Dict[int, float] = {}  # missing id -> monotonic time first noticed
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.published = 0
+        self.publish_errors = 0
+        self.relayed = 0
+        self.polls = 0
+        self.poll_errors = 0
+
+    def publish(self, user_id: int, event_type: str, data: dict):
+        """Store an event for user_id and queue it for this worker's streams; safe to call from any thread"""
+        self.publish_many([(user_id, event_type, data)])
+
+    def publish_many(self, events: Iterable[Tuple[int, str, dict]]):
+        """Store (user_id, event_type, data) events in one transaction, then queue them like publish()"""
+        now = datetime.utcnow()
+        rows = [
+            {"user_id": user_id, "event_type": event_type, "data": json.dumps(data, default=str),
+             "origin": self.origin, "created_at": now}
+            for user_id, event_type, data in events
+        ]
+        if not rows:
+            return
+        table = EventLog.__table__
+        try:
+            with engine.begin() as conn:
+                ids = conn.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows).scalars().all()
+        except SQLAlchemyError as e:
+            # The change behind the events is already committed; lost notifications must not fail it
+            with self._lock:
+                self.publish_errors += len(rows)
+            print(f"Could not publish {len(rows)} events ({rows[0]['event_type']}, ...): {e}", file=sys.stderr)
+            return
+        deliveries = []
+        with self._lock:
+            for event_id, row in zip(ids, rows):
+                subscribers = self._subscribers.get(row["user_id"])
+                if subscribers:
+                    deliveries.append((list(subscribers), Event(event_id, row["event_type"], row["data"])))
+            self.published += len(rows)
+        for subscribers, event in deliveries:
+            for subscriber in subscribers:
+                subscriber.push(event)
+
+    def subscribe(self, user_id: int, loop: asyncio.AbstractEventLoop) -> Subscriber:
+        subscriber = Subscriber(user_id, loop, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def replay(self, user_id: int, last_event_id: int) -> List[Event]:
+        """Events of user_id after last_event_id, or a single resync event if they can't all be replayed"""
+        db = SessionLocal()
+        try:
+            first_id, last_id = db.query(func.min(EventLog.id), func.max(EventLog.id)).one()
+            rows = (
+                db.query(EventLog.id, EventLog.event_type, EventLog.data)
+                .filter(EventLog.user_id == user_id, EventLog.id > last_event_id)
+                .order_by(EventLog.id)
+                .limit(self.history_size + 1)
+                .all()
+            )
+        finally:
+            db.close()
+        last_id = last_id or 0
+        # Ids from a different database, events that may have been pruned, or too many to replay
+        if (last_event_id > last_id or (first_id is not None and last_event_id < first_id - 1)
+                or len(rows) > self.history_size):
+            return [_resync(last_id, "history")]
+        return [Event(*row) for row in rows]
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.origin = _origin()  # after any fork
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="event-tail", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 5)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                with self._lock:
+                    self.poll_errors += 1
+            self._stop.wait(self.poll_seconds)
+
+    def poll(self) -> int:
+        """Deliver events other processes published since the last poll; returns how many"""
+        db = SessionLocal()
+        try:
+            if self.cursor is None:
+                # Streams opened before this point catch up through Last-Event-ID
+                self.cursor = db.query(func.coalesce(func.max(EventLog.id), 0)).scalar()
+                return 0
+            condition = EventLog.id > self.cursor
+            if self._gaps:
+                condition = or_(condition, EventLog.id.in_(list(self._gaps)))
+            rows = (
+                db.query(EventLog.id, EventLog.user_id, EventLog.event_type, EventLog.data, EventLog.origin)
+                .filter(condition)
+                .order_by(EventLog.id)
+                .limit(BATCH_SIZE)
+                .all()
+            )
+        finally:
+            db.close()
+
+        now = time.monotonic()
+        deliveries = []
+        with self._lock:
+            for event_id, user_id, event_type, data, origin in rows:
+                if event_id in self._gaps:
+                    del self._gaps[event_id]
+                elif event_id > self.cursor:
+                    if event_id - self.cursor - 1 <= MAX_GAPS:
+                        for missing in range(self.cursor + 1, event_id):
+                            self._gaps[missing] = now
+                    self.cursor = event_id
+                if origin == self.origin:
+                    continue  # already delivered by publish()
+                subscribers = self._subscribers.get(user_id)
+                if subscribers:
+                    deliveries.append((list(subscribers), Event(event_id, event_type, data)))
+            for event_id in [e for e, noticed in self._gaps.items() if now - noticed > MAX_GAP_WAIT_SECONDS]:
+                del self._gaps[event_id]  # rolled back, or never coming
+            self.relayed += len(deliveries)
+            self.polls += 1
+
+        for subscribers, event in deliveries:
+            for subscriber in subscribers:
+                subscriber.push(event)
+        return len(deliveries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            streams = [s for subscribers in self._subscribers.values() for s in subscribers]
+            return {
+                "published": self.published,
+                "publish_errors": self.publish_errors,
+                "relayed": self.relayed,
+                "cursor": self.cursor,
+                "polls": self.polls,
+                "poll_errors": self.poll_errors,
+                "pending_gaps": len(self._gaps),
+                "connected_users": len(self._subscribers),
+                "open_streams": len(streams),
+                "dropped": sum(s.dropped for s in streams),
+            }
+
+
+hub = EventHub(config.EVENT_HISTORY_SIZE, config.EVENT_QUEUE_SIZE, config.EVENT_POLL_SECONDS)
+
+
+def token_awarded(user_id: int, token, reason: Optional[str]) -> Tuple[int, str, dict]:
+    """A token.awarded event for publish_many()"""
+    return user_id, "token.awarded", {
+        "token_id": token.id,
+        "name": token.name,
+        "icon": token.icon,
+        "type": token.type,
+        "reason": reason
+    }
+
+
+def publish_token_awarded(user_id: int, token, reason: Optional[str]):
+    hub.publish(*token_awarded(user_id, token, reason))
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def stream(user_id: int, last_event_id: Optional[int] = None, heartbeat: float = None):
+    """SSE body for one client: replayed events, then live ones with comment heartbeats"""
+    heartbeat = heartbeat or config.EVENT_HEARTBEAT_SECONDS
+    # Subscribe before reading the log so nothing published in between is missed
+    subscriber = hub.subscribe(user_id, asyncio.get_running_loop())
+    try:
+        backlog = []
+        if last_event_id is not None:
+            backlog = await run_in_threadpool(hub.replay, user_id, last_event_id)
+        replayed = {event.id for event in backlog if event.type != RESYNC}
+        last_sent = last_event_id or 0
+        yield "retry: 3000\n: connected\n\n"
+        for event in backlog:
+            yield event.encode()
+            last_sent = max(last_sent, event.id)
+        while True:
+            event = await subscriber.next_event(heartbeat)
+            if event is None:
+                # Heartbeats keep proxies from closing an idle connection
+                yield ": ping\n\n"
+            elif event.id not in replayed:
+                # An event arriving after a higher id goes out without its id, so a
+                # reconnect still resumes after the highest id the client has seen
+                yield event.encode(with_id=event.id > last_sent or event.type == RESYNC)
+                last_sent = max(last_sent, event.id)
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+@job("event_log_prune", 600)
+def prune_event_log(db: Session, state: dict, now: datetime) -> dict:
+    cutoff = now - timedelta(seconds=config.EVENT_RETENTION_SECONDS)
+    result = db.execute(delete(EventLog).where(EventLog.created_at < cutoff))
+    db.commit()
+    return {"deleted": result.rowcount}
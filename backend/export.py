@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select
+
+import audit_archive
+from database import SessionLocal, Review, ReviewAssignment, AuditLog
+
+# Exportable resources and the table backing each of them
+EXPORTABLE = {
+    "reviews": Review,
+    "assignments": ReviewAssignment,
+    "audit_logs": AuditLog,
+}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+BATCH_SIZE = 1000
+CHUNK_BYTES = 64 * 1024
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_rows(model):
+    """Yield (columns, row) pairs from a server-side cursor in fixed-size batches"""
+    columns = [column.name for column in model.__table__.columns]
+    stmt = select(*model.__table__.columns).order_by(model.__table__.c.id)
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+        for row in result:
+            yield columns, row
+    finally:
+        db.close()
+
+
+def iter_resource_rows(model):
+    """Rows of a resource, including archived audit log partitions"""
+    if model is AuditLog:
+        yield from audit_archive.iter_archived_rows()
+    yield from iter_rows(model)
+
+
+def iter_ndjson(model):
+    for columns, row in iter_resource_rows(model):
+        record = {name: _encode_value(value) for name, value in zip(columns, row)}
+        yield (json.dumps(record) + "\n").encode()
+
+
+def iter_csv(model):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, row in iter_resource_rows(model):
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerow([_encode_value(value) for value in row])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if not header_written:
+        writer.writerow([column.name for column in model.__table__.columns])
+        yield buffer.getvalue().encode()
+
+
+def chunked(lines):
+    """Coalesce small lines into larger chunks, flushing the first line immediately"""
+    pending = []
+    size = 0
+    first = True
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if first or size >= CHUNK_BYTES:
+            yield b"".join(pending)
+            pending = []
+            size = 0
+            first = False
+    if pending:
+        yield b"".join(pending)
+
+
+def gzipped(chunks):
+    """Gzip a byte stream, sync-flushing each chunk so clients see data as it is produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(resource: str, fmt: str, gzip: bool = False):
+    """Build the byte stream for an export of one resource"""
+    model = EXPORTABLE[resource]
+    lines = iter_ndjson(model) if fmt == "ndjson" else iter_csv(model)
+    stream = chunked(lines)
+    if gzip:
+        stream = gzipped(stream)
+    return stream
@@ -0,0 +1,206 @@
+"""
+Background PDF text extraction.
+Uploaded papers are handed to a process pool after create_paper commits; each
+job runs with a wall-clock timeout and an address-space limit, and the result
+lands in the paper_texts table.
+
+Backfill existing papers across all cores with:
+    python extraction.py backfill [--workers N]
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import config
+from database import SessionLocal, Paper, PaperText
+
+MAX_ERROR_LENGTH = 500
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _init_worker(memory_limit_mb: int):
+    """Cap the worker's address space so a hostile PDF can't exhaust the host"""
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def extract_text(paper_id: int, file_path: str, timeout: int) -> dict:
+    """Extract all page text from one PDF (runs inside a worker process)"""
+    result = {"paper_id": paper_id, "status": "ok", "text": None, "page_count": None, "error": None}
+    use_alarm = hasattr(signal, "SIGALRM")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.alarm(timeout)
+    try:
+        from pypdf import PdfReader
+        reader = PdfReader(file_path)
+        pages = [page.extract_text() or "" for page in reader.pages]
+        result["text"] = "\n".join(pages)
+        result["page_count"] = len(pages)
+    except ExtractionTimeout:
+        result["status"] = "timeout"
+        result["error"] = f"Extraction exceeded {timeout}s"
+    except MemoryError:
+        result["status"] = "memory_limit"
+        result["error"] = "Extraction exceeded the memory limit"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH]
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+    return result
+
+
+def store_result(result: dict):
+    db = SessionLocal()
+    try:
+        record = db.query(PaperText).filter(PaperText.paper_id == result["paper_id"]).first()
+        if not record:
+            record = PaperText(paper_id=result["paper_id"])
+            db.add(record)
+        record.status = result["status"]
+        record.text = result["text"]
+        record.page_count = result["page_count"]
+        record.char_count = len(result["text"]) if result["text"] else 0
+        record.error = result["error"]
+        record.extracted_at = datetime.utcnow()
+        if result["status"] == "ok":
+            # Re-sign the paper now that its full text is known
+            paper = db.query(Paper).filter(Paper.id == result["paper_id"]).first()
+            if paper:
+                # Imported here so worker processes never load NumPy under their memory limit
+                import dedup
+                db.flush()
+                dedup.index_paper(db, paper)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _failed(paper_id: int, error: str) -> dict:
+    return {"paper_id": paper_id, "status": "failed", "text": None, "page_count": None, "error": error}
+
+
+def _new_executor(workers: int) -> ProcessPoolExecutor:
+    # spawn, not fork: the server process has live threads and database connections
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(config.EXTRACTION_MEMORY_LIMIT_MB,),
+    )
+
+
+class ExtractionPool:
+    """Lazily started process pool that extracts uploads in the background"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = _new_executor(self.workers)
+            return self._executor
+
+    def _reset(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, paper_id: int, file_path: str):
+        """Queue a paper for extraction; returns immediately"""
+        executor = self._get_executor()
+        try:
+            future = executor.submit(extract_text, paper_id, file_path, config.EXTRACTION_TIMEOUT_SECONDS)
+        except BrokenProcessPool:
+            self._reset(executor)
+            executor = self._get_executor()
+            future = executor.submit(extract_text, paper_id, file_path, config.EXTRACTION_TIMEOUT_SECONDS)
+        future.add_done_callback(lambda f: self._on_done(executor, paper_id, f))
+
+    def _on_done(self, executor: ProcessPoolExecutor, paper_id: int, future):
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OS); record the failure and start a fresh pool
+            self._reset(executor)
+            result = _failed(paper_id, "Extraction worker crashed")
+        except Exception as e:
+            result = _failed(paper_id, f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH])
+        store_result(result)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool = ExtractionPool(config.EXTRACTION_WORKERS)
+
+
+def backfill(workers: int = None, include_failed: bool = False) -> dict:
+    """Extract every paper without stored text, in parallel across all cores"""
+    db = SessionLocal()
+    try:
+        query = db.query(Paper.id, Paper.file_path).outerjoin(PaperText, PaperText.paper_id == Paper.id)
+        if include_failed:
+            query = query.filter((PaperText.paper_id.is_(None)) | (PaperText.status != "ok"))
+        else:
+            query = query.filter(PaperText.paper_id.is_(None))
+        jobs = query.order_by(Paper.id).all()
+    finally:
+        db.close()
+
+    counts = {}
+    executor = _new_executor(workers or os.cpu_count() or 1)
+    try:
+        futures = {
+            executor.submit(extract_text, paper_id, file_path, config.EXTRACTION_TIMEOUT_SECONDS): paper_id
+            for paper_id, file_path in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = _failed(futures[future], f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH])
+            store_result(result)
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+    finally:
+        executor.shutdown()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract text from stored paper PDFs")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--retry-failed", action="store_true", help="also retry papers whose extraction failed")
+    args = parser.parse_args()
+    counts = backfill(args.workers, include_failed=args.retry_failed)
+    print(", ".join(f"{status}: {n}" for status, n in sorted(counts.items())) or "Nothing to extract")
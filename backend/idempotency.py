@@ -0,0 +1,279 @@
+"""
+Idempotency-Key support for expensive POST endpoints.
+The first request with a key claims a row in idempotency_keys and runs
+normally; its response is stored for IDEMPOTENCY_TTL_HOURS. A retry with the
+same key (from the same credentials) gets the stored response back without the
+handler running, so no file is written and no stats, tokens or audit entries are
+repeated. A duplicate that arrives while the first is still running waits for
+it; if the first fails with a 5xx or the connection drops, the key is released
+and the next retry runs for real. A retry whose body or content headers differ
+from the first request's (see Fingerprint) is refused with 422 rather than
+answered with the first request's response.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+import config
+from database import SessionLocal, IdempotencyKey
+from scheduler import job
+
+IDEMPOTENT_ROUTES = {("POST", "/papers"), ("POST", "/reviews")}
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.1
+
+NEW = "new"
+REPLAY = "replay"
+BUSY = "busy"
+MISMATCH = "mismatch"
+
+
+def _storable(status: int) -> bool:
+    """Server errors and throttling are worth retrying, so they don't stick to the key"""
+    return status < 500 and status != 429
+
+
+class Fingerprint:
+    """Hash of what a retry has to repeat: Content-Type, Content-Length and the body
+
+    Bodies are hashed as they stream past, so uploads are never buffered. A
+    multipart body is hashed part by part (part headers and data) without its
+    boundary, which clients pick anew for every attempt.
+    """
+
+    def __init__(self, headers: dict):
+        content_type = headers.get(b"content-type", b"")
+        media_type, params = parse_options_header(content_type)
+        self._digest = hashlib.sha256()
+        self._parser = None
+        if media_type == b"multipart/form-data" and params.get(b"boundary"):
+            content_type = media_type
+            self._header = b""
+            self._parser = MultipartParser(params[b"boundary"], {
+                "on_part_begin": lambda: self._digest.update(b"\0part\0"),
+                "on_header_field": self._on_header,
+                "on_header_value": self._on_header,
+                "on_header_end": self._on_header_end,
+                "on_part_data": lambda data, start, end: self._digest.update(data[start:end]),
+            })
+        self._digest.update(content_type + b"\0" + headers.get(b"content-length", b"") + b"\0")
+
+    def _on_header(self, data: bytes, start: int, end: int):
+        self._header += data[start:end]
+
+    def _on_header_end(self):
+        self._digest.update(self._header + b"\0")
+        self._header = b""
+
+    def update(self, chunk: bytes):
+        if self._parser is not None:
+            try:
+                self._parser.write(chunk)
+                return
+            except Exception:
+                # A malformed body fails in the handler too; fall back to raw bytes from here on
+                self._parser = None
+                self._digest.update(b"\0raw\0")
+        self._digest.update(chunk)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def claim(scope: str, key: str, endpoint: str, now: Optional[datetime] = None):
+    """(NEW, row id) if this request should run, (REPLAY, row) for a stored response, (BUSY, None) or (MISMATCH, None)"""
+    now = now or datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for _ in range(3):
+            fresh = IdempotencyKey(
+                scope=scope,
+                key=key,
+                endpoint=endpoint,
+                locked_until=now + timedelta(seconds=config.IDEMPOTENCY_LOCK_SECONDS),
+                created_at=now,
+                expires_at=now + timedelta(hours=config.IDEMPOTENCY_TTL_HOURS)
+            )
+            db.add(fresh)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+            else:
+                return NEW, fresh.id
+
+            record = db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key
+            ).first()
+            if record is None:
+                continue  # released between our insert and this read
+            if record.expires_at <= now:
+                db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record.id))
+                db.commit()
+                continue
+            if record.endpoint != endpoint:
+                return MISMATCH, None
+            if record.response_status is not None:
+                db.expunge(record)
+                return REPLAY, record
+            if record.locked_until is not None and record.locked_until < now:
+                # The first request's worker died; take the key over
+                taken = db.execute(
+                    update(IdempotencyKey)
+                    .where(IdempotencyKey.id == record.id, IdempotencyKey.locked_until == record.locked_until)
+                    .values(locked_until=now + timedelta(seconds=config.IDEMPOTENCY_LOCK_SECONDS))
+                )
+                db.commit()
+                if taken.rowcount == 1:
+                    return NEW, record.id
+            return BUSY, None
+        return BUSY, None
+    finally:
+        db.close()
+
+
+def complete(record_id: int, status: int, content_type: Optional[str], body: bytes, fingerprint: str):
+    db = SessionLocal()
+    try:
+        db.execute(update(IdempotencyKey).where(IdempotencyKey.id == record_id).values(
+            locked_until=None,
+            request_fingerprint=fingerprint,
+            response_status=status,
+            response_content_type=content_type,
+            response_body=body
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def release(record_id: int):
+    db = SessionLocal()
+    try:
+        db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.id == record_id, IdempotencyKey.response_status.is_(None)
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+@job("idempotency_purge", 3600)
+def purge_expired(db: Session, state: dict, now: datetime) -> dict:
+    result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+    db.commit()
+    return {"deleted": result.rowcount}
+
+
+class IdempotencyMiddleware:
+    """Replay stored responses for repeated Idempotency-Key requests to IDEMPOTENT_ROUTES"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(b"idempotency-key", b"").decode("latin-1").strip()
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await self._send_json(send, 400, {"detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"})
+            return
+
+        # Keys are scoped to the caller's credentials, like the response cache
+        authorization = headers.get(b"authorization", b"")
+        key_scope = hashlib.sha256(authorization).hexdigest()[:16] if authorization else ""
+        endpoint = f"{scope['method']} {scope['path']}"
+
+        deadline = time.monotonic() + config.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            outcome, record = await run_in_threadpool(claim, key_scope, key, endpoint)
+            if outcome != BUSY:
+                break
+            if time.monotonic() >= deadline:
+                await self._send_json(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"},
+                                      [(b"retry-after", b"1")])
+                return
+            await asyncio.sleep(POLL_SECONDS)
+
+        if outcome == MISMATCH:
+            await self._send_json(send, 422, {"detail": "Idempotency-Key was already used for a different endpoint"})
+            return
+        fingerprint = Fingerprint(headers)
+        if outcome == REPLAY:
+            if not await self._drain(receive, fingerprint):
+                return
+            # Keys stored before fingerprints were recorded match any body
+            if record.request_fingerprint not in (None, fingerprint.hexdigest()):
+                await self._send_json(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+                return
+            await self._send(send, record.response_status, record.response_content_type, record.response_body,
+                             [(b"idempotent-replayed", b"true")])
+            return
+
+        record_id = record
+        start_message = {}
+        chunks = []
+        body_read = False
+
+        async def hashed_receive():
+            nonlocal body_read
+            message = await receive()
+            if message["type"] == "http.request":
+                fingerprint.update(message.get("body", b""))
+                body_read = not message.get("more_body", False)
+            return message
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        stored = False
+        try:
+            await self.app(scope, hashed_receive, capture)
+            status = start_message.get("status", 500)
+            # A handler may answer without reading the whole body; the rest still counts
+            if _storable(status) and (body_read or await self._drain(receive, fingerprint)):
+                content_type = dict(start_message.get("headers", [])).get(b"content-type", b"").decode("latin-1")
+                await run_in_threadpool(complete, record_id, status, content_type or None, b"".join(chunks),
+                                        fingerprint.hexdigest())
+                stored = True
+        finally:
+            if not stored:
+                await asyncio.shield(run_in_threadpool(release, record_id))
+
+    async def _drain(self, receive, fingerprint: Fingerprint):
+        """Read the rest of the request body into fingerprint; False if the client disconnected first"""
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return False
+            fingerprint.update(message.get("body", b""))
+            if not message.get("more_body", False):
+                return True
+
+    async def _send(self, send, status: int, content_type: Optional[str], body: bytes, extra_headers=()):
+        headers = [(b"content-length", str(len(body)).encode()), *extra_headers]
+        if content_type:
+            headers.insert(0, (b"content-type", content_type.encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _send_json(self, send, status: int, payload: dict, extra_headers=()):
+        await self._send(send, status, "application/json", json.dumps(payload).encode(), extra_headers)
@@ -0,0 +1,245 @@
+"""
+Integrity scrubbing for stored paper files.
+The SHA-256 and size of every upload are recorded in paper_integrity. A
+scheduled job walks papers in id order from a checkpoint, re-hashes batches of
+files on a thread pool with large reads (throttled to
+INTEGRITY_SCRUB_MB_PER_SECOND of disk reads), and records whether each file is
+ok, missing or mismatched. Each run keeps going batch after batch until
+INTEGRITY_SCRUB_BUDGET_SECONDS have passed or it completes a full pass.
+Papers uploaded before hashes were recorded are baselined on their first scrub.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import config
+from database import Paper, PaperIntegrity, AuditLog
+from scheduler import job
+
+READ_SIZE = 1024 * 1024
+MAX_ERROR_LENGTH = 500
+
+OK = "ok"
+MISSING = "missing"
+MISMATCH = "mismatch"
+ERROR = "error"
+
+
+class RateLimiter:
+    """Token bucket over bytes per second, shared by all hashing threads"""
+
+    def __init__(self, bytes_per_second: float):
+        self.rate = bytes_per_second
+        self._lock = threading.Lock()
+        self._allowance = bytes_per_second
+        self._last = time.monotonic()
+
+    def consume(self, n: int):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+            self._last = now
+            self._allowance -= n
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+def hash_file(path: str, limiter: Optional[RateLimiter] = None) -> Tuple[str, int]:
+    """SHA-256 and size of a file, read in large unbuffered chunks (hashlib releases the GIL)"""
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray(READ_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            if limiter is not None:
+                limiter.consume(n)
+            digest.update(view[:n])
+            size += n
+    return digest.hexdigest(), size
+
+
+def copy_and_hash(source: BinaryIO, destination: BinaryIO) -> Tuple[str, int]:
+    """Copy an upload to disk, hashing it on the way"""
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(READ_SIZE)
+        if not chunk:
+            break
+        destination.write(chunk)
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def record_upload(db: Session, paper_id: int, sha256: str, size: int):
+    """Store the hash of a freshly written file (caller commits)"""
+    now = datetime.utcnow()
+    record = db.get(PaperIntegrity, paper_id)
+    if not record:
+        record = PaperIntegrity(paper_id=paper_id)
+        db.add(record)
+    record.sha256 = sha256
+    record.size = size
+    record.status = OK
+    record.observed_sha256 = None
+    record.observed_size = None
+    record.error = None
+    record.recorded_at = now
+    record.last_checked_at = now
+
+
+def check_file(path: Optional[str], expected_sha256: Optional[str], expected_size: Optional[int],
+               limiter: Optional[RateLimiter] = None) -> dict:
+    """Compare a stored file with its recorded hash (runs on a scrubber thread)"""
+    result = {"status": OK, "sha256": None, "size": None, "error": None}
+    try:
+        if not path:
+            raise FileNotFoundError()
+        size = os.path.getsize(path)
+        if expected_size is not None and size != expected_size:
+            # A size change is already a mismatch; no need to read the file
+            result.update(status=MISMATCH, size=size)
+            return result
+        sha256, size = hash_file(path, limiter)
+        result.update(sha256=sha256, size=size)
+        if expected_sha256 is not None and sha256 != expected_sha256:
+            result["status"] = MISMATCH
+    except FileNotFoundError:
+        result["status"] = MISSING
+    except OSError as e:
+        result.update(status=ERROR, error=f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH])
+    return result
+
+
+def _store(db: Session, paper_id: int, result: dict, now: datetime) -> Optional[str]:
+    """Record one check; returns the new status if the paper just went bad"""
+    record = db.get(PaperIntegrity, paper_id)
+    if record is None:
+        record = PaperIntegrity(paper_id=paper_id, recorded_at=now)
+        db.add(record)
+    if record.sha256 is None and result["status"] == OK:
+        # No hash was recorded at upload: this scrub's hash becomes the baseline
+        record.sha256 = result["sha256"]
+        record.size = result["size"]
+        record.recorded_at = now
+    previous = record.status
+    record.status = result["status"]
+    record.observed_sha256 = result["sha256"] if result["status"] == MISMATCH else None
+    record.observed_size = result["size"] if result["status"] == MISMATCH else None
+    record.error = result["error"]
+    record.last_checked_at = now
+    return record.status if record.status != OK and previous != record.status else None
+
+
+def _check_batch(db: Session, checkpoint: int, limiter: RateLimiter, now: datetime) -> Tuple[list, dict, int]:
+    """Check and record the papers after checkpoint; returns (rows, status counts, bytes hashed)"""
+    rows = (
+        db.query(Paper.id, Paper.file_path, PaperIntegrity.sha256, PaperIntegrity.size)
+        .outerjoin(PaperIntegrity, PaperIntegrity.paper_id == Paper.id)
+        .filter(Paper.id > checkpoint)
+        .order_by(Paper.id)
+        .limit(config.INTEGRITY_SCRUB_BATCH)
+        .all()
+    )
+    with ThreadPoolExecutor(max_workers=config.INTEGRITY_SCRUB_THREADS) as executor:
+        results = list(executor.map(lambda row: check_file(row[1], row[2], row[3], limiter), rows))
+
+    counts = {OK: 0, MISSING: 0, MISMATCH: 0, ERROR: 0}
+    bytes_read = 0
+    for row, result in zip(rows, results):
+        counts[result["status"]] += 1
+        if result["sha256"] is not None:
+            bytes_read += result["size"]
+        failure = _store(db, row.id, result, now)
+        if failure:
+            db.add(AuditLog(action="integrity_failure", resource_type="paper", resource_id=row.id,
+                            details=json.dumps({"status": failure})))
+    db.commit()
+    return rows, counts, bytes_read
+
+
+@job("integrity_scrub", config.INTEGRITY_SCRUB_SECONDS)
+def scrub(db: Session, state: dict, now: datetime) -> dict:
+    """Check batches of papers from the checkpoint until the run's time budget is spent or a pass completes"""
+    limiter = RateLimiter(config.INTEGRITY_SCRUB_MB_PER_SECOND * 1024 * 1024)
+    started = time.monotonic()
+    counts = {OK: 0, MISSING: 0, MISMATCH: 0, ERROR: 0}
+    checked = bytes_read = batches = 0
+    # At least one batch per run; with reads throttled, the time budget also caps the bytes read
+    while True:
+        rows, batch_counts, batch_bytes = _check_batch(db, state.get("checkpoint", 0), limiter, now)
+        batches += 1
+        checked += len(rows)
+        bytes_read += batch_bytes
+        for status, count in batch_counts.items():
+            counts[status] += count
+        if len(rows) < config.INTEGRITY_SCRUB_BATCH:
+            state["checkpoint"] = 0
+            state["passes"] = state.get("passes", 0) + 1
+            state["last_full_pass_at"] = now.isoformat()
+            break
+        state["checkpoint"] = rows[-1].id
+        if time.monotonic() - started >= config.INTEGRITY_SCRUB_BUDGET_SECONDS:
+            break
+    elapsed = time.monotonic() - started
+    state["files_checked"] = state.get("files_checked", 0) + checked
+    state["bytes_read"] = state.get("bytes_read", 0) + bytes_read
+
+    return {
+        "checked": checked,
+        "batches": batches,
+        **counts,
+        "bytes_read": bytes_read,
+        "seconds": round(elapsed, 3),
+        "mb_per_second": round(bytes_read / elapsed / (1024 * 1024), 2) if elapsed > 0 else None
+    }
+
+
+def status_counts(db: Session) -> dict:
+    counts = dict(db.query(PaperIntegrity.status, func.count()).group_by(PaperIntegrity.status).all())
+    recorded = sum(counts.values())
+    counts["unverified"] = db.query(func.count(Paper.id)).scalar() - recorded
+    return counts
+
+
+def problems(db: Session, limit: int = 100, offset: int = 0) -> list:
+    rows = (
+        db.query(PaperIntegrity, Paper.title, Paper.file_path)
+        .join(Paper, Paper.id == PaperIntegrity.paper_id)
+        .filter(PaperIntegrity.status != OK)
+        .order_by(PaperIntegrity.paper_id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "paper_id": record.paper_id,
+            "title": title,
+            "file_path": file_path,
+            "status": record.status,
+            "sha256": record.sha256,
+            "observed_sha256": record.observed_sha256,
+            "size": record.size,
+            "observed_size": record.observed_size,
+            "error": record.error,
+            "last_checked_at": record.last_checked_at
+        }
+        for record, title, file_path in rows
+    ]
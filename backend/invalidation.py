@@ -0,0 +1,268 @@
+"""
+Cross-worker invalidation of in-process caches.
+Each worker (serve.py) keeps its own response cache, live leaderboard and
+reviewer matching index. The worker that handles a write invalidates its own
+copies directly. Session hooks also append (entity, key) rows for every change
+to a User, UserToken, LeaderboardStats or Token to the change_log table, in the
+same transaction as the write. A thread in every worker polls the table and
+drops whatever the other workers' changes made stale. No broker is involved,
+only the database all workers already share.
+
+Staleness is bounded:
+- Changes reach other workers within INVALIDATION_POLL_SECONDS of commit.
+- The sequence can skip an id while a transaction is still open, or when it
+  rolled back (Postgres). If the id still hasn't appeared after
+  INVALIDATION_MAX_STALENESS_SECONDS, the worker clears everything.
+- If polling keeps failing for that long, the worker clears everything too.
+Old rows are pruned by the change_log_prune job.
+"""
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, event, func, insert, or_
+from sqlalchemy.orm import Session
+
+import config
+import leaderboard_feed
+from database import SessionLocal, ChangeLog, LeaderboardStats, Token, User, UserToken
+from response_cache import response_cache
+from scheduler import job
+
+# model -> (entity name, attribute used as the key)
+TRACKED = {
+    User: ("user", "id"),
+    UserToken: ("user_token", "user_id"),
+    LeaderboardStats: ("leaderboard_stats", "user_id"),
+    Token: ("token", "id"),
+}
+BATCH_SIZE = 1000
+# More missing ids than this in one step is treated as lost changes
+MAX_GAPS = 1000
+
+
+def _origin() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _record(session: Session, changes: set):
+    now = datetime.utcnow()
+    origin = _origin()
+    session.connection().execute(insert(ChangeLog.__table__), [
+        {"entity": entity, "entity_key": key, "origin": origin, "created_at": now}
+        for entity, key in changes
+    ])
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _after_flush(session: Session, flush_context):
+    changes = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tracked = TRACKED.get(type(obj))
+        if tracked is None or (obj in session.dirty and not session.is_modified(obj)):
+            continue
+        entity, attribute = tracked
+        changes.add((entity, getattr(obj, attribute)))
+    if changes:
+        _record(session, changes)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _after_bulk_statement(state):
+    """Record bulk INSERT/UPDATE/DELETE statements, which bypass the flush"""
+    if not (state.is_insert or state.is_update or state.is_delete) or state.bind_mapper is None:
+        return
+    tracked = TRACKED.get(state.bind_mapper.class_)
+    if tracked is None:
+        return
+    entity, attribute = tracked
+    params = state.parameters
+    rows = params if isinstance(params, list) else [params] if params else []
+    keys = {row.get(attribute) for row in rows} if state.is_insert and rows else {None}
+    if None in keys:
+        keys = {None}
+    _record(state.session, {(entity, key) for key in keys})
+
+
+def _reviewer_index():
+    # Only once matching (and scipy) is loaded; an unloaded index has nothing stale
+    matching = sys.modules.get("matching")
+    return matching.reviewer_index if matching is not None else None
+
+
+def clear_all():
+    response_cache.clear()
+    leaderboard_feed.mark_dirty()
+    index = _reviewer_index()
+    if index is not None:
+        index.invalidate()
+
+
+def apply(entity: str, key: Optional[int]):
+    """Drop this worker's cached copies of one changed entity (key None: any row)"""
+    if entity == "token" or key is None:
+        # Token details are embedded in every user's token list; there is no tag to target
+        clear_all()
+    elif entity == "user":
+        response_cache.invalidate(f"user:{key}", "reviewers", "leaderboard")
+        leaderboard_feed.mark_dirty()
+        index = _reviewer_index()
+        if index is not None:
+            index.invalidate()
+    elif entity == "user_token":
+        response_cache.invalidate("leaderboard", f"user_tokens:{key}")
+        leaderboard_feed.mark_dirty()
+    elif entity == "leaderboard_stats":
+        response_cache.invalidate("leaderboard")
+        leaderboard_feed.mark_dirty()
+
+
+class InvalidationBus:
+    """Background thread applying other workers' changes from change_log"""
+
+    def __init__(self, poll_seconds: float, max_staleness: float):
+        self.poll_seconds = poll_seconds
+        self.max_staleness = max_staleness
+        self.origin = _origin()
+        self.cursor = None
+        self._gaps: Dict[int, float] = {}  # missing id -> monotonic time first noticed
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_success = None
+        self.polls = 0
+        self.errors = 0
+        self.applied = 0
+        self.skipped_own = 0
+        self.full_clears = 0
+        self.lag_last = None
+        self.lag_max = 0.0
+        self._lag_total = 0.0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.origin = _origin()  # after any fork
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 5)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                    stale = self._last_success is not None and time.monotonic() - self._last_success > self.max_staleness
+                    if stale:
+                        self._last_success = None  # clear once per outage, again after recovering
+                if stale:
+                    self._full_clear()
+            self._stop.wait(self.poll_seconds)
+
+    def _full_clear(self):
+        clear_all()
+        with self._lock:
+            self.full_clears += 1
+
+    def poll(self) -> int:
+        """Apply changes committed since the last poll; returns how many were applied"""
+        db = SessionLocal()
+        try:
+            if self.cursor is None:
+                # Nothing is cached yet, so history before now doesn't matter
+                self.cursor = db.query(func.coalesce(func.max(ChangeLog.id), 0)).scalar()
+                self._last_success = time.monotonic()
+                return 0
+            condition = ChangeLog.id > self.cursor
+            if self._gaps:
+                condition = or_(condition, ChangeLog.id.in_(list(self._gaps)))
+            rows = (
+                db.query(ChangeLog.id, ChangeLog.entity, ChangeLog.entity_key, ChangeLog.origin, ChangeLog.created_at)
+                .filter(condition)
+                .order_by(ChangeLog.id)
+                .limit(BATCH_SIZE)
+                .all()
+            )
+        finally:
+            db.close()
+
+        now = time.monotonic()
+        changes = set()
+        with self._lock:
+            # Polls were missed for too long; changes may already have been pruned
+            clear = self._last_success is not None and now - self._last_success > self.max_staleness
+            for change_id, entity, key, origin, created_at in rows:
+                if change_id in self._gaps:
+                    del self._gaps[change_id]
+                elif change_id > self.cursor:
+                    if change_id - self.cursor - 1 > MAX_GAPS:
+                        clear = True
+                    else:
+                        for missing in range(self.cursor + 1, change_id):
+                            self._gaps[missing] = now
+                    self.cursor = change_id
+                if origin == self.origin:
+                    self.skipped_own += 1
+                    continue
+                changes.add((entity, key))
+                lag = max((datetime.utcnow() - created_at).total_seconds(), 0.0)
+                self.lag_last = lag
+                self.lag_max = max(self.lag_max, lag)
+                self._lag_total += lag
+                self.applied += 1
+            expired = [change_id for change_id, noticed in self._gaps.items() if now - noticed > self.max_staleness]
+            for change_id in expired:
+                del self._gaps[change_id]
+            clear = clear or bool(expired)
+            self.polls += 1
+            self._last_success = now
+
+        if clear:
+            self._full_clear()
+        else:
+            for entity, key in changes:
+                apply(entity, key)
+        return len(changes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "origin": self.origin,
+                "running": self._thread is not None,
+                "cursor": self.cursor,
+                "polls": self.polls,
+                "errors": self.errors,
+                "applied": self.applied,
+                "skipped_own": self.skipped_own,
+                "pending_gaps": len(self._gaps),
+                "full_clears": self.full_clears,
+                "seconds_since_poll": time.monotonic() - self._last_success if self._last_success else None,
+                "lag_seconds": {
+                    "last": self.lag_last,
+                    "max": self.lag_max,
+                    "avg": self._lag_total / self.applied if self.applied else None,
+                },
+            }
+
+
+bus = InvalidationBus(config.INVALIDATION_POLL_SECONDS, config.INVALIDATION_MAX_STALENESS_SECONDS)
+
+
+@job("change_log_prune", 600)
+def prune_change_log(db: Session, state: dict, now: datetime) -> dict:
+    cutoff = now - timedelta(seconds=config.INVALIDATION_RETENTION_SECONDS)
+    result = db.execute(delete(ChangeLog).where(ChangeLog.created_at < cutoff))
+    db.commit()
+    return {"deleted": result.rowcount}
@@ -0,0 +1,172 @@
+"""
+Live leaderboard feed behind /leaderboard/stream.
+Writers call mark_dirty() after committing a LeaderboardStats change. One
+background task per event loop waits out a short coalescing window, recomputes
+the top entries once, and broadcasts the same encoded delta to every viewer,
+so the query cost is per change rather than per viewer.
+"""
+import asyncio
+import json
+import threading
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import config
+from database import SessionLocal, LeaderboardStats, User
+
+
+def top_entries(db: Session, limit: int = 100) -> List[dict]:
+    stats = db.query(LeaderboardStats, User).join(User).order_by(
+        LeaderboardStats.ranking_score.desc()
+    ).limit(limit).all()
+
+    result = []
+    for stat, user in stats:
+        result.append({
+            "user_id": user.id,
+            "name": user.name,
+            "total_reviews": stat.total_reviews,
+            "total_tokens": stat.total_tokens,
+            "ranking_score": stat.ranking_score,
+            "level": stat.level
+        })
+
+    return result
+
+
+def diff_entries(old: List[dict], new: List[dict]) -> Optional[dict]:
+    """Entries whose rank or values changed plus the user ids that left, or None if identical"""
+    previous = {entry["user_id"]: entry for entry in old}
+    current_ids = {entry["user_id"] for entry in new}
+    changed = [entry for entry in new if previous.get(entry["user_id"]) != entry]
+    removed = [user_id for user_id in previous if user_id not in current_ids]
+    if not changed and not removed:
+        return None
+    return {"changed": changed, "removed": removed}
+
+
+def _message(event_type: str, version: int, data: dict) -> str:
+    return f"id: {version}\nevent: {event_type}\ndata: {json.dumps({'version': version, **data})}\n\n"
+
+
+class LeaderboardFeed:
+    def __init__(self, size: int, window: float, queue_size: int):
+        self.size = size
+        self.window = window
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._loop = None
+        self._dirty = None
+        self._task = None
+        self._compute_lock = None
+        self._subscribers = set()
+        self._entries = None
+        self._snapshot = None
+        self.version = 0
+        self.computations = 0
+
+    def mark_dirty(self):
+        """Schedule a recompute; safe to call from any thread"""
+        with self._lock:
+            loop, dirty = self._loop, self._dirty
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(dirty.set)
+        except RuntimeError:  # loop already closed
+            pass
+
+    def _compute(self) -> List[dict]:
+        db = SessionLocal()
+        try:
+            entries = top_entries(db, self.size)
+        finally:
+            db.close()
+        self.computations += 1
+        return [{"rank": rank, **entry} for rank, entry in enumerate(entries, start=1)]
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # First viewer on this loop: everything loop-bound is created here
+        with self._lock:
+            self._loop = loop
+            self._dirty = asyncio.Event()
+        self._compute_lock = asyncio.Lock()
+        self._subscribers = set()
+        self._entries = None
+        self._task = loop.create_task(self._run())
+
+    def _set_entries(self, entries: List[dict]):
+        self._entries = entries
+        self.version += 1
+        self._snapshot = _message("snapshot", self.version, {"entries": entries})
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            # Coalesce a burst of writes into a single recompute
+            await asyncio.sleep(self.window)
+            self._dirty.clear()
+            if not self._subscribers:
+                self._entries = None
+                continue
+            async with self._compute_lock:
+                entries = await run_in_threadpool(self._compute)
+                delta = diff_entries(self._entries or [], entries)
+                if delta is None:
+                    continue
+                self._set_entries(entries)
+                message = _message("delta", self.version, delta)
+            for queue in list(self._subscribers):
+                self._deliver(queue, message)
+
+    def _deliver(self, queue: asyncio.Queue, message: str):
+        if queue.full():
+            # A viewer that can't keep up skips the backlog and starts over from a snapshot
+            while not queue.empty():
+                queue.get_nowait()
+            message = self._snapshot
+        queue.put_nowait(message)
+
+    async def subscribe(self):
+        """Register a viewer and return (queue, encoded snapshot)"""
+        self._ensure_started()
+        async with self._compute_lock:
+            if self._entries is None:
+                self._set_entries(await run_in_threadpool(self._compute))
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            self._subscribers.add(queue)
+            return queue, self._snapshot
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def stats(self) -> dict:
+        return {"viewers": len(self._subscribers), "version": self.version, "computations": self.computations}
+
+
+feed = LeaderboardFeed(config.LEADERBOARD_FEED_SIZE, config.LEADERBOARD_COALESCE_SECONDS, config.EVENT_QUEUE_SIZE)
+
+
+def mark_dirty():
+    feed.mark_dirty()
+
+
+async def stream(heartbeat: float = None):
+    """SSE body for one viewer: a snapshot, then deltas as they're broadcast"""
+    heartbeat = heartbeat or config.EVENT_HEARTBEAT_SECONDS
+    queue, snapshot = await feed.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        yield snapshot
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+    finally:
+        feed.unsubscribe(queue)
@@ -1,23 +1,65 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+import time
+
+# Measured by /ready; taken before the framework and app module imports below
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session, undefer
 from typing import List, Optional
 from datetime import datetime, timedelta
 import os
-import shutil
 import hashlib
 import json
+import sys
 
-from database import get_db, init_db
-from database import User, Paper, Review, ReviewAssignment, UserToken, LeaderboardStats, AuditLog, ReviewProof
+from database import get_db, init_db, SessionLocal
+import migrations
+from database import User, Paper, Review, ReviewAssignment, UserToken, LeaderboardStats, AuditLog, AuditPartition, PaperText, PaperIntegrity, ReviewProof, ScheduledJob
 from database import Token as TokenModel
 from schemas import *
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from auth import get_password_hash, verify_password, create_access_token, get_current_user, get_stream_user, create_stream_ticket
+import audit_archive  # registers the audit_rollover job
+import events
+import export
+import extraction
+import integrity  # registers the integrity_scrub job
+import invalidation
+import leaderboard_feed
+import profiling
+import projections
+import scheduler
+import search
+import serialization
+import slow_queries
+import sweeper  # registers the deadline_sweep job
+import tags
+import user_import
+from response_cache import response_cache, ResponseCacheMiddleware
+from admission import admission, AdmissionMiddleware
+from idempotency import IdempotencyMiddleware
 import config
 
 app = FastAPI(title="Research Paper Review Tokenizer")
 
+# Admission control sits inside the response cache, so cache hits never wait for a slot
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Outside admission control, so replays and duplicates waiting on the first request hold no slot
+app.add_middleware(IdempotencyMiddleware)
+
+# Response cache for hot read-mostly endpoints (added first so CORS wraps cached responses)
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
+# Opt-in request profiling; outside the cache so cache hits can be profiled too
+app.add_middleware(profiling.ProfilingMiddleware, sample_rate=config.PROFILE_SAMPLE_RATE,
+                   interval_ms=config.PROFILE_INTERVAL_MS)
+
+# Outside everything that queries, so each slow query can be traced to its route
+app.add_middleware(slow_queries.QueryRouteMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -25,36 +67,81 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Response headers the API sets for clients; browsers hide non-safelisted ones from scripts otherwise
+    expose_headers=["X-Next-Cursor", "X-Profile-Id", "Retry-After", "ETag", "Idempotent-Replayed"],
 )
 
+# Set once startup has finished; /ready reports 503 until then
+startup_timings: Optional[dict] = None
+
 # Initialize database on startup
 @app.on_event("startup")
 def startup_event():
-    init_db()
+    global startup_timings
+    started = time.perf_counter()
+    # create_all() reflects every table, so skip it once the migrations are at head
+    if not migrations.at_head():
+        init_db()
+        migrations.run_migrations()
     # Create upload directory
     os.makedirs(config.UPLOAD_DIR, exist_ok=True)
     # Initialize default tokens
-    db = next(get_db())
-    initialize_default_tokens(db)
+    with SessionLocal() as db:
+        initialize_default_tokens(db)
+    invalidation.bus.start()
+    events.hub.start()
+    if config.SCHEDULER_ENABLED:
+        scheduler.scheduler.start()
+    startup_seconds = time.perf_counter() - started
+    startup_timings = {
+        "import_ms": round(IMPORT_SECONDS * 1000, 1),
+        "startup_ms": round(startup_seconds * 1000, 1),
+        "total_ms": round((IMPORT_SECONDS + startup_seconds) * 1000, 1),
+        "budget_ms": config.STARTUP_BUDGET_MS,
+    }
+    if startup_timings["total_ms"] > config.STARTUP_BUDGET_MS:
+        print(f"Startup took {startup_timings['total_ms']} ms, over the {config.STARTUP_BUDGET_MS} ms budget", file=sys.stderr)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    scheduler.scheduler.stop()
+    invalidation.bus.stop()
+    events.hub.stop()
+    extraction.pool.shutdown()
+
+DEFAULT_TOKENS = [
+    {"name": "First Review", "description": "Completed your first review", "type": "badge", "icon": "🌟", "criteria": "Complete 1 review"},
+    {"name": "Prolific Reviewer", "description": "Completed 10 reviews", "type": "badge", "icon": "🏆", "criteria": "Complete 10 reviews"},
+    {"name": "Expert Reviewer", "description": "Completed 50 reviews", "type": "badge", "icon": "💎", "criteria": "Complete 50 reviews"},
+    {"name": "Highly Rated", "description": "Received 5-star feedback", "type": "achievement", "icon": "⭐", "criteria": "Get 5-star author feedback"},
+    {"name": "Speed Reviewer", "description": "Completed review within 24 hours", "type": "achievement", "icon": "⚡", "criteria": "Complete review in 24 hours"},
+    {"name": "Premium Access", "description": "Access to premium research papers", "type": "access", "icon": "🔓", "criteria": "Earn 100 ranking points"},
+]
 
 def initialize_default_tokens(db: Session):
-    """Create default token types if they don't exist"""
-    default_tokens = [
-        {"name": "First Review", "description": "Completed your first review", "type": "badge", "icon": "🌟", "criteria": "Complete 1 review"},
-        {"name": "Prolific Reviewer", "description": "Completed 10 reviews", "type": "badge", "icon": "🏆", "criteria": "Complete 10 reviews"},
-        {"name": "Expert Reviewer", "description": "Completed 50 reviews", "type": "badge", "icon": "💎", "criteria": "Complete 50 reviews"},
-        {"name": "Highly Rated", "description": "Received 5-star feedback", "type": "achievement", "icon": "⭐", "criteria": "Get 5-star author feedback"},
-        {"name": "Speed Reviewer", "description": "Completed review within 24 hours", "type": "achievement", "icon": "⚡", "criteria": "Complete review in 24 hours"},
-        {"name": "Premium Access", "description": "Access to premium research papers", "type": "access", "icon": "🔓", "criteria": "Earn 100 ranking points"},
-    ]
-    
-    for token_data in default_tokens:
-        existing = db.query(TokenModel).filter(TokenModel.name == token_data["name"]).first()
-        if not existing:
-            token = TokenModel(**token_data)
-            db.add(token)
-    
+    """Create default token types if they don't exist, in one INSERT .. ON CONFLICT DO NOTHING"""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    result = db.execute(upsert(TokenModel).values(DEFAULT_TOKENS).on_conflict_do_nothing(index_elements=["name"]))
     db.commit()
+    if result.rowcount:
+        response_cache.invalidate("achievements")
+
+def _update_reviewer_index(user: Optional[User] = None):
+    """Refresh one reviewer in the matching index, or drop it for a rebuild when user is None
+    
+    Nothing to do when matching (and scipy) hasn't been imported yet: the index is
+    built from the database on first use.
+    """
+    matching = sys.modules.get("matching")
+    if matching is None:
+        return
+    if user is None:
+        matching.reviewer_index.invalidate()
+    else:
+        matching.reviewer_index.upsert(user)
 
 # ==================== Authentication APIs ====================
 
@@ -90,6 +177,11 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     db.add(log)
     db.commit()
     
+    if user.role == "reviewer":
+        response_cache.invalidate("reviewers", "leaderboard")
+        leaderboard_feed.mark_dirty()
+        _update_reviewer_index(db_user)
+    
     return db_user
 
 @app.post("/auth/login", response_model=Token)
@@ -112,6 +204,11 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/auth/stream-ticket", response_model=StreamTicketResponse)
+def issue_stream_ticket(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get a short-lived, single-use ticket for opening /events from an EventSource"""
+    return {"ticket": create_stream_ticket(current_user, db), "expires_in": config.STREAM_TICKET_SECONDS}
+
 @app.get("/auth/me", response_model=UserResponse)
 def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Get current logged-in user information"""
@@ -136,6 +233,7 @@ def update_user_profile(
         user.bio = user_update.bio
     if user_update.expertise is not None:
         user.expertise = user_update.expertise
+        tags.set_user_expertise(db, {user.id: user.expertise})
     if user_update.interests is not None:
         user.interests = user_update.interests
     
@@ -147,8 +245,39 @@ def update_user_profile(
     db.add(log)
     db.commit()
     
+    response_cache.invalidate(f"user:{user_id}", "reviewers")
+    _update_reviewer_index(user)
+    
     return user
 
+@app.post("/users/import", response_model=UserImportResponse)
+def import_users(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create users in bulk from a CSV or JSON Lines upload (admin only)
+    
+    Each row needs email, name and password; role defaults to reviewer and
+    affiliation, bio, expertise and interests are optional.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can import users")
+    
+    fmt = format or user_import.detect_format(file.filename)
+    if fmt not in user_import.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(user_import.FORMATS)}")
+    
+    result = user_import.import_users(db, file.file, fmt, actor_id=current_user.id)
+    
+    if result["reviewers"]:
+        response_cache.invalidate("reviewers", "leaderboard")
+        leaderboard_feed.mark_dirty()
+        _update_reviewer_index()
+    
+    return result
+
 @app.get("/users/{user_id}", response_model=UserResponse)
 def get_user_profile(user_id: int, db: Session = Depends(get_db)):
     """Get user profile by ID"""
@@ -157,15 +286,38 @@ def get_user_profile(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-@app.get("/reviewers", response_model=List[UserResponse])
-def list_reviewers(expertise: Optional[str] = None, db: Session = Depends(get_db)):
-    """List all reviewers, optionally filtered by expertise"""
-    query = db.query(User).filter(User.role == "reviewer")
-    
-    if expertise:
-        query = query.filter(User.expertise.contains(expertise))
-    
-    return query.all()
+@app.get("/reviewers", response_model=None, responses=projections.responses("reviewers"))
+def list_reviewers(
+    expertise: Optional[str] = None,
+    match: str = "any",
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """List all reviewers, optionally filtered by comma-separated expertise tags
+    
+    With match=any reviewers need at least one of the tags and those matching
+    more tags come first; with match=all they need every tag. fields (comma-separated)
+    or view=summary return only some columns.
+    """
+    if match not in ("any", "all"):
+        raise HTTPException(status_code=400, detail="match must be 'any' or 'all'")
+    try:
+        columns = projections.requested_fields("reviewers", fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if expertise and tags.split_tags(expertise):
+        query = tags.find_reviewers(db, expertise, match_all=match == "all")
+    else:
+        query = db.query(User).filter(User.role == "reviewer")
+    
+    return projections.project(query, User, columns)
+
+@app.get("/reviewers/expertise")
+def list_reviewer_expertise(prefix: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    """Count reviewers per expertise tag, most common first"""
+    return tags.expertise_counts(db, prefix=prefix, limit=min(limit, 500))
 
 # ==================== Paper Management APIs ====================
 
@@ -190,7 +342,7 @@ async def create_paper(
     file_path = os.path.join(config.UPLOAD_DIR, filename)
     
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        file_hash, file_size = integrity.copy_and_hash(file.file, buffer)
     
     # Create paper record
     paper = Paper(
@@ -207,13 +359,37 @@ async def create_paper(
     db.commit()
     db.refresh(paper)
     
+    tags.set_paper_keywords(db, {paper.id: keywords})
+    import dedup
+    dedup.index_paper(db, paper)
+    integrity.record_upload(db, paper.id, file_hash, file_size)
+    
     # Log the action
     log = AuditLog(user_id=current_user.id, action="upload_paper", resource_type="paper", resource_id=paper.id)
     db.add(log)
     db.commit()
     
+    # Text extraction runs in a worker process; the upload returns without waiting for it
+    extraction.pool.submit(paper.id, paper.file_path)
+    
     return paper
 
+@app.get("/papers/search", response_model=List[PaperSearchResult])
+def search_papers(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over paper titles, abstracts and keywords, best matches first"""
+    limit = max(1, min(limit, 100))
+    
+    # Authors only see their own papers, as in list_papers
+    author_id = current_user.id if current_user.role == "author" else None
+    
+    return search.search_papers(db, q, limit=limit, offset=max(offset, 0), author_id=author_id)
+
 @app.get("/papers/{paper_id}", response_model=PaperResponse)
 def get_paper(paper_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Get paper details"""
@@ -222,14 +398,21 @@ def get_paper(paper_id: int, db: Session = Depends(get_db), current_user: User =
         raise HTTPException(status_code=404, detail="Paper not found")
     return paper
 
-@app.get("/papers", response_model=List[PaperResponse])
+@app.get("/papers", response_model=None, responses=projections.responses("papers"))
 def list_papers(
     author_id: Optional[int] = None,
     status: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List papers with optional filters"""
+    """List papers with optional filters; fields (comma-separated) or view=summary return only some columns"""
+    try:
+        columns = projections.requested_fields("papers", fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     query = db.query(Paper)
     
     # If not admin, only show own papers for authors
@@ -241,7 +424,7 @@ def list_papers(
     if status:
         query = query.filter(Paper.status == status)
     
-    return query.all()
+    return projections.project(query, Paper, columns)
 
 @app.patch("/papers/{paper_id}", response_model=PaperResponse)
 def update_paper(
@@ -264,6 +447,9 @@ def update_paper(
     paper.category = paper_update.category
     paper.domain = paper_update.domain
     paper.updated_at = datetime.utcnow()
+    tags.set_paper_keywords(db, {paper.id: paper.keywords})
+    import dedup
+    dedup.index_paper(db, paper)
     
     db.commit()
     db.refresh(paper)
@@ -275,6 +461,83 @@ def update_paper(
     
     return paper
 
+@app.get("/papers/{paper_id}/text", response_model=PaperTextResponse)
+def get_paper_text(
+    paper_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the text extracted from a paper's PDF"""
+    paper = db.query(Paper).filter(Paper.id == paper_id).first()
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    
+    # Same access rules as downloading the PDF itself
+    is_author = current_user.id == paper.author_id
+    is_assigned_reviewer = db.query(ReviewAssignment).filter(
+        ReviewAssignment.paper_id == paper_id,
+        ReviewAssignment.reviewer_id == current_user.id
+    ).first() is not None
+    is_admin = current_user.role == "admin"
+    
+    if not (is_author or is_assigned_reviewer or is_admin):
+        raise HTTPException(status_code=403, detail="Not authorized to view this paper")
+    
+    paper_text = db.query(PaperText).filter(PaperText.paper_id == paper_id).first()
+    if not paper_text:
+        raise HTTPException(status_code=404, detail="Text extraction has not finished yet")
+    return paper_text
+
+@app.get("/papers/{paper_id}/similar", response_model=List[SimilarItem])
+def get_similar_papers(
+    paper_id: int,
+    threshold: float = 0.5,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Find near-duplicate submissions of a paper (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can run duplicate detection")
+    
+    import dedup
+    similar = dedup.find_similar(db, "paper", paper_id, threshold=threshold, limit=limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    return similar
+
+@app.get("/papers/{paper_id}/suggested-reviewers", response_model=List[ReviewerSuggestion])
+def get_suggested_reviewers(
+    paper_id: int,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Reviewers whose profiles best match the paper, excluding conflicts and existing assignments"""
+    paper = db.query(Paper).filter(Paper.id == paper_id).first()
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    
+    if current_user.id != paper.author_id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    import matching
+    return matching.suggest_reviewers(db, [paper], limit=max(1, min(limit, 100)))[0]["reviewers"]
+
+@app.get("/matching/suggest", response_model=List[PaperReviewerSuggestions])
+def suggest_reviewers_for_pending(
+    limit: int = 5,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Suggested reviewers for every pending paper (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can run reviewer matching")
+    
+    papers = db.query(Paper).options(undefer(Paper.abstract)).filter(Paper.status == "pending").order_by(Paper.id).all()
+    import matching
+    return matching.suggest_reviewers(db, papers, limit=max(1, min(limit, 100)))
+
 @app.get("/papers/{paper_id}/download")
 def download_paper(
     paper_id: int,
@@ -388,6 +651,13 @@ def create_assignment(
         db.add(log)
         db.commit()
         
+        events.hub.publish(reviewer.id, "assignment.created", {
+            "assignment_id": db_assignment.id,
+            "paper_id": paper.id,
+            "paper_title": paper.title,
+            "deadline": db_assignment.deadline
+        })
+        
         return {"message": "Reviewer assigned successfully", "assignment_id": db_assignment.id}
 
     
@@ -402,9 +672,118 @@ def create_assignment(
     db.add(log)
     db.commit()
     
+    events.hub.publish(reviewer.id, "assignment.created", {
+        "assignment_id": db_assignment.id,
+        "paper_id": paper.id,
+        "paper_title": paper.title,
+        "deadline": db_assignment.deadline
+    })
+    
     return db_assignment
 
-@app.get("/assignments", response_model=List[ReviewAssignmentResponse])
+@app.post("/assignments/bulk", response_model=BulkAssignmentResponse)
+def create_bulk_assignments(
+    request: BulkAssignmentRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Assign reviewers to many papers at once, balancing load across reviewers (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can create assignments")
+    
+    query = db.query(Paper).options(undefer(Paper.abstract))
+    if request.paper_ids is not None:
+        query = query.filter(Paper.id.in_(request.paper_ids))
+    else:
+        query = query.filter(Paper.status == "pending")
+    papers = query.order_by(Paper.id).all()
+    
+    # Existing assignments count against both the paper's need and the reviewer's capacity
+    existing_per_paper = dict(
+        db.query(ReviewAssignment.paper_id, func.count(ReviewAssignment.id))
+        .filter(ReviewAssignment.paper_id.in_([p.id for p in papers]))
+        .group_by(ReviewAssignment.paper_id)
+        .all()
+    )
+    open_per_reviewer = dict(
+        db.query(ReviewAssignment.reviewer_id, func.count(ReviewAssignment.id))
+        .filter(ReviewAssignment.status != "completed")
+        .group_by(ReviewAssignment.reviewer_id)
+        .all()
+    )
+    
+    # numpy/scipy take longer to import than the rest of the app, so only load them here
+    import numpy as np
+    import assignment_solver
+    import matching
+    
+    k = max(request.candidates_per_paper, request.reviewers_per_paper)
+    reviewer_ids, _, candidate_rows, candidate_scores = matching.candidate_scores(db, papers, k)
+    overrides = request.reviewer_capacity or {}
+    need = np.array([max(request.reviewers_per_paper - existing_per_paper.get(p.id, 0), 0) for p in papers])
+    capacity = np.array([
+        max(overrides.get(reviewer_id, request.max_per_reviewer) - open_per_reviewer.get(reviewer_id, 0), 0)
+        for reviewer_id in reviewer_ids
+    ])
+    
+    solution = assignment_solver.solve_assignment(need, capacity, candidate_rows, candidate_scores)
+    items = [
+        {"paper_id": papers[p].id, "reviewer_id": reviewer_ids[r], "score": score}
+        for p, r, score in solution
+    ]
+    
+    filled = {}
+    for item in items:
+        filled[item["paper_id"]] = filled.get(item["paper_id"], 0) + 1
+    unfilled = {
+        paper.id: int(need[i]) - filled.get(paper.id, 0)
+        for i, paper in enumerate(papers)
+        if int(need[i]) > filled.get(paper.id, 0)
+    }
+    
+    if items and not request.dry_run:
+        # All rows, status changes and the audit entry commit in a single transaction
+        now = datetime.utcnow()
+        db.execute(insert(ReviewAssignment), [
+            {
+                "paper_id": item["paper_id"],
+                "reviewer_id": item["reviewer_id"],
+                "deadline": request.deadline,
+                "status": "assigned",
+                "assigned_at": now
+            }
+            for item in items
+        ])
+        db.query(Paper).filter(Paper.id.in_(list(filled))).update(
+            {"status": "under_review", "updated_at": now}, synchronize_session=False
+        )
+        log = AuditLog(
+            user_id=current_user.id,
+            action="bulk_assign_reviewers",
+            resource_type="assignment",
+            details=json.dumps({"assignments": len(items), "papers": len(filled)})
+        )
+        db.add(log)
+        db.commit()
+        
+        titles = {paper.id: paper.title for paper in papers}
+        events.hub.publish_many(
+            (item["reviewer_id"], "assignment.created", {
+                "paper_id": item["paper_id"],
+                "paper_title": titles[item["paper_id"]],
+                "deadline": request.deadline
+            })
+            for item in items
+        )
+    
+    return {
+        "created": 0 if request.dry_run else len(items),
+        "assignments": items,
+        "unfilled": unfilled,
+        "dry_run": request.dry_run
+    }
+
+@app.get("/assignments", response_model=None, responses=projections.responses("assignments"))
 def list_assignments(
     reviewer_id: Optional[int] = None,
     paper_id: Optional[int] = None,
@@ -423,7 +802,7 @@ def list_assignments(
     if paper_id:
         query = query.filter(ReviewAssignment.paper_id == paper_id)
     
-    return query.all()
+    return projections.project(query, ReviewAssignment, projections.requested_fields("assignments"))
 
 @app.post("/reviews", response_model=ReviewResponse)
 def submit_review(
@@ -484,21 +863,40 @@ def submit_review(
     # Generate proof for this review
     generate_review_proof(db_review.id, db)
     
+    import dedup
+    dedup.index_review(db, db_review)
+    
     # Log the action
     log = AuditLog(user_id=current_user.id, action="submit_review", resource_type="review", resource_id=db_review.id)
     db.add(log)
     db.commit()
     
+    response_cache.invalidate("leaderboard", f"user_tokens:{current_user.id}")
+    leaderboard_feed.mark_dirty()
+    events.hub.publish(paper.author_id, "review.submitted", {
+        "review_id": db_review.id,
+        "paper_id": paper.id,
+        "paper_title": paper.title,
+        "rating": db_review.rating
+    })
+    
     return db_review
 
-@app.get("/reviews", response_model=List[ReviewResponse])
+@app.get("/reviews", response_model=None, responses=projections.responses("reviews"))
 def list_reviews(
     paper_id: Optional[int] = None,
     reviewer_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List reviews"""
+    """List reviews; fields (comma-separated) or view=summary return only some columns"""
+    try:
+        columns = projections.requested_fields("reviews", fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     query = db.query(Review)
     
     if paper_id:
@@ -520,7 +918,7 @@ def list_reviews(
     if current_user.role == "reviewer":
         query = query.filter(Review.reviewer_id == current_user.id)
     
-    return query.all()
+    return projections.project(query, Review, columns)
 
 @app.get("/reviews/{review_id}", response_model=ReviewResponse)
 def get_review(
@@ -540,6 +938,24 @@ def get_review(
     
     return review
 
+@app.get("/reviews/{review_id}/similar", response_model=List[SimilarItem])
+def get_similar_reviews(
+    review_id: int,
+    threshold: float = 0.5,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Find near-identical reviews to detect copy-pasted review text (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can run duplicate detection")
+    
+    import dedup
+    similar = dedup.find_similar(db, "review", review_id, threshold=threshold, limit=limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    return similar
+
 @app.post("/reviews/{review_id}/feedback", response_model=ReviewResponse)
 def add_review_feedback(
     review_id: int,
@@ -560,6 +976,8 @@ def add_review_feedback(
     review.author_feedback_rating = feedback.author_feedback_rating
     review.author_feedback_text = feedback.author_feedback_text
     
+    awarded = None
+    
     # Update reviewer's ranking score based on feedback
     if feedback.author_feedback_rating:
         stats = db.query(LeaderboardStats).filter(LeaderboardStats.user_id == review.reviewer_id).first()
@@ -584,6 +1002,7 @@ def add_review_feedback(
                         )
                         db.add(user_token)
                         stats.total_tokens += 1
+                        awarded = (highly_rated_token, user_token.reason)
     
     db.commit()
     db.refresh(review)
@@ -593,8 +1012,47 @@ def add_review_feedback(
     db.add(log)
     db.commit()
     
+    response_cache.invalidate("leaderboard", f"user_tokens:{review.reviewer_id}")
+    leaderboard_feed.mark_dirty()
+    notifications = [(review.reviewer_id, "review.feedback", {
+        "review_id": review.id,
+        "paper_id": review.paper_id,
+        "rating": review.author_feedback_rating
+    })]
+    if awarded:
+        notifications.append(events.token_awarded(review.reviewer_id, *awarded))
+    events.hub.publish_many(notifications)
+    
     return review
 
+# ==================== Notification APIs ====================
+
+@app.get("/events")
+async def stream_events(
+    last_event_id: Optional[str] = Header(None),
+    resume_from: Optional[str] = Query(None, alias="last_event_id", description="Last-Event-ID for clients reconnecting with a new ticket"),
+    current_user: User = Depends(get_stream_user)
+):
+    """Server-sent events for the current user: new assignments, reviews, feedback and tokens.
+    
+    Browsers open it with ?ticket= from POST /auth/stream-ticket. Reconnecting
+    clients send Last-Event-ID (or ?last_event_id= along with a new ticket) and
+    receive what they missed, or a "resync" event when it can no longer be replayed.
+    """
+    return StreamingResponse(
+        events.stream(current_user.id, events.parse_last_event_id(last_event_id or resume_from)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/events/stats")
+def get_event_stats(current_user: User = Depends(get_current_user)):
+    """Get event hub counters (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access event stats")
+    
+    return {**events.hub.stats(), "leaderboard": leaderboard_feed.feed.stats()}
+
 # ==================== Token & Leaderboard APIs ====================
 
 def award_review_tokens(user_id: int, db: Session):
@@ -603,6 +1061,8 @@ def award_review_tokens(user_id: int, db: Session):
     if not stats:
         return
     
+    awarded = []
+    
     milestones = [
         (1, "First Review"),
         (10, "Prolific Reviewer"),
@@ -627,6 +1087,7 @@ def award_review_tokens(user_id: int, db: Session):
                     )
                     db.add(user_token)
                     stats.total_tokens += 1
+                    awarded.append((token, user_token.reason))
     
     # Premium access for high ranking score
     if stats.ranking_score >= 100:
@@ -644,8 +1105,11 @@ def award_review_tokens(user_id: int, db: Session):
                 )
                 db.add(user_token)
                 stats.total_tokens += 1
+                awarded.append((premium_token, user_token.reason))
     
     db.commit()
+    
+    events.hub.publish_many(events.token_awarded(user_id, token, reason) for token, reason in awarded)
 
 @app.post("/tokens/award", response_model=UserTokenResponse)
 def award_token_manually(
@@ -688,6 +1152,10 @@ def award_token_manually(
     db.add(log)
     db.commit()
     
+    response_cache.invalidate("leaderboard", f"user_tokens:{award.user_id}")
+    leaderboard_feed.mark_dirty()
+    events.publish_token_awarded(award.user_id, token, user_token.reason)
+    
     return user_token
 
 @app.get("/users/{user_id}/tokens", response_model=List[UserTokenResponse])
@@ -699,22 +1167,20 @@ def get_user_tokens(user_id: int, db: Session = Depends(get_db)):
 @app.get("/leaderboard", response_model=List[LeaderboardEntry])
 def get_leaderboard(limit: int = 100, db: Session = Depends(get_db)):
     """Get reviewer leaderboard"""
-    stats = db.query(LeaderboardStats, User).join(User).order_by(
-        LeaderboardStats.ranking_score.desc()
-    ).limit(limit).all()
-    
-    result = []
-    for stat, user in stats:
-        result.append({
-            "user_id": user.id,
-            "name": user.name,
-            "total_reviews": stat.total_reviews,
-            "total_tokens": stat.total_tokens,
-            "ranking_score": stat.ranking_score,
-            "level": stat.level
-        })
-    
-    return result
+    return leaderboard_feed.top_entries(db, limit)
+
+@app.get("/leaderboard/stream")
+async def stream_leaderboard():
+    """Server-sent leaderboard feed: a ranked snapshot, then only changed entries.
+    
+    Deltas list the entries whose rank or values changed and the user ids that
+    dropped out of the top entries; changes are coalesced over a short window.
+    """
+    return StreamingResponse(
+        leaderboard_feed.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/achievements", response_model=List[TokenTypeResponse])
 def list_achievements(db: Session = Depends(get_db)):
@@ -796,16 +1262,220 @@ def generate_proof(
 
 @app.get("/audit/logs")
 def get_audit_logs(
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Search audit logs, newest first (admin only)
+    
+    Pages are keyset-paginated: pass the X-Next-Cursor header of one page as
+    `cursor` to fetch the next one.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access audit logs")
+    
+    before = None
+    if cursor:
+        try:
+            before = audit_archive.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Only the hot table and archived partitions overlapping the range are read
+    logs = audit_archive.query_logs(
+        db,
+        limit=limit,
+        start=start,
+        end=end,
+        before=before,
+        user_id=user_id,
+        action=action,
+        resource_type=resource_type,
+        resource_id=resource_id
+    )
+    headers = {}
+    if logs and len(logs) == limit:
+        headers["X-Next-Cursor"] = audit_archive.encode_cursor(logs[-1])
+    return serialization.FastJSONResponse(logs, headers=headers)
+
+@app.get("/audit/stats/actions")
+def get_audit_action_counts(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Count audit log entries per action within [start, end) (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access audit logs")
+    
+    return audit_archive.count_actions(db, start=start, end=end)
+
+@app.get("/audit/partitions")
+def list_audit_partitions(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get audit logs (admin only)"""
+    """List archived monthly audit log partitions (admin only)"""
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can access audit logs")
     
-    logs = db.query(AuditLog).order_by(AuditLog.timestamp.desc()).limit(limit).all()
-    return logs
+    partitions = db.query(AuditPartition).order_by(AuditPartition.month.desc()).all()
+    return [
+        {
+            "month": p.month,
+            "row_count": p.row_count,
+            "min_timestamp": p.min_timestamp,
+            "max_timestamp": p.max_timestamp,
+            "archived_at": p.archived_at
+        }
+        for p in partitions
+    ]
+
+@app.post("/audit/rollover")
+def rollover_audit_logs(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Archive audit log months older than the hot window (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can archive audit logs")
+    
+    archived = audit_archive.rollover(db)
+    return {"archived": archived}
+
+@app.get("/export/{resource}")
+def export_resource(
+    resource: str,
+    format: str = "ndjson",
+    gzip: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream a full dump of reviews, assignments or audit logs as NDJSON or CSV (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can export data")
+    
+    if resource not in export.EXPORTABLE:
+        raise HTTPException(status_code=404, detail="Unknown export resource")
+    
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be one of: " + ", ".join(export.EXPORT_FORMATS))
+    
+    filename = f"{resource}.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        export.export_stream(resource, format, gzip),
+        media_type=export.EXPORT_FORMATS[format],
+        headers=headers
+    )
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 503 until startup has finished, then how long startup took against its budget"""
+    if startup_timings is None:
+        raise HTTPException(status_code=503, detail="Starting up")
+    
+    return {**startup_timings, "within_budget": startup_timings["total_ms"] <= config.STARTUP_BUDGET_MS}
+
+@app.get("/cache/stats")
+def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Get response cache hit rate and memory footprint (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access cache stats")
+    
+    return response_cache.stats()
+
+@app.get("/admission/stats")
+def get_admission_stats(current_user: User = Depends(get_current_user)):
+    """Get concurrency limits, queue depths and shed counts per route class (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access admission stats")
+
+    return admission.stats()
+
+@app.get("/invalidation/stats")
+def get_invalidation_stats(current_user: User = Depends(get_current_user)):
+    """Get this worker's cross-worker invalidation cursor, lag and full clears (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access invalidation stats")
+
+    return invalidation.bus.stats()
+
+@app.get("/admin/profiles")
+def list_profiles(current_user: User = Depends(get_current_user)):
+    """List stored request profiles, newest first (admin only)
+    
+    Send X-Profile: 1 with an admin token to profile a request; its response
+    carries the profile id in X-Profile-Id.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access profiles")
+    
+    return profiling.store.list()
+
+@app.get("/admin/profiles/{profile_id}")
+def download_profile(profile_id: str, current_user: User = Depends(get_current_user)):
+    """Download a profile as collapsed stacks for flamegraph.pl or speedscope (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access profiles")
+    
+    path = profiling.store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+@app.get("/admin/slow-queries")
+def list_slow_queries(
+    limit: int = 20,
+    sort: str = "total",
+    current_user: User = Depends(get_current_user)
+):
+    """Slowest statement fingerprints seen by this worker, with plans (admin only)
+    
+    sort is one of total, max, avg or count.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access the slow-query log")
+    if sort not in slow_queries.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(slow_queries.SORT_KEYS)}")
+    
+    return {
+        "threshold_ms": config.SLOW_QUERY_MS,
+        "pid": os.getpid(),
+        "queries": slow_queries.slow_query_log.top(max(1, min(limit, 100)), sort)
+    }
+
+@app.get("/scheduler/jobs", response_model=List[ScheduledJobResponse])
+def list_scheduled_jobs(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """List background jobs with their last run (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view scheduled jobs")
+    
+    scheduler.ensure_jobs(db)
+    return db.query(ScheduledJob).order_by(ScheduledJob.name).all()
+
+@app.post("/scheduler/jobs/{name}/run", response_model=ScheduledJobResponse)
+def run_scheduled_job(name: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Run a background job now instead of waiting for its next slot (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can run scheduled jobs")
+    if name not in scheduler.JOBS:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if not scheduler.run_job(name, force=True):
+        raise HTTPException(status_code=409, detail="Job is already running")
+    
+    return db.get(ScheduledJob, name)
 
 @app.get("/integrity/hash/{paper_id}")
 def get_paper_hash(
@@ -833,17 +1503,47 @@ def get_paper_hash(
         raise HTTPException(status_code=404, detail="Paper file not found")
     
     # Calculate SHA256 hash
-    sha256_hash = hashlib.sha256()
-    with open(paper.file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
+    file_hash, _ = integrity.hash_file(paper.file_path)
+    record = db.get(PaperIntegrity, paper_id)
     
     return {
         "paper_id": paper_id,
-        "file_hash": sha256_hash.hexdigest(),
-        "algorithm": "SHA256"
+        "file_hash": file_hash,
+        "algorithm": "SHA256",
+        "recorded_hash": record.sha256 if record else None,
+        "matches_recorded": record.sha256 == file_hash if record and record.sha256 else None
     }
 
+@app.get("/integrity/report", response_model=List[PaperIntegrityProblem])
+def get_integrity_report(
+    limit: int = 100,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List papers whose stored file is missing or no longer matches its recorded hash (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view integrity reports")
+    
+    return integrity.problems(db, limit, offset)
+
+@app.get("/integrity/metrics")
+def get_integrity_metrics(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get file counts by integrity status and scrubber progress (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view integrity metrics")
+    
+    job = db.get(ScheduledJob, "integrity_scrub")
+    return {
+        "files": integrity.status_counts(db),
+        "scrubber": json.loads(job.state) if job and job.state else {},
+        "last_run": json.loads(job.last_result) if job and job.last_result else None,
+        "last_run_at": job.last_finished_at if job else None
+    }
+
+# Module import and app setup, up to here; a forked worker (serve.py) inherits it
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,233 @@
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session, undefer
+
+from database import User, Paper, ReviewAssignment
+
+# Terms are hashed into a fixed feature space so new vocabulary never reshapes the reviewer matrix
+N_FEATURES = 2 ** 18
+SCORE_CHUNK = 256
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is",
+    "it", "its", "of", "on", "or", "our", "that", "the", "their", "this", "to", "we", "which",
+    "with", "using", "based", "paper", "study", "approach", "new", "these", "can", "via",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def paper_fields(paper) -> list:
+    """Weighted text fields describing a paper"""
+    return [(paper.title, 2.0), (paper.abstract, 1.0), (paper.keywords, 3.0)]
+
+
+def reviewer_fields(user) -> list:
+    """Weighted text fields describing a reviewer"""
+    return [(user.expertise, 3.0), (user.interests, 2.0), (user.bio, 1.0)]
+
+
+def _feature(token: str) -> int:
+    return zlib.crc32(token.encode()) % N_FEATURES
+
+
+def term_frequencies(docs: List[list]) -> sparse.csr_matrix:
+    """Sublinear, field-weighted term frequencies of each document as a CSR matrix"""
+    indptr, indices, data = [0], [], []
+    for fields in docs:
+        counts = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                feature = _feature(token)
+                counts[feature] = counts.get(feature, 0.0) + weight
+        for feature, count in counts.items():
+            indices.append(feature)
+            data.append(1.0 + np.log(count))
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(docs), N_FEATURES),
+    )
+
+
+def _normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def _normalize_affiliation(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+class ReviewerIndex:
+    """TF-IDF matrix of all reviewers, built once and updated in place when profiles change"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.reviewer_ids: List[int] = []
+        self.affiliations: List[str] = []
+        self._row_of: Dict[int, int] = {}
+        self._tf_rows: List[sparse.csr_matrix] = []
+        self._df = np.zeros(N_FEATURES, dtype=np.int32)
+        self._matrix = None
+
+    def load(self, db: Session):
+        reviewers = db.query(User).options(undefer(User.bio)).filter(User.role == "reviewer").order_by(User.id).all()
+        tf = term_frequencies([reviewer_fields(user) for user in reviewers])
+        with self._lock:
+            self.reviewer_ids = [user.id for user in reviewers]
+            self.affiliations = [_normalize_affiliation(user.affiliation) for user in reviewers]
+            self._row_of = {user_id: row for row, user_id in enumerate(self.reviewer_ids)}
+            self._tf_rows = [tf.getrow(row) for row in range(tf.shape[0])]
+            self._df = np.bincount(tf.indices, minlength=N_FEATURES).astype(np.int32)
+            self._matrix = None
+            self.loaded = True
+
+    def invalidate(self):
+        """Drop the index so the next use rebuilds it, e.g. after a bulk import"""
+        with self._lock:
+            self.loaded = False
+            self._matrix = None
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            self.load(db)
+
+    def upsert(self, user):
+        """Add or refresh one reviewer without rebuilding the whole index"""
+        if not self.loaded:
+            return
+        if user.role != "reviewer":
+            self.remove(user.id)
+            return
+        row_tf = term_frequencies([reviewer_fields(user)])
+        with self._lock:
+            row = self._row_of.get(user.id)
+            if row is None:
+                row = len(self.reviewer_ids)
+                self._row_of[user.id] = row
+                self.reviewer_ids.append(user.id)
+                self.affiliations.append("")
+                self._tf_rows.append(sparse.csr_matrix((1, N_FEATURES), dtype=np.float32))
+            np.subtract.at(self._df, self._tf_rows[row].indices, 1)
+            np.add.at(self._df, row_tf.indices, 1)
+            self._tf_rows[row] = row_tf
+            self.affiliations[row] = _normalize_affiliation(user.affiliation)
+            self._matrix = None
+
+    def remove(self, user_id: int):
+        with self._lock:
+            row = self._row_of.pop(user_id, None)
+            if row is None:
+                return
+            np.subtract.at(self._df, self._tf_rows[row].indices, 1)
+            del self.reviewer_ids[row]
+            del self.affiliations[row]
+            del self._tf_rows[row]
+            self._row_of = {uid: i for i, uid in enumerate(self.reviewer_ids)}
+            self._matrix = None
+
+    def _idf(self) -> np.ndarray:
+        n = len(self.reviewer_ids)
+        return (np.log((1.0 + n) / (1.0 + self._df)) + 1.0).astype(np.float32)
+
+    def snapshot(self):
+        """(reviewer_ids, affiliations, idf, normalized reviewer matrix) at a consistent point in time"""
+        with self._lock:
+            idf = self._idf()
+            if self._matrix is None:
+                if self._tf_rows:
+                    stacked = sparse.vstack(self._tf_rows, format="csr")
+                else:
+                    stacked = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+                self._matrix = _normalize_rows(stacked @ sparse.diags(idf)).tocsr()
+            return list(self.reviewer_ids), list(self.affiliations), idf, self._matrix
+
+
+reviewer_index = ReviewerIndex()
+
+
+def candidate_scores(db: Session, papers: List[Paper], k: int):
+    """Top-k reviewer candidates per paper as (reviewer_ids, affiliations, top_rows, top_scores).
+
+    Similarities are computed chunk by chunk as sparse matrix products. Conflicts
+    of interest (the author themselves or a shared affiliation) and existing
+    assignments are excluded. ``top_rows`` holds reviewer row indexes, -1 where
+    fewer than k candidates remain.
+    """
+    reviewer_index.ensure_loaded(db)
+    reviewer_ids, affiliations, idf, reviewers = reviewer_index.snapshot()
+    n_papers, n_reviewers = len(papers), len(reviewer_ids)
+    k = min(k, n_reviewers)
+    top_rows = np.full((n_papers, k), -1, dtype=np.int64)
+    top_scores = np.zeros((n_papers, k), dtype=np.float32)
+    if n_papers == 0 or k == 0:
+        return reviewer_ids, affiliations, top_rows, top_scores
+
+    row_of = {reviewer_id: row for row, reviewer_id in enumerate(reviewer_ids)}
+    affiliation_array = np.asarray(affiliations, dtype=object)
+    author_affiliations = dict(
+        db.query(User.id, User.affiliation).filter(User.id.in_({p.author_id for p in papers})).all()
+    )
+    assigned = {}
+    for paper_id, reviewer_id in db.query(ReviewAssignment.paper_id, ReviewAssignment.reviewer_id).filter(
+        ReviewAssignment.paper_id.in_([p.id for p in papers])
+    ):
+        assigned.setdefault(paper_id, []).append(reviewer_id)
+
+    for start in range(0, n_papers, SCORE_CHUNK):
+        chunk = papers[start:start + SCORE_CHUNK]
+        vectors = _normalize_rows(term_frequencies([paper_fields(p) for p in chunk]) @ sparse.diags(idf))
+        scores = (vectors @ reviewers.T).toarray()
+
+        for offset, paper in enumerate(chunk):
+            excluded = [row_of[r] for r in assigned.get(paper.id, []) if r in row_of]
+            if paper.author_id in row_of:
+                excluded.append(row_of[paper.author_id])
+            affiliation = _normalize_affiliation(author_affiliations.get(paper.author_id))
+            if affiliation:
+                excluded.extend(np.flatnonzero(affiliation_array == affiliation))
+            scores[offset, excluded] = -np.inf
+
+        # argpartition finds each row's top k in linear time; only those k get sorted
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best[~np.isfinite(best_scores)] = -1
+        best_scores[~np.isfinite(best_scores)] = 0.0
+
+        top_rows[start:start + len(chunk)] = best
+        top_scores[start:start + len(chunk)] = best_scores
+
+    return reviewer_ids, affiliations, top_rows, top_scores
+
+
+def suggest_reviewers(db: Session, papers: List[Paper], limit: int = 10) -> list:
+    """Best-matching reviewers for each paper, highest similarity first"""
+    reviewer_ids, _, top_rows, top_scores = candidate_scores(db, papers, limit)
+    wanted = {reviewer_ids[row] for row in np.unique(top_rows) if row >= 0}
+    names = dict(db.query(User.id, User.name).filter(User.id.in_(wanted)).all()) if wanted else {}
+    results = []
+    for i, paper in enumerate(papers):
+        suggestions = [
+            {"reviewer_id": reviewer_ids[row], "name": names.get(reviewer_ids[row], ""), "score": float(score)}
+            for row, score in zip(top_rows[i], top_scores[i])
+            if row >= 0
+        ]
+        results.append({"paper_id": paper.id, "reviewers": suggestions})
+    return results
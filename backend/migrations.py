@@ -0,0 +1,155 @@
+"""
+Versioned schema migrations for changes create_all() can't make on an existing
+database (new indexes, columns, virtual tables, backfills).
+Applied automatically on startup; run manually with: python migrations.py
+Startup skips create_all() once the database is at head, so a new table needs
+a migration that creates it (checkfirst) as well as its model.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from database import engine
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """Register a migration function taking a Connection"""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, description VARCHAR, applied_at TIMESTAMP)"
+    ))
+
+
+def add_missing_columns(conn, model, names: list):
+    """ALTER TABLE ADD COLUMN for each model column the existing table lacks"""
+    table = model.__table__
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            column_type = table.c[name].type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+
+
+def head_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn) -> int:
+    _ensure_version_table(conn)
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def at_head(bind=engine) -> bool:
+    """True when every registered migration has been applied (read-only check)"""
+    with bind.connect() as conn:
+        if not inspect(conn).has_table("schema_migrations"):
+            return False
+        version = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+    return version >= head_version()
+
+
+def run_migrations(bind=engine) -> list:
+    """Apply pending migrations in order, each in its own transaction"""
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        with bind.begin() as conn:
+            if version <= current_version(conn):
+                continue
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()}
+            )
+        applied.append(version)
+    return applied
+
+
+# ==================== Migrations ====================
+
+@migration(1, "Composite indexes for audit log search")
+def _audit_log_indexes(conn):
+    from database import AuditLog
+    for index in AuditLog.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+@migration(2, "Full-text search index on papers")
+def _paper_search_index(conn):
+    from search import create_search_index
+    create_search_index(conn)
+
+
+@migration(3, "Normalized expertise and keyword tags")
+def _normalized_tags(conn):
+    from sqlalchemy.orm import Session
+    from database import Tag, UserExpertise, PaperKeyword
+    import tags
+    for model in (Tag, UserExpertise, PaperKeyword):
+        model.__table__.create(conn, checkfirst=True)
+    session = Session(bind=conn)
+    tags.backfill(session)
+    session.flush()
+
+
+@migration(4, "Deadline sweeper columns and scheduled jobs")
+def _deadline_sweeper(conn):
+    from database import ReviewAssignment, ScheduledJob
+    add_missing_columns(conn, ReviewAssignment, ["updated_at", "reminder_sent_at", "overdue_at"])
+    conn.execute(text("UPDATE review_assignments SET updated_at = assigned_at WHERE updated_at IS NULL"))
+    for index in ReviewAssignment.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    ScheduledJob.__table__.create(conn, checkfirst=True)
+
+
+@migration(5, "Paper file integrity records")
+def _paper_integrity(conn):
+    from database import PaperIntegrity
+    PaperIntegrity.__table__.create(conn, checkfirst=True)
+
+
+@migration(6, "Idempotency keys")
+def _idempotency_keys(conn):
+    from database import IdempotencyKey
+    IdempotencyKey.__table__.create(conn, checkfirst=True)
+
+
+@migration(7, "Change log for cross-worker cache invalidation")
+def _change_log(conn):
+    from database import ChangeLog
+    ChangeLog.__table__.create(conn, checkfirst=True)
+
+
+@migration(8, "Event log shared by all workers' event streams")
+def _event_log(conn):
+    from database import EventLog
+    EventLog.__table__.create(conn, checkfirst=True)
+
+
+@migration(9, "Single-use tickets for opening event streams")
+def _stream_tickets(conn):
+    from database import StreamTicket
+    StreamTicket.__table__.create(conn, checkfirst=True)
+
+
+@migration(10, "Request fingerprints for idempotency keys")
+def _idempotency_fingerprints(conn):
+    from database import IdempotencyKey
+    add_missing_columns(conn, IdempotencyKey, ["request_fingerprint"])
+
+
+if __name__ == "__main__":
+    from database import init_db
+    init_db()
+    for version in run_migrations():
+        print(f"Applied migration {version}")
+    print(f"Schema at version {head_version()}")
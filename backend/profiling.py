@@ -0,0 +1,250 @@
+"""
+Opt-in sampling profiler for individual requests.
+A request is profiled when an admin sends "X-Profile: 1", or at random for
+a PROFILE_SAMPLE_RATE fraction of requests. A sampler thread then reads
+every thread's stack with sys._current_frames() every PROFILE_INTERVAL_MS
+until the response is sent. Threads that are only waiting (idle pool threads,
+an event loop blocked in select) are skipped. Because sync routes run on
+threadpool threads, the samples cover the whole process. Requests running
+at the same time show up in the profile too.
+
+Each profile is saved under PROFILE_DIR as collapsed stacks, which
+flamegraph.pl, speedscope and similar tools read. Next to it is a JSON file
+with the request line, status and timings. The profile id is returned in
+X-Profile-Id. Only the newest PROFILE_MAX_COUNT profiles younger than
+PROFILE_RETENTION_HOURS are kept.
+
+The event streams are never profiled: they stay open indefinitely and would
+hold a profiling slot the whole time. Credentials passed in the query string
+(token, ticket) are redacted from the stored request line.
+
+Unsampled requests cost one header lookup (and one random() call if
+PROFILE_SAMPLE_RATE is set); nothing else runs.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+import config
+from auth import user_from_token
+from database import SessionLocal
+
+# At most this many requests are profiled at once; further ones run unprofiled
+MAX_ACTIVE = 4
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+# Long-lived streams: profiling one would sample until the client disconnects
+UNPROFILED_PATHS = {"/events", "/leaderboard/stream"}
+# Query parameters that carry credentials; profiles are readable by every admin
+REDACTED_PARAMS = {"token", "ticket", "access_token"}
+# (file name, function) of innermost frames that mean the thread is just waiting
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("base_events.py", "run_forever"),
+    ("runners.py", "run"),  # uvloop: the loop itself is native code
+    ("thread.py", "_worker"),
+    ("_base.py", "wait"),
+}
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in path:
+        path = path.split(marker, 1)[1]
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _request_path(scope) -> str:
+    query = scope.get("query_string", b"").decode("latin-1")
+    if not query:
+        return scope["path"]
+    params = [(key, "redacted" if key.lower() in REDACTED_PARAMS else value)
+              for key, value in parse_qsl(query, keep_blank_values=True)]
+    return f"{scope['path']}?{urlencode(params)}"
+
+
+class Sampler:
+    """Collapsed stack counts for all busy threads until stopped"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+            if self._stop.wait(self.interval):
+                break
+
+
+class ProfileStore:
+    """Profiles as <id>.folded + <id>.json files, pruned by count and age"""
+
+    def __init__(self, directory: str, max_count: int, retention_hours: float):
+        self.directory = directory
+        self.max_count = max_count
+        self.retention = timedelta(hours=retention_hours)
+        self._lock = threading.Lock()
+
+    def save(self, profile_id: str, sampler: Sampler, meta: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile_id)
+        with open(base + ".folded", "w") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(base + ".json", "w") as f:
+            json.dump(meta, f)
+        self.prune()
+
+    def list(self) -> List[dict]:
+        """Metadata of stored profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # being written or pruned by another worker
+        profiles.sort(key=lambda meta: meta["created_at"], reverse=True)
+        return profiles
+
+    def path(self, profile_id: str) -> Optional[str]:
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, profile_id + ".folded")
+        return path if os.path.exists(path) else None
+
+    def prune(self):
+        with self._lock:
+            cutoff = (datetime.utcnow() - self.retention).isoformat()
+            profiles = self.list()
+            for index, meta in enumerate(profiles):
+                if index >= self.max_count or meta["created_at"] < cutoff:
+                    for extension in (".json", ".folded"):
+                        try:
+                            os.remove(os.path.join(self.directory, meta["id"] + extension))
+                        except FileNotFoundError:
+                            pass
+
+
+store = ProfileStore(config.PROFILE_DIR, config.PROFILE_MAX_COUNT, config.PROFILE_RETENTION_HOURS)
+
+
+def _is_admin(token: str) -> bool:
+    db = SessionLocal()
+    try:
+        return user_from_token(token, db).role == "admin"
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    """Run requests chosen for profiling under a Sampler and store the result"""
+
+    def __init__(self, app, sample_rate: float, interval_ms: float):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.active = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNPROFILED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        trigger = None
+        if self.active < MAX_ACTIVE:
+            if self.sample_rate and random.random() < self.sample_rate:
+                trigger = "sampled"
+            else:
+                headers = dict(scope["headers"])
+                requested = headers.get(b"x-profile")
+                scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+                # Only bearer requests get the token checked, so X-Profile alone costs nothing
+                if requested and requested != b"0" and scheme.lower() == "bearer" and token:
+                    if await run_in_threadpool(_is_admin, token):
+                        trigger = "header"
+        if trigger is None or self.active >= MAX_ACTIVE:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status = None
+
+        async def tagged_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        self.active += 1
+        sampler = Sampler(self.interval)
+        created_at = datetime.utcnow()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            duration = time.perf_counter() - started
+            await run_in_threadpool(sampler.stop)  # joins the sampling thread
+            self.active -= 1
+            meta = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": _request_path(scope),
+                "status": status,
+                "trigger": trigger,
+                "duration_ms": round(duration * 1000, 1),
+                "samples": sampler.samples,
+                "interval_ms": self.interval * 1000,
+                "created_at": created_at.isoformat(),
+                "pid": os.getpid(),
+            }
+            await run_in_threadpool(store.save, profile_id, sampler, meta)
@@ -0,0 +1,64 @@
+"""
+Column projections for list endpoints.
+List responses select exactly the columns of their response schema as row
+tuples and encode them directly (see serialization.py), without loading ORM
+objects. ?fields=id,title narrows that to just those columns and ?view=summary
+to a fixed narrow set, so long abstracts, bios and review texts (deferred on
+the models) are never read or sent.
+"""
+from typing import Any, Dict, List, Optional, Union
+
+from sqlalchemy.orm import Query
+
+from schemas import (
+    PaperResponse, PaperSummary, ReviewResponse, ReviewSummary, UserResponse, UserSummary, ReviewAssignmentResponse
+)
+from serialization import rows_response
+
+VIEWS = ("full", "summary")
+
+# resource -> (full schema, summary schema or None); fields may be any field of the full schema
+SCHEMAS = {
+    "papers": (PaperResponse, PaperSummary),
+    "reviews": (ReviewResponse, ReviewSummary),
+    "reviewers": (UserResponse, UserSummary),
+    "assignments": (ReviewAssignmentResponse, None),
+}
+
+
+def requested_fields(resource: str, fields: Optional[str] = None, view: Optional[str] = None) -> List[str]:
+    """Field names to select; raises ValueError for unknown names or views"""
+    full, summary = SCHEMAS[resource]
+    if fields:
+        names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in names if name not in full.model_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if "id" not in names:
+            names.insert(0, "id")
+        return names
+    if view is None or view == "full":
+        return list(full.model_fields)
+    if view == "summary" and summary is not None:
+        return list(summary.model_fields)
+    raise ValueError(f"view must be one of: {', '.join(VIEWS)}")
+
+
+def responses(resource: str) -> dict:
+    """OpenAPI description of a projected list endpoint (declared with response_model=None)
+
+    The full view returns the whole response schema, view=summary the summary
+    schema, and fields= an object with id plus just the requested fields.
+    """
+    full, summary = SCHEMAS[resource]
+    shapes = (full, summary, Dict[str, Any]) if summary is not None else (full,)
+    description = f"A list of {full.__name__} objects"
+    if summary is not None:
+        description += f"; with view=summary, {summary.__name__} objects"
+        description += f"; with fields=a,b, objects with id and just those fields of {full.__name__}"
+    return {200: {"model": List[Union[shapes]], "description": description}}
+
+
+def project(query: Query, model, names: List[str]):
+    """Run a list query selecting only the named columns, straight into a JSON response"""
+    return rows_response(names, query.with_entities(*(getattr(model, name) for name in names)))
@@ -0,0 +1,233 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import config
+
+# Routes whose responses may be cached, mapped to the invalidation tag of each entry
+CACHED_ROUTES = [
+    ("/achievements", "achievements"),
+    ("/leaderboard", "leaderboard"),
+    ("/reviewers", "reviewers"),
+    ("/users/{user_id}", "user:{user_id}"),
+    ("/users/{user_id}/tokens", "user_tokens:{user_id}"),
+]
+
+
+def _compile(template):
+    pattern = re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", template)
+    return re.compile(f"^{pattern}$")
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "media_type", "tag")
+
+    def __init__(self, body: bytes, etag: str, media_type: str, tag: str):
+        self.body = body
+        self.etag = etag
+        self.media_type = media_type
+        self.tag = tag
+
+
+class ResponseCache:
+    """LRU cache of serialized GET responses, invalidated by tag"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._routes = [(_compile(template), tag) for template, tag in CACHED_ROUTES]
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def match(self, path: str):
+        """Return the invalidation tag for a cacheable path, or None"""
+        for pattern, tag in self._routes:
+            m = pattern.match(path)
+            if m:
+                return tag.format(**m.groupdict())
+        return None
+
+    def generation(self, tag: str) -> int:
+        with self._lock:
+            return self._generations.get(tag, 0)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry: CacheEntry, generation: int):
+        """Store an entry unless its tag was invalidated while it was being built"""
+        size = len(entry.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(entry.tag, 0) != generation:
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            self._keys_by_tag.setdefault(entry.tag, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *tags: str):
+        """Drop every entry cached under the given tags"""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in self._keys_by_tag.pop(tag, ()):
+                    entry = self._entries.pop(key, None)
+                    if entry is not None:
+                        self._bytes -= len(entry.body)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for tag in list(self._keys_by_tag):
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        keys = self._keys_by_tag.get(entry.tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tag[entry.tag]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCacheMiddleware:
+    """Serve cached bytes for hot read-mostly GET routes and answer revalidations with 304"""
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        tag = self.cache.match(scope["path"])
+        if tag is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        # Key on the caller's credentials so per-user responses are never shared
+        authorization = headers.get(b"authorization", b"")
+        auth_scope = hashlib.sha256(authorization).hexdigest()[:16] if authorization else ""
+        key = (scope["path"], scope.get("query_string", b""), auth_scope)
+        if_none_match = headers.get(b"if-none-match", b"").decode("latin-1")
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            if if_none_match and _etag_matches(if_none_match, entry.etag):
+                self.cache.not_modified += 1
+                await self._send_not_modified(send, entry.etag)
+            else:
+                await self._send_entry(send, entry)
+            return
+
+        generation = self.cache.generation(tag)
+        start_message = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+
+        body = b"".join(chunks)
+        status = start_message.get("status", 500)
+        if status != 200:
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        response_headers = dict(start_message.get("headers", []))
+        media_type = response_headers.get(b"content-type", b"application/json").decode("latin-1")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        entry = CacheEntry(body, etag, media_type, tag)
+        self.cache.put(key, entry, generation)
+
+        if if_none_match and _etag_matches(if_none_match, etag):
+            self.cache.not_modified += 1
+            await self._send_not_modified(send, etag)
+        else:
+            await self._send_entry(send, entry)
+
+    async def _send_entry(self, send, entry: CacheEntry):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", entry.media_type.encode("latin-1")),
+                (b"content-length", str(len(entry.body)).encode()),
+                (b"etag", entry.etag.encode()),
+                (b"cache-control", b"no-cache"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": entry.body})
+
+    async def _send_not_modified(self, send, etag: str):
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [(b"etag", etag.encode()), (b"cache-control", b"no-cache")],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+response_cache = ResponseCache(max_bytes=config.RESPONSE_CACHE_MAX_BYTES)
@@ -0,0 +1,166 @@
+"""
+In-process job scheduler backed by the scheduled_jobs table.
+Every server process runs a scheduler thread. A due job is claimed with a
+conditional UPDATE on its lease, so when several workers share a database each
+run still happens once. Jobs keep a JSON state (e.g. watermarks) between runs.
+
+Run a job by hand with:
+    python scheduler.py run <job>
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import config
+from database import SessionLocal, ScheduledJob
+
+MAX_ERROR_LENGTH = 500
+
+# name -> (interval in seconds, fn(db, state, now) -> summary dict)
+JOBS: Dict[str, Tuple[int, Callable]] = {}
+
+
+def job(name: str, interval_seconds: int):
+    """Register a periodic job; fn may update its state dict in place"""
+    def decorator(fn):
+        JOBS[name] = (interval_seconds, fn)
+        return fn
+    return decorator
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def ensure_jobs(db: Session, now: Optional[datetime] = None):
+    """Insert a row for every registered job that doesn't have one yet"""
+    now = now or datetime.utcnow()
+    known = {name for (name,) in db.query(ScheduledJob.name)}
+    for name, (interval, _) in JOBS.items():
+        if name in known:
+            continue
+        db.add(ScheduledJob(name=name, interval_seconds=interval, next_run_at=now))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # another worker registered it first
+
+
+def claim(db: Session, name: str, now: datetime, force: bool = False) -> bool:
+    """Take the job's lease if it is due and not held by a live run"""
+    conditions = [
+        ScheduledJob.name == name,
+        or_(ScheduledJob.locked_until.is_(None), ScheduledJob.locked_until < now),
+    ]
+    if not force:
+        conditions.append(ScheduledJob.next_run_at <= now)
+    result = db.execute(
+        update(ScheduledJob).where(*conditions).values(
+            locked_until=now + timedelta(seconds=config.SCHEDULER_LEASE_SECONDS),
+            locked_by=_owner(),
+            last_started_at=now
+        )
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def run_job(name: str, force: bool = False) -> bool:
+    """Run one job if it is due (or forced) and not running elsewhere; False if it wasn't claimed.
+    
+    The outcome is recorded on the job's row.
+    """
+    interval, fn = JOBS[name]
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        ensure_jobs(db, now)
+        if not claim(db, name, now, force):
+            return False
+
+        record = db.get(ScheduledJob, name)
+        state = json.loads(record.state) if record.state else {}
+        try:
+            summary = fn(db, state, now)
+        except Exception as e:
+            db.rollback()
+            record = db.get(ScheduledJob, name)
+            record.last_status = "failed"
+            record.last_error = f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH]
+        else:
+            record.state = json.dumps(state, default=str)
+            record.last_status = "ok"
+            record.last_result = json.dumps(summary, default=str)
+            record.last_error = None
+        record.interval_seconds = interval
+        record.next_run_at = now + timedelta(seconds=interval)
+        record.last_finished_at = datetime.utcnow()
+        record.locked_until = None
+        record.locked_by = None
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+class Scheduler:
+    """Background thread that runs due jobs every tick"""
+
+    def __init__(self, tick_seconds: float):
+        self.tick_seconds = tick_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick_seconds)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            for name in list(JOBS):
+                if self._stop.is_set():
+                    break
+                try:
+                    run_job(name)
+                except Exception:
+                    pass  # e.g. the database is briefly locked; retried next tick
+            self._stop.wait(self.tick_seconds)
+
+
+scheduler = Scheduler(config.SCHEDULER_TICK_SECONDS)
+
+
+if __name__ == "__main__":
+    # Go through the importable module: job files register there, not in this __main__ copy
+    import scheduler
+    import audit_archive, events, idempotency, integrity, invalidation, sweeper  # noqa: F401,E401
+
+    parser = argparse.ArgumentParser(description="Run a scheduled job now")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("job", choices=sorted(scheduler.JOBS))
+    args = parser.parse_args()
+    if not scheduler.run_job(args.job, force=True):
+        parser.exit(1, "Job is already running\n")
+    db = SessionLocal()
+    try:
+        record = db.get(ScheduledJob, args.job)
+        print(f"{record.last_status}: {record.last_result if record.last_status == 'ok' else record.last_error}")
+    finally:
+        db.close()
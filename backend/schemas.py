@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 # User Schemas
@@ -12,6 +12,23 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class UserImportRow(UserCreate):
+    role: str = "reviewer"
+    bio: Optional[str] = None
+    expertise: Optional[str] = None
+    interests: Optional[str] = None
+
+class UserImportError(BaseModel):
+    line: int
+    email: Optional[str] = None
+    reason: str
+
+class UserImportResponse(BaseModel):
+    created: int
+    skipped: int  # already registered or repeated in the file
+    failed: int
+    errors: List[UserImportError]
+
 class UserUpdate(BaseModel):
     bio: Optional[str] = None
     expertise: Optional[str] = None
@@ -27,11 +44,22 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class UserSummary(BaseModel):
+    id: int
+    name: str
+    email: EmailStr
+    affiliation: Optional[str] = None
+    expertise: Optional[str] = None
+
 # Auth Schemas
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class StreamTicketResponse(BaseModel):
+    ticket: str
+    expires_in: int
+
 class TokenData(BaseModel):
     email: Optional[str] = None
 
@@ -61,6 +89,63 @@ class PaperResponse(PaperBase):
     class Config:
         from_attributes = True
 
+class PaperSummary(BaseModel):
+    id: int
+    author_id: int
+    title: str
+    status: str
+    category: Optional[str] = None
+    domain: Optional[str] = None
+    created_at: datetime
+
+class PaperTextResponse(BaseModel):
+    paper_id: int
+    status: str
+    page_count: Optional[int] = None
+    char_count: Optional[int] = None
+    error: Optional[str] = None
+    extracted_at: datetime
+    text: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class PaperIntegrityProblem(BaseModel):
+    paper_id: int
+    title: str
+    file_path: str
+    status: str  # missing/mismatch/error
+    sha256: Optional[str] = None
+    observed_sha256: Optional[str] = None
+    size: Optional[int] = None
+    observed_size: Optional[int] = None
+    error: Optional[str] = None
+    last_checked_at: Optional[datetime] = None
+
+class PaperSearchResult(BaseModel):
+    id: int
+    author_id: int
+    title: str
+    status: str
+    category: Optional[str] = None
+    domain: Optional[str] = None
+    created_at: datetime
+    score: float
+    snippet: Optional[str] = None  # HTML: escaped text with <mark> around matches
+
+class ReviewerSuggestion(BaseModel):
+    reviewer_id: int
+    name: str
+    score: float
+
+class PaperReviewerSuggestions(BaseModel):
+    paper_id: int
+    reviewers: List[ReviewerSuggestion]
+
+class SimilarItem(BaseModel):
+    id: int
+    similarity: float  # estimated Jaccard similarity of word 3-gram shingles
+
 # Review Assignment Schemas
 class ReviewAssignmentCreate(BaseModel):
     paper_id: int
@@ -74,10 +159,32 @@ class ReviewAssignmentResponse(BaseModel):
     status: str
     deadline: Optional[datetime]
     assigned_at: datetime
+    reminder_sent_at: Optional[datetime] = None
+    overdue_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+class BulkAssignmentRequest(BaseModel):
+    paper_ids: Optional[List[int]] = None  # defaults to every pending paper
+    reviewers_per_paper: int = 3
+    max_per_reviewer: int = 5
+    reviewer_capacity: Optional[Dict[int, int]] = None  # per-reviewer overrides of max_per_reviewer
+    candidates_per_paper: int = 20
+    deadline: Optional[datetime] = None
+    dry_run: bool = False
+
+class BulkAssignmentItem(BaseModel):
+    paper_id: int
+    reviewer_id: int
+    score: float
+
+class BulkAssignmentResponse(BaseModel):
+    created: int
+    assignments: List[BulkAssignmentItem]
+    unfilled: Dict[int, int]  # paper_id -> reviewer slots left open
+    dry_run: bool
+
 # Review Schemas
 class ReviewCreate(BaseModel):
     paper_id: int
@@ -101,6 +208,14 @@ class ReviewResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ReviewSummary(BaseModel):
+    id: int
+    paper_id: int
+    reviewer_id: int
+    rating: Optional[float]
+    timestamp: datetime
+    author_feedback_rating: Optional[float] = None
+
 # Token Schemas
 class TokenTypeBase(BaseModel):
     name: str
@@ -152,3 +267,18 @@ class ProofResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+# Scheduler Schemas
+class ScheduledJobResponse(BaseModel):
+    name: str
+    interval_seconds: int
+    next_run_at: datetime
+    locked_until: Optional[datetime] = None
+    last_started_at: Optional[datetime] = None
+    last_finished_at: Optional[datetime] = None
+    last_status: Optional[str] = None
+    last_result: Optional[str] = None
+    last_error: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,132 @@
+import html
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Relative weight of each indexed column: title, abstract, keywords
+SQLITE_BM25_WEIGHTS = (10.0, 2.0, 5.0)
+
+# The database marks matches with these control characters; the snippet is HTML-escaped
+# before they become <mark> tags, so paper text can never inject markup
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+SQLITE_SEARCH_SQL = f"""
+    SELECT p.id, p.author_id, p.title, p.status, p.category, p.domain, p.created_at,
+           bm25(papers_fts, {', '.join(str(w) for w in SQLITE_BM25_WEIGHTS)}) AS score,
+           snippet(papers_fts, -1, char(2), char(3), '…', 16) AS snippet
+    FROM papers_fts
+    JOIN papers p ON p.id = papers_fts.rowid
+    WHERE papers_fts MATCH :query {{author_filter}}
+    ORDER BY score
+    LIMIT :limit OFFSET :offset
+"""
+
+POSTGRES_SEARCH_SQL = """
+    SELECT p.id, p.author_id, p.title, p.status, p.category, p.domain, p.created_at,
+           ts_rank_cd(p.search_vector, q) AS score,
+           ts_headline('english', coalesce(p.abstract, p.title), q,
+                       'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxWords=16, MinWords=8') AS snippet
+    FROM papers p, to_tsquery('english', :query) q
+    WHERE p.search_vector @@ q {author_filter}
+    ORDER BY score DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def _terms(q: str) -> list:
+    return re.findall(r"\w+", q.lower())
+
+
+def build_sqlite_query(q: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every term required, last term as a prefix"""
+    terms = _terms(q)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def build_postgres_query(q: str) -> Optional[str]:
+    terms = _terms(q)
+    if not terms:
+        return None
+    terms[-1] += ":*"
+    return " & ".join(terms)
+
+
+def highlight(snippet: Optional[str]) -> Optional[str]:
+    """Escape a marked snippet and turn its match markers into <mark> tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>")
+
+
+def search_papers(db: Session, q: str, limit: int = 20, offset: int = 0, author_id: Optional[int] = None) -> list:
+    """Ranked full-text search over paper titles, abstracts and keywords"""
+    postgres = db.get_bind().dialect.name == "postgresql"
+    query = build_postgres_query(q) if postgres else build_sqlite_query(q)
+    if query is None:
+        return []
+
+    sql = POSTGRES_SEARCH_SQL if postgres else SQLITE_SEARCH_SQL
+    params = {"query": query, "limit": limit, "offset": offset}
+    author_filter = ""
+    if author_id is not None:
+        author_filter = "AND p.author_id = :author_id"
+        params["author_id"] = author_id
+
+    rows = db.execute(text(sql.format(author_filter=author_filter)), params).mappings().all()
+    results = []
+    for row in rows:
+        result = dict(row)
+        result["snippet"] = highlight(result["snippet"])
+        # bm25() scores are negative with lower meaning better; expose higher-is-better everywhere
+        if not postgres:
+            result["score"] = -result["score"]
+        results.append(result)
+    return results
+
+
+# ==================== Index DDL (applied by migrations) ====================
+
+SQLITE_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+        title, abstract, keywords,
+        content='papers', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS papers_fts_insert AFTER INSERT ON papers BEGIN
+        INSERT INTO papers_fts(rowid, title, abstract, keywords)
+        VALUES (new.id, new.title, new.abstract, new.keywords);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS papers_fts_delete AFTER DELETE ON papers BEGIN
+        INSERT INTO papers_fts(papers_fts, rowid, title, abstract, keywords)
+        VALUES ('delete', old.id, old.title, old.abstract, old.keywords);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS papers_fts_update AFTER UPDATE OF title, abstract, keywords ON papers BEGIN
+        INSERT INTO papers_fts(papers_fts, rowid, title, abstract, keywords)
+        VALUES ('delete', old.id, old.title, old.abstract, old.keywords);
+        INSERT INTO papers_fts(rowid, title, abstract, keywords)
+        VALUES (new.id, new.title, new.abstract, new.keywords);
+    END""",
+    "INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_INDEX_DDL = [
+    """ALTER TABLE papers ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(keywords, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(abstract, '')), 'C')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_papers_search_vector ON papers USING GIN (search_vector)",
+]
+
+
+def create_search_index(conn):
+    """Create the full-text index and backfill it from existing papers"""
+    ddl = POSTGRES_INDEX_DDL if conn.dialect.name == "postgresql" else SQLITE_INDEX_DDL
+    for statement in ddl:
+        conn.execute(text(statement))
@@ -0,0 +1,40 @@
+"""
+Fast JSON encoding for large list responses.
+Rows read straight from the database are trusted, so list endpoints return them
+in a FastJSONResponse rather than as ORM objects. That skips FastAPI's
+per-object response_model validation and jsonable_encoder pass, and encodes
+with orjson (datetimes and floats handled in C) when it is installed.
+"""
+import json
+from datetime import date, datetime
+from typing import Iterable, Optional, Sequence
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON, matching what JSONResponse would produce after jsonable_encoder"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def rows_response(columns: Sequence[str], rows: Iterable[Sequence], headers: Optional[dict] = None) -> FastJSONResponse:
+    """A JSON array with one object per row tuple"""
+    return FastJSONResponse([dict(zip(columns, row)) for row in rows], headers=headers)
@@ -0,0 +1,170 @@
+"""
+Multi-worker launcher: a pre-forking uvicorn supervisor for Linux/macOS.
+The parent imports the app once, brings the schema to head, binds the listening
+socket and forks WEB_WORKERS workers (default: one per CPU) that all accept on
+it. Each worker runs uvicorn with uvloop and httptools when they are installed
+and an AnyIO threadpool of THREADPOOL_SIZE threads for the sync routes.
+
+The engine is disposed before forking and again (without closing) in each
+worker, so no pooled connection is ever shared between processes. Workers
+that die are replaced. SIGTERM or SIGINT drains: workers stop accepting,
+finish in-flight requests for up to GRACEFUL_TIMEOUT_SECONDS, run shutdown
+and exit; any still running after that are killed.
+
+Caches and the matching index live in each worker's memory; invalidation.py
+propagates writes to the other workers' caches. Stream events go through the
+event_log table (events.py), so a client gets them whichever worker holds its
+connection. The scheduler runs in every worker (job leases keep each job to one run).
+
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000] [--threads N]
+
+For development, python main.py still runs a single process.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+from importlib.util import find_spec
+
+import anyio.to_thread
+import uvicorn
+
+import config
+import migrations
+from database import engine, init_db
+
+# uvicorn exits with this when lifespan startup fails; restarting would fail the same way
+STARTUP_FAILURE = 3
+# A worker that dies sooner than this after forking is restarted with a delay
+MIN_WORKER_LIFETIME_SECONDS = 1.0
+
+
+def pre_fork():
+    """Close the parent's pooled connections so no worker inherits a socket to the database"""
+    engine.dispose()
+
+
+def post_fork():
+    """In the worker: drop the inherited pool without closing connections the parent may own"""
+    engine.dispose(close=False)
+
+
+async def _serve(server: uvicorn.Server, sockets: list, threads: int):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    await server.serve(sockets=sockets)
+
+
+def run_worker(app, sock, args) -> int:
+    """Serve on the shared socket until told to stop; returns the process exit code"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    post_fork()
+    server_config = uvicorn.Config(
+        app,
+        loop="auto",
+        http="auto",
+        lifespan="on",
+        access_log=args.access_log,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    server = uvicorn.Server(server_config)
+    with asyncio.Runner(loop_factory=server_config.get_loop_factory()) as runner:
+        runner.run(_serve(server, [sock], args.threads))
+    return 0 if server.started else STARTUP_FAILURE
+
+
+class Supervisor:
+    def __init__(self, app, sock, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers = {}  # pid -> fork time
+        self.stopping = False
+
+    def spawn(self):
+        pre_fork()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = run_worker(self.app, self.sock, self.args)
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+
+    def signal_workers(self, signum):
+        for pid in self.workers:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def stop(self, signum, frame):
+        if not self.stopping:
+            print(f"Draining {len(self.workers)} workers", file=sys.stderr)
+        self.stopping = True
+        self.signal_workers(signal.SIGTERM)
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        exit_code = 0
+        deadline = None
+        while self.workers:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + self.args.graceful_timeout + 5
+            if deadline is not None and time.monotonic() > deadline:
+                self.signal_workers(signal.SIGKILL)
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+            started = self.workers.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            if code == STARTUP_FAILURE:
+                print(f"Worker {pid} failed to start; shutting down", file=sys.stderr)
+                exit_code = STARTUP_FAILURE
+                self.stop(signal.SIGTERM, None)
+                continue
+            print(f"Worker {pid} exited with {code}; starting a replacement", file=sys.stderr)
+            if time.monotonic() - started < MIN_WORKER_LIFETIME_SECONDS:
+                time.sleep(MIN_WORKER_LIFETIME_SECONDS)
+            self.spawn()
+        return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several pre-forked uvicorn workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=config.WEB_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=config.THREADPOOL_SIZE,
+                        help="threadpool size per worker for sync routes")
+    parser.add_argument("--graceful-timeout", type=int, default=config.GRACEFUL_TIMEOUT_SECONDS)
+    parser.add_argument("--access-log", action=argparse.BooleanOptionalAction, default=True)
+    args = parser.parse_args()
+
+    from main import app
+
+    # Migrate once here rather than racing in every worker's startup
+    if not migrations.at_head():
+        init_db()
+        migrations.run_migrations()
+
+    sock = uvicorn.Config(app, host=args.host, port=args.port).bind_socket()
+    loop = "uvloop" if find_spec("uvloop") else "asyncio"
+    http = "httptools" if find_spec("httptools") else "h11"
+    print(f"Serving on {args.host}:{args.port} with {args.workers} workers ({loop}, {http}, "
+          f"{args.threads} threads each)", file=sys.stderr)
+    sys.exit(Supervisor(app, sock, args).run())
+
+
+if __name__ == "__main__":
+    main()
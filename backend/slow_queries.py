@@ -0,0 +1,239 @@
+"""
+Slow-query log.
+Engine cursor events time every statement. Statements slower than
+SLOW_QUERY_MS are grouped by fingerprint. The fingerprint is the SQL with
+literals, placeholders, IN lists and repeated VALUES rows normalised away.
+Each group keeps its count, total/max/last duration, the routes that issued
+it and the redacted parameters of the latest run. Strings and bytes are
+reduced to their length.
+
+The first time a fingerprint is slow, its plan is captured on a separate
+connection in a background thread, so the slow request doesn't wait for it.
+SQLite uses EXPLAIN QUERY PLAN. Postgres uses EXPLAIN ANALYZE for reads and
+plain EXPLAIN for writes, which ANALYZE would actually perform.
+
+Groups live in each worker's memory. At most SLOW_QUERY_MAX_FINGERPRINTS are
+kept; the group with the least total time is dropped first.
+/admin/slow-queries reports the top N.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import event
+
+import config
+from database import engine
+
+MAX_PARAMS = 20
+MAX_ROUTES = 5
+SORT_KEYS = {
+    "total": lambda query: query.total,
+    "max": lambda query: query.max,
+    "avg": lambda query: query.total / query.count,
+    "count": lambda query: query.count,
+}
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NAMED_PARAM = re.compile(r"%\(\w+\)s")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_REPEATED_ROWS = re.compile(r"(\([?,\s]*\))(?:\s*,\s*\1)+")
+_WHITESPACE = re.compile(r"\s+")
+
+# The ASGI scope of the request being served; routing adds the matched route to it
+_request_scope: ContextVar[Optional[dict]] = ContextVar("slow_query_request_scope", default=None)
+
+
+def normalize(statement: str) -> str:
+    sql = _STRING.sub("?", statement)
+    sql = _NAMED_PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _REPEATED_ROWS.sub(r"\1, ...", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _redact(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact(parameters):
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in list(parameters.items())[:MAX_PARAMS]}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(value) for value in list(parameters)[:MAX_PARAMS]]
+    return None
+
+
+def current_route() -> str:
+    scope = _request_scope.get()
+    if scope is None:
+        return f"thread:{threading.current_thread().name}"
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else scope['path']}"
+
+
+class SlowQuery:
+    __slots__ = ("fingerprint", "sql", "count", "total", "max", "last", "last_seen", "routes", "params",
+                 "plan", "explain_pending")
+
+    def __init__(self, key: str, sql: str):
+        self.fingerprint = key
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.last_seen = None
+        self.routes = {}
+        self.params = None
+        self.plan = None
+        self.explain_pending = False
+
+    def to_dict(self) -> dict:
+        routes = sorted(self.routes.items(), key=lambda item: item[1], reverse=True)[:MAX_ROUTES]
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.sql,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 1),
+            "avg_ms": round(self.total / self.count * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+            "last_ms": round(self.last * 1000, 1),
+            "last_seen": self.last_seen,
+            "routes": [{"route": route, "count": count} for route, count in routes],
+            "params": self.params,
+            "plan": self.plan,
+        }
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, max_fingerprints: int, explain: bool):
+        self.threshold = threshold_ms / 1000
+        self.max_fingerprints = max_fingerprints
+        self.explain = explain
+        self._queries = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+    def record(self, statement: str, parameters, executemany: bool, duration: float):
+        sql = normalize(statement)
+        key = fingerprint(sql)
+        params = redact(parameters[0] if executemany and parameters else parameters)
+        route = current_route()
+        with self._lock:
+            query = self._queries.get(key)
+            if query is None:
+                if len(self._queries) >= self.max_fingerprints:
+                    del self._queries[min(self._queries.values(), key=lambda q: q.total).fingerprint]
+                query = self._queries[key] = SlowQuery(key, sql)
+            query.count += 1
+            query.total += duration
+            query.max = max(query.max, duration)
+            query.last = duration
+            query.last_seen = datetime.utcnow()
+            query.routes[route] = query.routes.get(route, 0) + 1
+            query.params = params
+            explain = (self.explain and query.plan is None and not query.explain_pending
+                       and sql.split(" ", 1)[0].upper() in EXPLAINABLE)
+            if explain:
+                query.explain_pending = True
+        if explain:
+            self._pool().submit(self._capture_plan, query, statement, parameters[0] if executemany else parameters)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Threads don't survive a fork (serve.py), so each worker starts its own
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _capture_plan(self, query: SlowQuery, statement: str, parameters):
+        try:
+            query.plan = explain(statement, parameters)
+        except Exception as e:
+            query.plan = f"EXPLAIN failed: {type(e).__name__}: {e}"
+        finally:
+            query.explain_pending = False
+
+    def top(self, limit: int = 20, sort: str = "total") -> List[dict]:
+        with self._lock:
+            queries = sorted(self._queries.values(), key=SORT_KEYS[sort], reverse=True)
+            return [query.to_dict() for query in queries[:limit]]
+
+
+def explain(statement: str, parameters) -> str:
+    """The plan of one statement, run on its own connection and rolled back"""
+    with engine.connect().execution_options(slow_query_log=False) as conn:
+        try:
+            if conn.dialect.name == "postgresql":
+                verb = statement.lstrip().split(None, 1)[0].upper()
+                prefix = "EXPLAIN ANALYZE " if verb in ("SELECT", "WITH") else "EXPLAIN "
+                rows = conn.exec_driver_sql(prefix + statement, parameters or {}).fetchall()
+                return "\n".join(row[0] for row in rows)
+            if conn.dialect.name == "sqlite":
+                rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters or ()).fetchall()
+                depth = {0: -1}
+                lines = []
+                for node_id, parent, _, detail in rows:
+                    depth[node_id] = depth.get(parent, -1) + 1
+                    lines.append("  " * depth[node_id] + detail)
+                return "\n".join(lines)
+            return f"EXPLAIN not supported for {conn.dialect.name}"
+        finally:
+            conn.rollback()
+
+
+slow_query_log = SlowQueryLog(config.SLOW_QUERY_MS, config.SLOW_QUERY_MAX_FINGERPRINTS, config.SLOW_QUERY_EXPLAIN)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.slow_query_started = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "slow_query_started", None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    if duration >= slow_query_log.threshold and conn.get_execution_options().get("slow_query_log", True):
+        slow_query_log.record(statement, parameters, executemany, duration)
+
+
+class QueryRouteMiddleware:
+    """Remember the request being served so slow queries can name their route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
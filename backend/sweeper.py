@@ -0,0 +1,146 @@
+"""
+Deadline sweeper: a scheduled job that marks overdue assignments, reminds
+reviewers of upcoming deadlines and awards Speed Reviewer.
+Each pass is incremental. Assignments are found through the deadline index
+(deadlines that passed since the last watermark) and the updated_at index
+(rows created or changed since then); reviews are read from the last review
+id seen. All updates are set-based.
+"""
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.orm import Session
+
+import config
+import events
+import leaderboard_feed
+from database import ReviewAssignment, Review, Token, UserToken, LeaderboardStats, AuditLog
+from response_cache import response_cache
+from scheduler import job
+
+# Rows committed just before a watermark can carry an earlier timestamp; rescan this far back
+WATERMARK_OVERLAP = timedelta(seconds=60)
+SPEED_REVIEWER = "Speed Reviewer"
+
+
+def _parse(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _window(state: dict, key: str, deadline_floor):
+    """Filter for rows whose deadline entered the window, or that changed, since the last sweep"""
+    since = _parse(state.get(key))
+    if since is None:
+        return None
+    since -= WATERMARK_OVERLAP
+    return or_(ReviewAssignment.deadline > deadline_floor(since), ReviewAssignment.updated_at > since)
+
+
+def mark_overdue(db: Session, state: dict, now: datetime) -> list:
+    conditions = [
+        ReviewAssignment.deadline <= now,
+        ReviewAssignment.overdue_at.is_(None),
+        ReviewAssignment.status != "completed",
+    ]
+    window = _window(state, "overdue_watermark", lambda since: since)
+    if window is not None:
+        conditions.append(window)
+    rows = db.execute(
+        update(ReviewAssignment).where(*conditions).values(overdue_at=now)
+        .returning(ReviewAssignment.id, ReviewAssignment.reviewer_id, ReviewAssignment.paper_id, ReviewAssignment.deadline)
+    ).all()
+    state["overdue_watermark"] = now.isoformat()
+    return rows
+
+
+def send_reminders(db: Session, state: dict, now: datetime) -> list:
+    horizon = timedelta(hours=config.REMINDER_HOURS)
+    conditions = [
+        ReviewAssignment.deadline > now,
+        ReviewAssignment.deadline <= now + horizon,
+        ReviewAssignment.reminder_sent_at.is_(None),
+        ReviewAssignment.status != "completed",
+    ]
+    window = _window(state, "reminder_watermark", lambda since: since + horizon)
+    if window is not None:
+        conditions.append(window)
+    rows = db.execute(
+        update(ReviewAssignment).where(*conditions).values(reminder_sent_at=now)
+        .returning(ReviewAssignment.id, ReviewAssignment.reviewer_id, ReviewAssignment.paper_id, ReviewAssignment.deadline)
+    ).all()
+    state["reminder_watermark"] = now.isoformat()
+    return rows
+
+
+def award_speed_reviewers(db: Session, state: dict, now: datetime) -> tuple:
+    """Award Speed Reviewer for reviews submitted within SPEED_REVIEW_HOURS of assignment"""
+    last_review_id = state.get("review_watermark", 0)
+    reviews = (
+        db.query(Review.id, Review.reviewer_id, Review.timestamp, ReviewAssignment.assigned_at)
+        .join(ReviewAssignment, ReviewAssignment.id == Review.assignment_id)
+        .filter(Review.id > last_review_id)
+        .order_by(Review.id)
+        .all()
+    )
+    if not reviews:
+        return None, []
+    state["review_watermark"] = reviews[-1].id
+
+    token = db.query(Token).filter(Token.name == SPEED_REVIEWER).first()
+    if not token:
+        return None, []
+    limit = timedelta(hours=config.SPEED_REVIEW_HOURS)
+    fast = {}
+    for review in reviews:
+        if review.timestamp and review.assigned_at and review.timestamp - review.assigned_at <= limit:
+            fast.setdefault(review.reviewer_id, review.id)
+    if not fast:
+        return token, []
+
+    holders = {
+        user_id for (user_id,) in db.query(UserToken.user_id).filter(
+            UserToken.token_id == token.id, UserToken.user_id.in_(list(fast))
+        )
+    }
+    winners = [
+        (user_id, f"Completed review #{review_id} within {config.SPEED_REVIEW_HOURS} hours")
+        for user_id, review_id in fast.items()
+        if user_id not in holders
+    ]
+    if winners:
+        db.execute(insert(UserToken), [
+            {"user_id": user_id, "token_id": token.id, "earned_at": now, "reason": reason}
+            for user_id, reason in winners
+        ])
+        db.execute(
+            update(LeaderboardStats)
+            .where(LeaderboardStats.user_id.in_([user_id for user_id, _ in winners]))
+            .values(total_tokens=LeaderboardStats.total_tokens + 1)
+        )
+    return token, winners
+
+
+@job("deadline_sweep", config.DEADLINE_SWEEP_SECONDS)
+def deadline_sweep(db: Session, state: dict, now: datetime) -> dict:
+    overdue = mark_overdue(db, state, now)
+    reminded = send_reminders(db, state, now)
+    token, winners = award_speed_reviewers(db, state, now)
+    summary = {"overdue": len(overdue), "reminded": len(reminded), "speed_reviewers": len(winners)}
+    if overdue or reminded or winners:
+        db.add(AuditLog(action="deadline_sweep", resource_type="assignment", details=json.dumps(summary)))
+    db.commit()
+
+    notifications = [
+        (reviewer_id, "assignment.overdue", {"assignment_id": assignment_id, "paper_id": paper_id, "deadline": deadline})
+        for assignment_id, reviewer_id, paper_id, deadline in overdue
+    ] + [
+        (reviewer_id, "assignment.reminder", {"assignment_id": assignment_id, "paper_id": paper_id, "deadline": deadline})
+        for assignment_id, reviewer_id, paper_id, deadline in reminded
+    ]
+    if winners:
+        response_cache.invalidate("leaderboard", *[f"user_tokens:{user_id}" for user_id, _ in winners])
+        leaderboard_feed.mark_dirty()
+        notifications += [events.token_awarded(user_id, token, reason) for user_id, reason in winners]
+    events.hub.publish_many(notifications)
+    return summary
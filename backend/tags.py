@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import User, Paper, Tag, UserExpertise, PaperKeyword
+
+
+def normalize_tag(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+def split_tags(value: Optional[str]) -> List[str]:
+    """Split a comma-separated string into unique normalized tags, keeping order"""
+    if not value:
+        return []
+    tags = []
+    for part in value.split(","):
+        tag = normalize_tag(part)
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def get_or_create_tags(db: Session, names: List[str]) -> Dict[str, int]:
+    """Map tag names to ids, inserting any that don't exist yet"""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    ids = dict(db.query(Tag.name, Tag.id).filter(Tag.name.in_(names)).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        db.add_all([Tag(name=name) for name in missing])
+        db.flush()
+        ids.update(db.query(Tag.name, Tag.id).filter(Tag.name.in_(missing)).all())
+    return ids
+
+
+def _replace_tags(db: Session, link_model, owner_column: str, values: Dict[int, Optional[str]]):
+    """Replace the tag links of each owner with the tags parsed from its comma-separated string"""
+    if not values:
+        return
+    parsed = {owner_id: split_tags(value) for owner_id, value in values.items()}
+    tag_ids = get_or_create_tags(db, [tag for tags in parsed.values() for tag in tags])
+
+    owner = getattr(link_model, owner_column)
+    db.query(link_model).filter(owner.in_(list(parsed))).delete(synchronize_session=False)
+    db.bulk_insert_mappings(link_model, [
+        {owner_column: owner_id, "tag_id": tag_ids[tag]}
+        for owner_id, tags in parsed.items()
+        for tag in tags
+    ])
+
+
+def set_user_expertise(db: Session, values: Dict[int, Optional[str]]):
+    """Sync user_expertise from {user_id: expertise string}"""
+    _replace_tags(db, UserExpertise, "user_id", values)
+
+
+def set_paper_keywords(db: Session, values: Dict[int, Optional[str]]):
+    """Sync paper_keywords from {paper_id: keywords string}"""
+    _replace_tags(db, PaperKeyword, "paper_id", values)
+
+
+def find_reviewers(db: Session, expertise: str, match_all: bool = False):
+    """Reviewers with any (or all) of the given expertise tags, best matches first"""
+    names = split_tags(expertise)
+    matched = func.count(UserExpertise.tag_id).label("matched")
+    query = (
+        db.query(User)
+        .join(UserExpertise, UserExpertise.user_id == User.id)
+        .join(Tag, Tag.id == UserExpertise.tag_id)
+        .filter(User.role == "reviewer", Tag.name.in_(names))
+        .group_by(User.id)
+    )
+    if match_all:
+        query = query.having(matched == len(names))
+    return query.order_by(matched.desc(), User.id)
+
+
+def expertise_counts(db: Session, prefix: Optional[str] = None, limit: int = 50) -> list:
+    """Number of reviewers per expertise tag"""
+    reviewers = func.count(UserExpertise.user_id).label("reviewers")
+    query = (
+        db.query(Tag.name, reviewers)
+        .join(UserExpertise, UserExpertise.tag_id == Tag.id)
+        .join(User, User.id == UserExpertise.user_id)
+        .filter(User.role == "reviewer")
+    )
+    if prefix:
+        query = query.filter(Tag.name.startswith(normalize_tag(prefix), autoescape=True))
+    rows = query.group_by(Tag.name).order_by(reviewers.desc(), Tag.name).limit(limit).all()
+    return [{"tag": name, "reviewers": count} for name, count in rows]
+
+
+def backfill(db: Session, batch_size: int = 1000):
+    """Populate the tag tables from the existing comma-separated columns"""
+    for model, column, setter in (
+        (User, User.expertise, set_user_expertise),
+        (Paper, Paper.keywords, set_paper_keywords),
+    ):
+        last_id = 0
+        while True:
+            rows = (
+                db.query(model.id, column)
+                .filter(model.id > last_id, column.isnot(None))
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            setter(db, dict(rows))
+            db.flush()
+            last_id = rows[-1][0]
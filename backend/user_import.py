@@ -0,0 +1,215 @@
+"""
+Bulk user import from CSV or JSON Lines.
+Rows are handled a batch at a time: one IN query finds emails that are already
+registered, passwords are hashed across a process pool, and the users, their
+leaderboard stats, expertise tags and audit entries are inserted in a single
+transaction per batch.
+
+Load a program committee from the command line with:
+    python user_import.py committee.csv [--format jsonl] [--workers N]
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import tags
+from auth import get_password_hash
+from database import SessionLocal, User, LeaderboardStats, AuditLog
+from schemas import UserImportRow
+
+FORMATS = ("csv", "jsonl")
+ROLES = {"author", "reviewer", "admin"}
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+# Below this many hashes per batch, starting worker processes costs more than it saves
+PARALLEL_THRESHOLD = 16
+
+
+def detect_format(filename: Optional[str]) -> str:
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def read_rows(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """(line number, raw row) pairs; a JSON line that doesn't parse is yielded as its exception"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Blank cells count as missing so field defaults apply
+            yield reader.line_num, {
+                key.strip().lower(): value.strip()
+                for key, value in row.items()
+                if key and isinstance(value, str) and value.strip()
+            }
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+
+
+def validate_row(raw) -> Tuple[Optional[UserImportRow], Optional[str]]:
+    if isinstance(raw, Exception):
+        return None, f"Invalid JSON: {raw}"
+    if not isinstance(raw, dict):
+        return None, "Expected an object"
+    try:
+        row = UserImportRow.model_validate(raw)
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    if row.role not in ROLES:
+        return None, f"Unknown role: {row.role}"
+    return row, None
+
+
+class PasswordHasher:
+    """Hashes passwords across a lazily started process pool"""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def hash_all(self, passwords: list) -> list:
+        if self.workers == 1 or len(passwords) < PARALLEL_THRESHOLD:
+            return [get_password_hash(password) for password in passwords]
+        if self._executor is None:
+            # spawn, not fork: the server process has live threads and database connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._executor.map(get_password_hash, passwords, chunksize=chunksize))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _report(result: dict, line: int, email: Optional[str], reason: str):
+    if len(result["errors"]) < MAX_REPORTED_ERRORS:
+        result["errors"].append({"line": line, "email": email, "reason": reason})
+
+
+def _import_batch(db: Session, hasher: PasswordHasher, batch: list, actor_id: Optional[int], result: dict):
+    emails = [row.email for _, row in batch]
+    existing = {email for (email,) in db.query(User.email).filter(User.email.in_(emails))}
+    fresh = []
+    for line, row in batch:
+        if row.email in existing:
+            result["skipped"] += 1
+            _report(result, line, row.email, "Email already registered")
+        else:
+            fresh.append(row)
+    if not fresh:
+        return
+
+    hashes = hasher.hash_all([row.password for row in fresh])
+    now = datetime.utcnow()
+    created = db.execute(insert(User).returning(User.id, User.email), [
+        {
+            "name": row.name,
+            "email": row.email,
+            "affiliation": row.affiliation,
+            "role": row.role,
+            "hashed_password": hashed,
+            "bio": row.bio,
+            "expertise": row.expertise,
+            "interests": row.interests,
+            "created_at": now
+        }
+        for row, hashed in zip(fresh, hashes)
+    ]).all()
+    ids = {email: user_id for user_id, email in created}
+
+    reviewer_ids = [ids[row.email] for row in fresh if row.role == "reviewer"]
+    if reviewer_ids:
+        db.execute(insert(LeaderboardStats), [{"user_id": user_id} for user_id in reviewer_ids])
+    tags.set_user_expertise(db, {ids[row.email]: row.expertise for row in fresh if row.expertise})
+    db.execute(insert(AuditLog), [
+        {
+            "user_id": actor_id,
+            "action": "import_user",
+            "resource_type": "user",
+            "resource_id": ids[row.email],
+            "timestamp": now
+        }
+        for row in fresh
+    ])
+    db.commit()
+
+    result["created"] += len(fresh)
+    result["reviewers"] += len(reviewer_ids)
+
+
+def import_users(
+    db: Session,
+    stream: BinaryIO,
+    fmt: str = "csv",
+    actor_id: Optional[int] = None,
+    workers: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+) -> dict:
+    """Create every valid, not yet registered user in the stream; returns counts and per-line errors"""
+    result = {"created": 0, "reviewers": 0, "skipped": 0, "failed": 0, "errors": []}
+    seen = set()
+    batch = []
+    hasher = PasswordHasher(workers)
+    try:
+        for line, raw in read_rows(stream, fmt):
+            row, error = validate_row(raw)
+            if error:
+                result["failed"] += 1
+                _report(result, line, raw.get("email") if isinstance(raw, dict) else None, error)
+                continue
+            if row.email in seen:
+                result["skipped"] += 1
+                _report(result, line, row.email, "Email repeated in file")
+                continue
+            seen.add(row.email)
+            batch.append((line, row))
+            if len(batch) >= batch_size:
+                _import_batch(db, hasher, batch, actor_id, result)
+                batch = []
+        if batch:
+            _import_batch(db, hasher, batch, actor_id, result)
+    finally:
+        hasher.close()
+    result["errors"].sort(key=lambda error: error["line"])
+    return result
+
+
+if __name__ == "__main__":
+    import invalidation  # noqa: F401 (so running workers see the new users)
+
+    parser = argparse.ArgumentParser(description="Import users from a CSV or JSON Lines file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            result = import_users(db, f, args.format or detect_format(args.path), workers=args.workers,
+                                  batch_size=args.batch_size)
+    finally:
+        db.close()
+    for error in result["errors"]:
+        print(f"line {error['line']}: {error['email'] or '-'}: {error['reason']}")
+    print(f"created: {result['created']}, skipped: {result['skipped']}, failed: {result['failed']}")
@@ -4,6 +4,15 @@
     // Global State
     let currentUser = null;
     let authToken = null;
+    let eventSource = null;
+    let lastEventId = null;
+    let eventsRetry = null;
+    let leaderboardSource = null;
+    let leaderboardEntries = [];
+    let activeSection = 'home';
+    
+    // Responses kept fresh by the /events stream instead of re-fetching on every navigation
+    const apiCache = new Map();
 
     // Initialize App
     document.addEventListener('DOMContentLoaded', () => {
@@ -125,6 +134,7 @@
             if (response.ok) {
                 currentUser = await response.json();
                 updateUserUI();
+                connectEvents();
                 loadDashboard();
             } else {
                 logout();
@@ -136,6 +146,8 @@
     }
 
     function logout() {
+        disconnectEvents();
+        closeLeaderboardStream();
         localStorage.removeItem('authToken');
         authToken = null;
         currentUser = null;
@@ -154,6 +166,10 @@
         
         document.getElementById(`nav-${sectionName}`).classList.add('active');
         document.getElementById(`section-${sectionName}`).classList.add('active');
+        activeSection = sectionName;
+        if (sectionName !== 'leaderboard') {
+            closeLeaderboardStream();
+        }
         
         // Load section-specific data
         switch(sectionName) {
@@ -214,7 +230,7 @@
 
     async function loadAuthorDashboard(statsGrid, quickActions) {
         // Fetch author's papers
-        const papers = await fetchAPI('/papers');
+        const papers = await fetchAPI('/papers?fields=status');
         
         const pending = papers.filter(p => p.status === 'pending').length;
         const underReview = papers.filter(p => p.status === 'under_review').length;
@@ -265,7 +281,7 @@
     async function loadReviewerDashboard(statsGrid, quickActions) {
         // Fetch reviewer stats
         const assignments = await fetchAPI('/assignments');
-        const reviews = await fetchAPI(`/reviews?reviewer_id=${currentUser.id}`);
+        const reviews = await fetchAPI(`/reviews?reviewer_id=${currentUser.id}&view=summary`);
         const tokens = await fetchAPI(`/users/${currentUser.id}/tokens`);
         
         const pending = assignments.filter(a => a.status === 'assigned').length;
@@ -385,7 +401,7 @@ async function loadPapers() {
     }
 
     async function loadAuthorReviews(container) {
-        const papers = await fetchAPI('/papers');
+        const papers = await fetchAPI('/papers?view=summary');
         
         let html = '<h2>Reviews on Your Papers</h2>';
         
@@ -429,7 +445,7 @@ async function loadPapers() {
 
     async function loadReviewerAssignments(container) {
         const assignments = await fetchAPI('/assignments');
-        const myReviews = await fetchAPI(`/reviews?reviewer_id=${currentUser.id}`);
+        const myReviews = await fetchAPI(`/reviews?reviewer_id=${currentUser.id}&fields=paper_id`);
         
         const reviewedPaperIds = new Set(myReviews.map(r => r.paper_id));
         const pendingAssignments = assignments.filter(a => !reviewedPaperIds.has(a.paper_id));
@@ -447,6 +463,7 @@ async function loadPapers() {
                         <div class="paper-abstract">${paper.abstract || 'No abstract provided'}</div>
                         <div class="paper-meta">
                             ${assignment.deadline ? `<span class="paper-tag">⏰ Due: ${new Date(assignment.deadline).toLocaleDateString()}</span>` : ''}
+                            ${assignment.overdue_at ? '<span class="paper-tag">⚠️ Overdue</span>' : ''}
                         </div>
                         <div class="paper-actions">
                             <button class="btn btn-info btn-small" onclick="downloadPaper(${paper.id})">📥 Download</button>
@@ -551,35 +568,69 @@ async function loadPapers() {
 
     // Leaderboard Functions
     async function loadLeaderboard() {
+        if (window.EventSource) {
+            openLeaderboardStream();
+            return;
+        }
         try {
-            const leaderboard = await fetchAPI('/leaderboard');
-            const tbody = document.getElementById('leaderboard-body');
-            
-            tbody.innerHTML = leaderboard.map((entry, index) => {
-                const rank = index + 1;
-                let rankClass = '';
-                if (rank === 1) rankClass = 'top1';
-                else if (rank === 2) rankClass = 'top2';
-                else if (rank === 3) rankClass = 'top3';
-                
-                const isCurrentUser = entry.user_id === currentUser.id;
-                
-                return `
-                    <tr style="${isCurrentUser ? 'background: rgba(99, 102, 241, 0.2); font-weight: bold;' : ''}">
-                        <td><span class="rank ${rankClass}">#${rank}</span></td>
-                        <td>${entry.name}${isCurrentUser ? ' (You)' : ''}</td>
-                        <td>${entry.total_reviews}</td>
-                        <td>${entry.total_tokens}</td>
-                        <td>${entry.ranking_score.toFixed(1)}</td>
-                        <td><span class="level-badge ${entry.level}">${entry.level.toUpperCase()}</span></td>
-                    </tr>
-                `;
-            }).join('');
+            leaderboardEntries = await fetchAPI('/leaderboard');
+            renderLeaderboard();
         } catch (error) {
             console.error('Failed to load leaderboard:', error);
         }
     }
 
+    // The stream sends one snapshot, then only the entries that changed
+    function openLeaderboardStream() {
+        if (leaderboardSource) return;
+        
+        leaderboardSource = new EventSource(`${API_BASE_URL}/leaderboard/stream`);
+        leaderboardSource.addEventListener('snapshot', (e) => {
+            leaderboardEntries = JSON.parse(e.data).entries;
+            renderLeaderboard();
+        });
+        leaderboardSource.addEventListener('delta', (e) => {
+            const delta = JSON.parse(e.data);
+            const byUser = new Map(leaderboardEntries.map(entry => [entry.user_id, entry]));
+            delta.removed.forEach(userId => byUser.delete(userId));
+            delta.changed.forEach(entry => byUser.set(entry.user_id, entry));
+            leaderboardEntries = [...byUser.values()].sort((a, b) => a.rank - b.rank);
+            renderLeaderboard();
+        });
+    }
+
+    function closeLeaderboardStream() {
+        if (leaderboardSource) {
+            leaderboardSource.close();
+            leaderboardSource = null;
+        }
+    }
+
+    function renderLeaderboard() {
+        const tbody = document.getElementById('leaderboard-body');
+        
+        tbody.innerHTML = leaderboardEntries.map((entry, index) => {
+            const rank = index + 1;
+            let rankClass = '';
+            if (rank === 1) rankClass = 'top1';
+            else if (rank === 2) rankClass = 'top2';
+            else if (rank === 3) rankClass = 'top3';
+            
+            const isCurrentUser = entry.user_id === currentUser.id;
+            
+            return `
+                <tr style="${isCurrentUser ? 'background: rgba(99, 102, 241, 0.2); font-weight: bold;' : ''}">
+                    <td><span class="rank ${rankClass}">#${rank}</span></td>
+                    <td>${entry.name}${isCurrentUser ? ' (You)' : ''}</td>
+                    <td>${entry.total_reviews}</td>
+                    <td>${entry.total_tokens}</td>
+                    <td>${entry.ranking_score.toFixed(1)}</td>
+                    <td><span class="level-badge ${entry.level}">${entry.level.toUpperCase()}</span></td>
+                </tr>
+            `;
+        }).join('');
+    }
+
     // Profile Functions
     async function loadProfile() {
         document.getElementById('profile-name').value = currentUser.name;
@@ -631,6 +682,7 @@ async function loadPapers() {
     function closeUploadModal() {
         document.getElementById('upload-modal').classList.remove('active');
         document.getElementById('upload-form').reset();
+        delete document.getElementById('upload-form').dataset.idempotencyKey;
         document.getElementById('upload-message').textContent = '';
     }
 
@@ -646,11 +698,17 @@ async function loadPapers() {
         formData.append('file', document.getElementById('paper-file').files[0]);
         
         const messageDiv = document.getElementById('upload-message');
+        // Resubmitting the same form after a dropped connection reuses the key, so the paper is stored once
+        const form = e.target;
+        form.dataset.idempotencyKey = form.dataset.idempotencyKey || crypto.randomUUID();
         
         try {
             const response = await fetch(`${API_BASE_URL}/papers`, {
                 method: 'POST',
-                headers: { 'Authorization': `Bearer ${authToken}` },
+                headers: {
+                    'Authorization': `Bearer ${authToken}`,
+                    'Idempotency-Key': form.dataset.idempotencyKey
+                },
                 body: formData
             });
             
@@ -681,6 +739,7 @@ async function loadPapers() {
     function closeReviewModal() {
         document.getElementById('review-modal').classList.remove('active');
         document.getElementById('review-form').reset();
+        delete document.getElementById('review-form').dataset.idempotencyKey;
         document.getElementById('review-message').textContent = '';
     }
 
@@ -691,13 +750,16 @@ async function loadPapers() {
         const reviewText = document.getElementById('review-text').value;
         const rating = parseFloat(document.getElementById('review-rating').value) || null;
         const messageDiv = document.getElementById('review-message');
+        const form = e.target;
+        form.dataset.idempotencyKey = form.dataset.idempotencyKey || crypto.randomUUID();
         
         try {
             const response = await fetch(`${API_BASE_URL}/reviews`, {
                 method: 'POST',
                 headers: {
                     'Authorization': `Bearer ${authToken}`,
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': form.dataset.idempotencyKey
                 },
                 body: JSON.stringify({
                     paper_id: paperId,
@@ -711,6 +773,7 @@ async function loadPapers() {
                 messageDiv.textContent = 'Review submitted successfully! 🎉';
                 setTimeout(() => {
                     closeReviewModal();
+                    invalidateAPI('/assignments', '/reviews', `/users/${currentUser.id}/tokens`);
                     loadReviews();
                     loadDashboard();
                     loadTokens();
@@ -763,6 +826,7 @@ async function loadPapers() {
                 messageDiv.textContent = 'Feedback submitted successfully!';
                 setTimeout(() => {
                     closeFeedbackModal();
+                    invalidateAPI('/reviews');
                     loadReviews();
                 }, 2000);
             } else {
@@ -782,6 +846,12 @@ async function loadPapers() {
 
     // Helper function to fetch from API
     async function fetchAPI(endpoint) {
+        // While the event stream is open, pushed endpoints are served from cache until an event invalidates them
+        const cacheable = isPushedEndpoint(endpoint) && eventSource && eventSource.readyState === EventSource.OPEN;
+        if (cacheable && apiCache.has(endpoint)) {
+            return apiCache.get(endpoint);
+        }
+        
         const response = await fetch(`${API_BASE_URL}${endpoint}`, {
             headers: { 'Authorization': `Bearer ${authToken}` }
         });
@@ -790,7 +860,149 @@ async function loadPapers() {
             throw new Error('API request failed');
         }
         
-        return await response.json();
+        const data = await response.json();
+        if (cacheable) {
+            apiCache.set(endpoint, data);
+        }
+        return data;
+    }
+
+    function isPushedEndpoint(endpoint) {
+        return endpoint.startsWith('/assignments') ||
+            endpoint.startsWith('/reviews') ||
+            (currentUser && endpoint === `/users/${currentUser.id}/tokens`);
+    }
+
+    function invalidateAPI(...prefixes) {
+        for (const endpoint of [...apiCache.keys()]) {
+            if (prefixes.some(prefix => endpoint.startsWith(prefix))) {
+                apiCache.delete(endpoint);
+            }
+        }
+    }
+
+    // Live Notifications
+    async function connectEvents() {
+        if (eventSource || !window.EventSource) return;
+        
+        // EventSource can't send headers, and a token in the URL would end up in access logs,
+        // so the stream is opened with a short-lived, single-use ticket instead
+        let ticket;
+        try {
+            const response = await fetch(`${API_BASE_URL}/auth/stream-ticket`, {
+                method: 'POST',
+                headers: { 'Authorization': `Bearer ${authToken}` }
+            });
+            if (!response.ok) {
+                throw new Error('Ticket request failed');
+            }
+            ticket = (await response.json()).ticket;
+        } catch (error) {
+            scheduleEventsReconnect();
+            return;
+        }
+        if (eventSource || !authToken) return;
+        
+        let url = `${API_BASE_URL}/events?ticket=${encodeURIComponent(ticket)}`;
+        if (lastEventId) {
+            url += `&last_event_id=${encodeURIComponent(lastEventId)}`;
+        }
+        eventSource = new EventSource(url);
+        
+        const on = (type, handler) => eventSource.addEventListener(type, (e) => {
+            if (e.lastEventId) {
+                lastEventId = e.lastEventId;
+            }
+            handler(e);
+        });
+        
+        on('assignment.created', (e) => {
+            const data = JSON.parse(e.data);
+            invalidateAPI('/assignments');
+            notify(`📋 New review assignment: ${data.paper_title}`);
+            refreshActiveSection(['home', 'reviews']);
+        });
+        on('assignment.reminder', (e) => {
+            const data = JSON.parse(e.data);
+            notify(`⏰ Review for paper #${data.paper_id} is due ${new Date(data.deadline).toLocaleString()}`);
+        });
+        on('assignment.overdue', (e) => {
+            const data = JSON.parse(e.data);
+            invalidateAPI('/assignments');
+            notify(`⚠️ Review for paper #${data.paper_id} is overdue`);
+            refreshActiveSection(['reviews']);
+        });
+        on('review.submitted', (e) => {
+            const data = JSON.parse(e.data);
+            invalidateAPI('/reviews');
+            notify(`💬 New review on "${data.paper_title}"`);
+            refreshActiveSection(['home', 'papers', 'reviews']);
+        });
+        on('review.feedback', (e) => {
+            const data = JSON.parse(e.data);
+            invalidateAPI('/reviews');
+            notify(`⭐ The author rated your review #${data.review_id}`);
+            refreshActiveSection(['reviews']);
+        });
+        on('token.awarded', (e) => {
+            const data = JSON.parse(e.data);
+            invalidateAPI(`/users/${currentUser.id}/tokens`);
+            notify(`${data.icon} You earned "${data.name}"!`);
+            refreshActiveSection(['home', 'tokens']);
+        });
+        on('resync', () => {
+            // Events were missed; start over from the server's state
+            apiCache.clear();
+            refreshActiveSection(['home', 'papers', 'reviews', 'tokens']);
+        });
+        eventSource.onerror = () => {
+            // The ticket is spent, so reconnect with a new one rather than letting the browser retry;
+            // until then nothing cached can be trusted
+            apiCache.clear();
+            eventSource.close();
+            eventSource = null;
+            scheduleEventsReconnect();
+        };
+    }
+
+    function scheduleEventsReconnect() {
+        if (!authToken || eventsRetry) return;
+        eventsRetry = setTimeout(() => {
+            eventsRetry = null;
+            connectEvents();
+        }, 3000);
+    }
+
+    function disconnectEvents() {
+        if (eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+        clearTimeout(eventsRetry);
+        eventsRetry = null;
+        lastEventId = null;
+        apiCache.clear();
+    }
+
+    function refreshActiveSection(sections) {
+        if (sections.includes(activeSection)) {
+            showSection(activeSection);
+        }
+    }
+
+    function notify(text) {
+        let container = document.getElementById('notifications');
+        if (!container) {
+            container = document.createElement('div');
+            container.id = 'notifications';
+            container.className = 'notifications';
+            document.body.appendChild(container);
+        }
+        const item = document.createElement('div');
+        item.className = 'notification';
+        item.textContent = text;
+        container.appendChild(item);
+        setTimeout(() => item.remove(), 5000);
     }
 
     async function showAssignModal(paperId) {
@@ -798,7 +1010,7 @@ async function loadPapers() {
     
     // Load available reviewers
     try {
-        const reviewers = await fetchAPI('/reviewers');
+        const reviewers = await fetchAPI('/reviewers?view=summary');
         const select = document.getElementById('assign-reviewer-id');
         select.innerHTML = '<option value="">Select a reviewer...</option>' + 
             reviewers.map(r => `<option value="${r.id}">${r.name} (${r.email})</option>`).join('');
@@ -847,6 +1059,7 @@ async function handleAssignReviewer(e) {
             messageDiv.textContent = 'Reviewer assigned successfully! 🎉';
             setTimeout(() => {
                 closeAssignModal();
+                invalidateAPI('/assignments');
                 loadPapers();
             }, 2000);
         } else {